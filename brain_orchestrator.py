@@ -1,11 +1,17 @@
 ﻿import anthropic
+import argparse
 import json
 import requests
 from rich.console import Console
 from rich.panel import Panel
 import time
+from collections import OrderedDict
 from datetime import datetime
-import os
+
+from system.conversation_compactor import ConversationCompactor
+from system.memory_store import MemoryStore
+from system.semantic_index import make_embedder
+from system.token_manager import token_manager
 
 console = Console()
 
@@ -15,23 +21,13 @@ with open('brain_config.json', 'r') as f:
 client = anthropic.Anthropic(api_key=config['anthropic_api_key'])
 brain_url = f"http://127.0.0.1:{config['server_port']}"
 
-CONVO_MEMORY_FILE = "system/conversation_memory.json"
-
-def load_conversation_memory():
-    try:
-        if os.path.exists(CONVO_MEMORY_FILE):
-            with open(CONVO_MEMORY_FILE, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    return {"sessions": 0, "key_facts": [], "user_preferences": [], "ongoing_projects": []}
-
-def save_conversation_memory(mem):
-    os.makedirs(os.path.dirname(CONVO_MEMORY_FILE), exist_ok=True)
-    with open(CONVO_MEMORY_FILE, 'w') as f:
-        json.dump(mem, f, indent=2)
-
-convo_memory = load_conversation_memory()
+# Embeddings are optional: without a "memory": {"embeddings": {...}} section, recall is lexical (bm25) only
+memory_config = dict(config.get('memory', {}))
+embedding_config = memory_config.pop('embeddings', None)
+memory_store = MemoryStore(
+    embedder=make_embedder(embedding_config, config.get('ollama_host', 'http://localhost:11434')) if embedding_config else None,
+    **memory_config
+)
 
 class TokenTracker:
     def __init__(self):
@@ -51,12 +47,64 @@ tracker = TokenTracker()
 # TOOL FUNCTIONS - Direct server calls
 # =============================================================================
 
-def view_brain(operation, path=None):
-    """Read file or list directory"""
+def stream_brain(endpoint, payload, timeout):
+    """POST in streaming mode and render tokens as they arrive. Ctrl+C cancels the generation."""
+    with requests.post(f'{brain_url}{endpoint}', json={**payload, 'stream': True}, stream=True, timeout=(5, timeout)) as r:
+        if 'text/event-stream' not in r.headers.get('content-type', ''):
+            return r.json()
+        event, result = None, {'error': 'Stream ended without a result'}
+        try:
+            for line in r.iter_lines(decode_unicode=True):
+                if line.startswith('event:'):
+                    event = line[6:].strip()
+                elif line.startswith('data:'):
+                    data = json.loads(line[5:])
+                    if event == 'token':
+                        console.print(data['text'], end='', style='dim', markup=False, highlight=False)
+                    elif event == 'done':
+                        result = data
+                    elif event == 'error':
+                        result = {'error': data.get('message')}
+        except KeyboardInterrupt:
+            result = {'error': 'Cancelled by user'}
+        console.print()
+        return result
+
+view_cache = OrderedDict()  # request key -> (etag, result), revalidated with If-None-Match; least recently used first
+VIEW_CACHE_ENTRIES = config.get('view_cache_entries', 64)
+VIEW_CACHE_BYTES = config.get('view_cache_bytes', 8 * 1024 * 1024)
+view_cache_bytes = 0
+
+def remember_view(key, etag, result):
+    """Keep a viewed result for revalidation, evicting the least recently used past the entry or byte budget"""
+    global view_cache_bytes
+    size = len(json.dumps(result))
+    if size > VIEW_CACHE_BYTES:
+        return
+    if key in view_cache:
+        view_cache_bytes -= view_cache.pop(key)[2]
+    view_cache[key] = (etag, result, size)
+    view_cache_bytes += size
+    while len(view_cache) > VIEW_CACHE_ENTRIES or view_cache_bytes > VIEW_CACHE_BYTES:
+        view_cache_bytes -= view_cache.popitem(last=False)[1][2]
+
+def view_brain(operation, path=None, offset=None, length=None, start_line=None, end_line=None):
+    """Read file (whole head, byte range or line range) or list directory"""
+    payload = {'operation': operation, 'path': path, 'offset': offset, 'length': length, 'start_line': start_line, 'end_line': end_line}
+    key = tuple(payload.values())
+    cached = view_cache.get(key)
+    if cached:
+        view_cache.move_to_end(key)
+    headers = {'If-None-Match': cached[0]} if cached else {}
     for attempt in range(3):
         try:
-            r = requests.post(f'{brain_url}/view', json={'operation': operation, 'path': path}, timeout=30)
-            return r.json()
+            r = requests.post(f'{brain_url}/view', json=payload, headers=headers, timeout=30)
+            if r.status_code == 304 and cached:
+                return {**cached[1], 'status': 'unchanged'}
+            result = r.json()
+            if r.status_code == 200 and r.headers.get('ETag'):
+                remember_view(key, r.headers['ETag'], result)
+            return result
         except Exception as e:
             if attempt == 2:
                 return {'error': str(e)}
@@ -66,8 +114,7 @@ def execute_task(task_description):
     """Command EAI (CodeLlama) to create/edit files or run code"""
     try:
         console.print(f'[dim]🤖 EAI working...[/dim]')
-        r = requests.post(f'{brain_url}/execute', json={'task_description': task_description}, timeout=120)
-        result = r.json()
+        result = stream_brain('/execute', {'task_description': task_description}, timeout=120)
         if result.get('created'):
             console.print(f'[green]   ✓ Created: {", ".join(result["created"])}[/green]')
         if result.get('edited'):
@@ -76,6 +123,18 @@ def execute_task(task_description):
     except Exception as e:
         return {'error': str(e)}
 
+def summarize_conversation(previous_summary, transcript, max_tokens):
+    """Rolling summary for the compactor, written by the local thinker (free) instead of Opus"""
+    context = f'Summary so far:\n{previous_summary}\n\nNew turns:\n{transcript}' if previous_summary else transcript
+    question = (f'Update the summary of this conversation between Hugo and Opus in at most {max_tokens * 3 // 4} words. '
+                'Keep decisions, file paths, task outcomes, open problems and anything Hugo asked for. Reply with the summary only.')
+    r = requests.post(f'{brain_url}/think', json={'question': question, 'context': context}, timeout=(5, 180))
+    result = r.json()
+    if result.get('status') != 'success':
+        raise RuntimeError(result.get('message') or result.get('detail') or 'summary failed')
+    # DeepSeek R1 reasons in a <think> block before answering
+    return result['reasoning'].split('</think>')[-1].strip()
+
 def deep_think(question, context=None):
     """Consult DeepSeek R1 for complex reasoning"""
     try:
@@ -83,20 +142,30 @@ def deep_think(question, context=None):
         payload = {'question': question}
         if context:
             payload['context'] = context
-        r = requests.post(f'{brain_url}/think', json=payload, timeout=180)
-        result = r.json()
+        result = stream_brain('/think', payload, timeout=180)
         if result.get('reasoning'):
             console.print(f'[blue]   ✓ Reasoning complete ({len(result["reasoning"])} chars)[/blue]')
         return result
     except Exception as e:
         return {'error': str(e)}
 
-def search_brain(query):
+def search_brain(query, mode='text', filters=None, cursor=None):
     """Search files by name or content without directory traversal"""
     try:
-        r = requests.post(f'{brain_url}/search', json={'query': query}, timeout=30)
+        r = requests.post(f'{brain_url}/search', json={'query': query, 'mode': mode, 'cursor': cursor, **(filters or {})}, timeout=30)
+        result = r.json()
+        total = f' of {result["total"]}' if 'total' in result else ''
+        console.print(f'[cyan]   ✓ Found {result.get("count", 0)}{total} files matching "{query}"[/cyan]')
+        return result
+    except Exception as e:
+        return {'error': str(e)}
+
+def find_symbol(name, kind=None):
+    """Locate where a class, function, method, variable or import is defined"""
+    try:
+        r = requests.post(f'{brain_url}/symbols', json={'name': name, 'kind': kind}, timeout=30)
         result = r.json()
-        console.print(f'[cyan]   ✓ Found {result.get("count", 0)} files matching "{query}"[/cyan]')
+        console.print(f'[cyan]   ✓ {result.get("count", 0)} definitions of "{name}" ({result.get("mode", "exact")} match)[/cyan]')
         return result
     except Exception as e:
         return {'error': str(e)}
@@ -112,12 +181,30 @@ def get_context():
         return {'error': str(e)}
 
 def reindex_brain():
-    """Rebuild the file index for search"""
+    """Sync the file index for search with disk"""
     try:
         console.print(f'[dim]📇 Reindexing...[/dim]')
         r = requests.post(f'{brain_url}/reindex', timeout=60)
         result = r.json()
-        console.print(f'[green]   ✓ Indexed {result.get("files", 0)} files[/green]')
+        counts = result.get('counts', {})
+        console.print(f'[green]   ✓ Indexed {result.get("files", 0)} files (+{counts.get("added", 0)} ~{counts.get("changed", 0)} -{counts.get("removed", 0)} >{counts.get("renamed", 0)}, {result.get("elapsed_ms", 0):.0f}ms)[/green]')
+        return result
+    except Exception as e:
+        return {'error': str(e)}
+
+# Index generation already reported (set when the session starts); recent_changes returns what came after it
+changes_seen = None
+
+def recent_changes():
+    """Files added, changed, removed or renamed since the last check, from the index change feed"""
+    global changes_seen
+    try:
+        if changes_seen is None:
+            changes_seen = requests.get(f'{brain_url}/changes', timeout=10).json().get('generation', 0)
+            return {'generation': changes_seen, 'changes': [], 'note': 'Changes are reported from now on'}
+        result = requests.get(f'{brain_url}/changes', params={'since': changes_seen, 'limit': 200}, timeout=10).json()
+        changes_seen = result.get('generation', changes_seen)
+        console.print(f'[cyan]   ✓ {len(result.get("changes", []))} changes[/cyan]')
         return result
     except Exception as e:
         return {'error': str(e)}
@@ -140,16 +227,10 @@ def pluribus_swarm(task_description, num_agents=50, rounds=2):
 
 def remember(fact_type, content):
     """Store important fact for future sessions"""
-    if fact_type == 'key_fact':
-        convo_memory["key_facts"].append(content)
-        convo_memory["key_facts"] = convo_memory["key_facts"][-20:]
-    elif fact_type == 'project':
-        convo_memory["ongoing_projects"].append(content)
-        convo_memory["ongoing_projects"] = convo_memory["ongoing_projects"][-10:]
-    elif fact_type == 'preference':
-        convo_memory["user_preferences"].append(content)
-        convo_memory["user_preferences"] = convo_memory["user_preferences"][-10:]
-    save_conversation_memory(convo_memory)
+    try:
+        memory_store.add(fact_type, content)
+    except ValueError as e:
+        return {'error': str(e)}
     console.print(f'[green]   ✓ Remembered: {content[:50]}...[/green]')
     return {"status": "remembered", "type": fact_type}
 
@@ -160,12 +241,16 @@ def remember(fact_type, content):
 TOOLS = [
     {
         'name': 'view_brain',
-        'description': 'Read a file or list a directory. Results are cached - dont call twice for same path.',
+        'description': 'Read a file or list a directory. Results are cached - dont call twice for same path. Page through big files with start_line/end_line (or offset/length in bytes); responses include next_line/next_offset.',
         'input_schema': {
             'type': 'object',
             'properties': {
                 'operation': {'type': 'string', 'enum': ['read_file', 'list_directory']},
-                'path': {'type': 'string', 'description': 'File or folder path relative to brain root'}
+                'path': {'type': 'string', 'description': 'File or folder path relative to brain root'},
+                'start_line': {'type': 'integer', 'description': 'First line to read (1-based)'},
+                'end_line': {'type': 'integer', 'description': 'Last line to read (inclusive)'},
+                'offset': {'type': 'integer', 'description': 'Byte offset to start reading at'},
+                'length': {'type': 'integer', 'description': 'Number of bytes to read'}
             },
             'required': ['operation']
         }
@@ -183,15 +268,32 @@ TOOLS = [
     },
     {
         'name': 'search_brain',
-        'description': 'Search all files by name or content. Use this INSTEAD of exploring directories.',
+        'description': 'Search all files by name, path or content, ranked by relevance with a matching snippet. Wrap exact phrases in "quotes". Narrow with type/dir/modified_after; facets in the result show where matches cluster. An empty query with filters lists files newest first. Use this INSTEAD of exploring directories.',
         'input_schema': {
             'type': 'object',
             'properties': {
-                'query': {'type': 'string', 'description': 'Search term - filename, extension, or content keyword'}
+                'query': {'type': 'string', 'description': 'Search terms - filename, identifier, content keywords or a "quoted phrase". In regex mode, a Python regular expression.'},
+                'type': {'type': 'string', 'enum': ['python', 'javascript', 'html', 'css', 'config', 'markdown', 'text', 'other'], 'description': 'Only files of this type'},
+                'dir': {'type': 'string', 'description': 'Only files under this directory, e.g. system or swarm/agents'},
+                'modified_after': {'type': 'string', 'description': 'Only files modified after this ISO date/time, e.g. 2026-01-31'},
+                'cursor': {'type': 'string', 'description': 'next_cursor from a previous result, to get the next page'},
+                'mode': {'type': 'string', 'enum': ['text', 'regex', 'semantic'], 'description': 'text (default): ranked keyword search. regex: exact pattern/substring match over contents, returns matching lines with line numbers. semantic: find code by concept when you do not know its names, e.g. "where retries are handled"; returns the closest passage per file.'}
             },
             'required': ['query']
         }
     },
+    {
+        'name': 'find_symbol',
+        'description': 'Find where a Python class, function, method, module-level variable or import is defined: file, line range and signature. Exact name first, then prefix, then fuzzy. Use this INSTEAD of reading files to locate code.',
+        'input_schema': {
+            'type': 'object',
+            'properties': {
+                'name': {'type': 'string', 'description': 'Symbol name, e.g. call_model or ModelScheduler'},
+                'kind': {'type': 'string', 'enum': ['class', 'function', 'method', 'variable', 'import']}
+            },
+            'required': ['name']
+        }
+    },
     {
         'name': 'get_context',
         'description': 'Get your current session state: what youre working on, recent files, cached directories, Hugos preferences.',
@@ -212,9 +314,17 @@ TOOLS = [
             'required': ['question']
         }
     },
+    {
+        'name': 'recent_changes',
+        'description': 'List files added, changed, removed or renamed since you last called this (by you, EAI, the swarm or Hugo). Much cheaper than re-searching or re-listing directories to see what happened.',
+        'input_schema': {
+            'type': 'object',
+            'properties': {}
+        }
+    },
     {
         'name': 'reindex_brain',
-        'description': 'Rebuild the file search index. Use after creating many files.',
+        'description': 'Sync the file search index with disk. Incremental: only new, changed and removed files are read. Use after creating many files.',
         'input_schema': {
             'type': 'object',
             'properties': {}
@@ -235,7 +345,7 @@ TOOLS = [
     },
     {
         'name': 'remember',
-        'description': 'Store important fact for future sessions.',
+        'description': 'Store important fact for future sessions. Nothing is dropped; memories relevant to the current request are recalled automatically.',
         'input_schema': {
             'type': 'object',
             'properties': {
@@ -254,15 +364,21 @@ TOOLS = [
 def dispatch_tool(name, inputs):
     """Execute tool and return result"""
     if name == 'view_brain':
-        return view_brain(inputs.get('operation'), inputs.get('path'))
+        return view_brain(inputs.get('operation'), inputs.get('path'), inputs.get('offset'), inputs.get('length'),
+                          inputs.get('start_line'), inputs.get('end_line'))
     elif name == 'execute_task':
         return execute_task(inputs.get('task_description', ''))
     elif name == 'search_brain':
-        return search_brain(inputs.get('query', ''))
+        return search_brain(inputs.get('query', ''), inputs.get('mode', 'text'),
+                            {k: inputs[k] for k in ('type', 'dir', 'modified_after') if inputs.get(k)}, inputs.get('cursor'))
+    elif name == 'find_symbol':
+        return find_symbol(inputs.get('name', ''), inputs.get('kind'))
     elif name == 'get_context':
         return get_context()
     elif name == 'deep_think':
         return deep_think(inputs.get('question', ''), inputs.get('context'))
+    elif name == 'recent_changes':
+        return recent_changes()
     elif name == 'reindex_brain':
         return reindex_brain()
     elif name == 'pluribus_swarm':
@@ -276,24 +392,28 @@ def dispatch_tool(name, inputs):
 # SYSTEM PROMPT
 # =============================================================================
 
-def get_system_prompt():
-    mem_context = ""
-    if convo_memory.get("key_facts"):
-        mem_context = "\n\nREMEMBERED FACTS:\n" + "\n".join(f"- {f}" for f in convo_memory["key_facts"][-10:])
-    if convo_memory.get("ongoing_projects"):
-        mem_context += "\n\nONGOING PROJECTS:\n" + "\n".join(f"- {p}" for p in convo_memory["ongoing_projects"][-5:])
+def get_system_prompt(user_turn='', summary=''):
+    """Memories are those relevant to the user's current request, within the memory token budget.
+    `summary` is the compactor's rolling summary of turns no longer sent verbatim."""
+    mem_context = memory_store.context_for(user_turn)
+    if mem_context:
+        mem_context = '\n\n' + mem_context
+    if summary:
+        mem_context += '\n\nEARLIER IN THIS CONVERSATION (summary):\n' + summary
     
     return f'''You are Opus, Commander of the Brain.
 
 ## YOUR TOOLS (in order of preference):
 1. **search_brain** - Find files instantly. USE THIS FIRST instead of exploring directories.
-2. **get_context** - See your session state, what youre working on, cached data.
-3. **execute_task** - Command EAI (CodeLlama) to create/edit files. FREE.
-4. **view_brain** - Read specific files or list directories. Results are cached.
-5. **deep_think** - Complex reasoning via DeepSeek. FREE.
-6. **pluribus_swarm** - Deploy 50-200 TinyLlama workers. FREE.
-7. **reindex_brain** - Rebuild search index after creating files.
-8. **remember** - Store facts for future sessions.
+2. **find_symbol** - Jump straight to where a class/function/method is defined (file + lines).
+3. **get_context** - See your session state, what youre working on, cached data.
+4. **execute_task** - Command EAI (CodeLlama) to create/edit files. FREE.
+5. **view_brain** - Read specific files or list directories. Results are cached.
+6. **deep_think** - Complex reasoning via DeepSeek. FREE.
+7. **pluribus_swarm** - Deploy 50-200 TinyLlama workers. FREE.
+8. **recent_changes** - What files changed since you last checked. Use after execute_task or a swarm run.
+9. **reindex_brain** - Sync the search index with disk (incremental). Only needed when the server has no file watcher.
+10. **remember** - Store facts for future sessions.
 
 ## RULES:
 1. After EVERY tool call, tell Hugo the result in 1 sentence.
@@ -305,7 +425,9 @@ def get_system_prompt():
 
 ## EFFICIENCY:
 - search_brain > view_brain for finding files
+- find_symbol + view_brain with start_line/end_line reads just the code you need
 - get_context shows your cached directories - dont re-list them
+- recent_changes shows what moved on disk - dont re-list to find out
 - execute_task handles create AND edit - one call per task
 - Dont narrate what youre about to do. Just do it.
 {mem_context}
@@ -316,13 +438,13 @@ You have full control. Use your tools. Report results. Move fast.'''
 # CLAUDE API CALLER
 # =============================================================================
 
-def call_claude(messages, tools=None):
+def call_claude(messages, tools=None, system=None):
     for attempt in range(3):
         try:
             params = {
                 'model': 'claude-sonnet-4-20250514',
                 'max_tokens': 8000,
-                'system': get_system_prompt(),
+                'system': system if system is not None else get_system_prompt(),
                 'messages': messages
             }
             if tools:
@@ -347,11 +469,11 @@ def call_claude(messages, tools=None):
 # MAIN CHAT LOOP
 # =============================================================================
 
-def chat():
-    global convo_memory
-    convo_memory = load_conversation_memory()
-    convo_memory["sessions"] = convo_memory.get("sessions", 0) + 1
-    save_conversation_memory(convo_memory)
+def chat(resume=None):
+    """`resume` is a checkpoint file, or 'latest' for the most recent one in Logs/"""
+    global changes_seen
+    session = memory_store.start_session()
+    compactor = ConversationCompactor(token_manager, summarize=summarize_conversation, **config.get('compaction', {}))
     
     console.print('[dim]Connecting to Brain...[/dim]')
     
@@ -359,6 +481,7 @@ def chat():
         status = requests.get(f'{brain_url}/status', timeout=5).json()
         h = status.get('hierarchy', {})
         m = status.get('memory', {})
+        changes_seen = status.get('index', {}).get('generation')
         console.print(f'[dim]Hands: {h.get("hands")} | Thinker: {h.get("thinker")} | Tasks: {m.get("tasks", 0)}[/dim]')
     except:
         console.print('[red]Brain server not running! Start with: python brain_server.py[/red]')
@@ -369,13 +492,18 @@ def chat():
         f'[bold cyan]🤖 EAI[/bold cyan] CodeLlama (hands)\n'
         f'[bold blue]🧠 THINKER[/bold blue] DeepSeek R1\n'
         f'[bold yellow]🐜 SWARM[/bold yellow] TinyLlama x100\n'
-        f'[dim]Session #{convo_memory["sessions"]} | Memory: {len(convo_memory.get("key_facts", []))} facts[/dim]',
+        f'[dim]Session #{session} | Memory: {sum(memory_store.count().values())} memories[/dim]',
         border_style='green'
     ))
+    if resume:
+        restored = compactor.restore(None if resume == 'latest' else resume)
+        if restored:
+            console.print(f'[dim]Resumed {restored["file"]}: {len(compactor.messages)} messages'
+                          f'{" + summary" if compactor.summary else ""}[/dim]')
+        else:
+            console.print('[yellow]No checkpoint to resume; starting fresh[/yellow]')
     console.print()
 
-    conversation = []
-
     while True:
         try:
             user_input = console.input('[cyan]Hugo:[/cyan] ').strip()
@@ -387,22 +515,29 @@ def chat():
             continue
 
         if user_input.lower() in ['exit', 'quit', 'bye']:
-            save_conversation_memory(convo_memory)
             stats = tracker.get_stats()
             console.print(f'\n[green]Tokens: {stats["tokens_used"]} | Cost: {stats["estimated_cost"]} | Uptime: {stats["uptime_minutes"]}min[/green]')
             break
 
-        conversation.append({'role': 'user', 'content': user_input})
-        if len(conversation) > 30:
-            conversation = conversation[-30:]
+        compactor.add('user', user_input)
+        if compactor.compact():
+            console.print(f'[dim]   (Compacted older turns into a summary: ~{compactor.total_tokens} tokens of context)[/dim]')
 
-        response, error = call_claude(conversation, TOOLS)
+        # Memories are recalled once per user turn; the tool loop below reuses the same prompt
+        system = get_system_prompt(user_input, compactor.summary)
+        response, error = call_claude(compactor.messages, TOOLS, system)
         if error:
             console.print(f'[red]Error: {error}[/red]')
-            conversation = conversation[-4:]
+            # The turn itself may be what was rejected: take it back so it isn't resent with the next one
+            compactor.pop()
+            # Likely too long or malformed history: fold what came before into the summary, without
+            # blocking on the thinker
+            if compactor.compact(force=True, extractive=True):
+                console.print('[dim]   (Compacted the history; send your message again)[/dim]')
             continue
 
         tracker.track(response.usage.input_tokens, response.usage.output_tokens)
+        compactor.observe(response.usage.input_tokens)
 
         tool_count = 0
         max_tools = 50
@@ -434,11 +569,12 @@ def chat():
 
             # Continue conversation with tool results
             response, error = call_claude(
-                conversation + [
+                compactor.messages + [
                     {'role': 'assistant', 'content': response.content},
                     {'role': 'user', 'content': tool_results}
                 ],
-                TOOLS
+                TOOLS,
+                system
             )
             
             if error:
@@ -449,16 +585,24 @@ def chat():
 
         # Print final response
         final_text = ''
-        for block in response.content:
+        for block in (response.content if response else []):
             if block.type == 'text' and block.text.strip():
                 final_text += block.text
                 console.print(f'[green]Opus:[/green] {block.text}')
 
         if final_text.strip():
-            conversation.append({'role': 'assistant', 'content': final_text.strip()})
+            compactor.add('assistant', final_text.strip())
+        elif error:
+            # Requests must alternate user/assistant; record the failure in the user turn's place
+            compactor.add('assistant', f'[Request failed after {tool_count} tool calls: {error[:200]}]')
+        compactor.checkpoint()
 
         stats = tracker.get_stats()
-        console.print(f'\n[dim](Tokens: {stats["tokens_used"]} | Cost: {stats["estimated_cost"]} | Tools: {tool_count})[/dim]\n')
+        console.print(f'\n[dim](Tokens: {stats["tokens_used"]} | Cost: {stats["estimated_cost"]} | '
+                      f'Context: ~{compactor.total_tokens} | Tools: {tool_count})[/dim]\n')
 
 if __name__ == '__main__':
-    chat()
+    parser = argparse.ArgumentParser(description='Opus commander chat')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='CHECKPOINT',
+                        help='Continue from a checkpoint (the most recent in Logs/ if no file is given)')
+    chat(parser.parse_args().resume)
@@ -1,14 +1,18 @@
-﻿import json
+﻿import asyncio
+import json
 import os
-import subprocess
+import re
 import sys
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
-import requests
-from fastapi import FastAPI, HTTPException
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 sys.path.insert(0, os.getcwd())
@@ -16,6 +20,20 @@ sys.path.insert(0, os.getcwd())
 from system.session_state import session_state
 from system.eai_context import get_eai_system_prompt
 from system.brain_index import BrainIndex
+from system.semantic_index import make_embedder
+from system.dir_cache import DirectoryCache
+from system.fs_watcher import FileWatcher
+from system.crawler import load_skip_rules
+from system.model_client import ModelClient, OLLAMA_HOST
+from system.response_cache import ResponseCache
+from system.search_cache import SearchCache
+from system.json_store import WriteBehindStore
+from system.action_stream import ActionStreamParser
+from system.action_planner import ActionPlanner
+from system.python_pool import PythonPool
+from system.file_reader import file_etag, read_head, read_bytes, read_lines, iter_file
+from system.model_scheduler import model_scheduler, PRIORITY_COMMANDER, PRIORITY_THINKER
+from swarm.swarm_commander import run_swarm
 
 app = FastAPI()
 app.add_middleware(
@@ -29,7 +47,9 @@ app.add_middleware(
 with open('brain_config.json', 'r') as f:
     config = json.load(f)
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+model_client = ModelClient(config.get('ollama_host', OLLAMA_HOST))
+response_cache = ResponseCache(**config.get('response_cache', {}))
+search_cache = SearchCache(**config.get('search_cache', {}))
 
 MODELS = {
     "hands": "codellama:7b",
@@ -37,37 +57,56 @@ MODELS = {
     "swarm": "tinyllama"
 }
 
-MEMORY_FILE = "system/brain_memory.json"
-brain_index = BrainIndex(config['brain_path'])
+model_scheduler.configure(
+    {MODELS["hands"]: 2, MODELS["thinker"]: 1, MODELS["swarm"]: 4, **config.get('model_concurrency', {})},
+    total_limit=config.get('ollama_concurrency', 4)
+)
 
-def load_memory():
-    try:
-        if os.path.exists(MEMORY_FILE):
-            with open(MEMORY_FILE, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    return {"created": datetime.now().isoformat(), "total_tasks": 0, "successful_tasks": 0, "failed_tasks": 0}
+MODEL_OPTIONS = {'temperature': 0.1, 'num_predict': 4000}
+
+MEMORY_FILE = "system/brain_memory.json"
+skip_rules = load_skip_rules()
+# Semantic search: 'ollama' embeds with a local model (default nomic-embed-text), 'hashing' is a deterministic offline stand-in
+semantic_config = {'backend': 'ollama', **config.get('semantic', {})}
+brain_index = BrainIndex(
+    config['brain_path'], skip_rules, config.get('index_read_workers', 8),
+    embedder=make_embedder(semantic_config, config.get('ollama_host', OLLAMA_HOST)),
+    semantic_options={k: semantic_config[k] for k in ('ivf_threshold', 'nprobe') if k in semantic_config}
+)
+dir_cache = DirectoryCache(config['brain_path'], **config.get('directory_cache', {}))
+fs_watcher = FileWatcher(config['brain_path'], skip_rules=skip_rules)
+fs_watcher.subscribe(dir_cache.on_change)
+fs_watcher.subscribe(brain_index.on_change)
 
-def save_memory(memory):
-    os.makedirs(os.path.dirname(MEMORY_FILE), exist_ok=True)
-    memory["last_updated"] = datetime.now().isoformat()
-    with open(MEMORY_FILE, 'w') as f:
-        json.dump(memory, f, indent=2)
+memory_store = WriteBehindStore(
+    MEMORY_FILE,
+    {"created": datetime.now().isoformat(), "total_tasks": 0, "successful_tasks": 0, "failed_tasks": 0},
+    counter_keys=("total_tasks", "successful_tasks", "failed_tasks"),
+    **config.get('memory_flush', {})
+)
+memory = memory_store.data
 
-memory = load_memory()
+action_pool = ThreadPoolExecutor(max_workers=config.get('action_workers', 8), thread_name_prefix='eai-action')
+python_pool = PythonPool(config['brain_path'], **config.get('python_pool', {}))
 
-def call_model(prompt: str, model: str, system: str = None, timeout: int = 120) -> dict:
+async def call_model(prompt: str, model: str, system: str = None, timeout: int = 120, use_cache: bool = True,
+                     priority: int = PRIORITY_COMMANDER) -> dict:
+    cache_key = response_cache.make_key(model, system, prompt, MODEL_OPTIONS)
+    if use_cache:
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            return {"status": "success", "response": cached, "cached": True}
     for attempt in range(3):
         try:
-            payload = {'model': model, 'prompt': prompt, 'stream': False, 'options': {'temperature': 0.1, 'num_predict': 4000}}
-            if system:
-                payload['system'] = system
-            response = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+            async with model_scheduler.slot(model, priority):
+                response = await model_client.generate(prompt, model, system, MODEL_OPTIONS, timeout=timeout)
             if response.status_code == 200:
-                return {"status": "success", "response": response.json().get("response", "")}
+                text = response.json().get("response", "")
+                if text:
+                    response_cache.put(cache_key, text)
+                return {"status": "success", "response": text}
             return {"status": "error", "message": f"Ollama returned {response.status_code}"}
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             if attempt < 2:
                 continue
             return {"status": "error", "message": "Timeout"}
@@ -77,6 +116,49 @@ def call_model(prompt: str, model: str, system: str = None, timeout: int = 120)
             return {"status": "error", "message": str(e)}
     return {"status": "error", "message": "Unknown error"}
 
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def model_tokens(prompt: str, model: str, system: str, timeout: int, use_cache: bool = True,
+                       priority: int = PRIORITY_COMMANDER):
+    """Yield response text from the cache or from Ollama's token stream; the full text is cached once complete.
+    Closing the generator closes the Ollama stream, which stops the generation."""
+    cache_key = response_cache.make_key(model, system, prompt, MODEL_OPTIONS)
+    cached = await response_cache.aget(cache_key) if use_cache else None
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    for attempt in range(3):
+        try:
+            async with model_scheduler.slot(model, priority):
+                async for token in model_client.stream(prompt, model, system, MODEL_OPTIONS, timeout=timeout):
+                    chunks.append(token)
+                    yield token
+            break
+        except httpx.TransportError:
+            if chunks or attempt == 2:
+                raise
+    text = ''.join(chunks)
+    if text:
+        response_cache.put(cache_key, text)
+
+async def stream_model(prompt: str, model: str, system: str, timeout: int, finish, use_cache: bool = True,
+                       priority: int = PRIORITY_COMMANDER):
+    """Forward model tokens as SSE 'token' events, then emit finish(full_text) as 'done'"""
+    chunks = []
+    try:
+        async for token in model_tokens(prompt, model, system, timeout, use_cache, priority):
+            chunks.append(token)
+            yield sse('token', {'text': token})
+    except Exception as e:
+        yield sse('error', {'status': 'error', 'message': str(e) or type(e).__name__})
+        return
+    yield sse('done', await finish(''.join(chunks)))
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 def parse_json_response(response_text: str) -> list:
     if not response_text:
         return [{"error": "Empty response"}]
@@ -112,19 +194,44 @@ def parse_json_response(response_text: str) -> list:
 class Command(BaseModel):
     operation: str
     path: Optional[str] = None
+    offset: Optional[int] = None
+    length: Optional[int] = None
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
 
 class ExecutorTask(BaseModel):
     task_description: str
     model: Optional[str] = None
     num_agents: Optional[int] = 50
     rounds: Optional[int] = 2
+    stream: Optional[bool] = False
+    fresh: Optional[bool] = False
 
 class SearchQuery(BaseModel):
     query: str
+    limit: Optional[int] = 20
+    mode: Optional[str] = 'text'
+    ignore_case: Optional[bool] = False
+    # Filters: file type, extension, directory prefix, modified range (ISO date/time or epoch seconds)
+    type: Optional[str] = None
+    ext: Optional[str] = None
+    dir: Optional[str] = None
+    modified_after: Optional[str] = None
+    modified_before: Optional[str] = None
+    # next_cursor from the previous page (text mode)
+    cursor: Optional[str] = None
+
+class SymbolQuery(BaseModel):
+    name: str
+    mode: Optional[str] = 'auto'
+    kind: Optional[str] = None
+    limit: Optional[int] = 50
 
 class ThinkRequest(BaseModel):
     question: str
     context: Optional[str] = None
+    stream: Optional[bool] = False
+    fresh: Optional[bool] = False
 
 def tool_create_file(path: str, content: str) -> dict:
     try:
@@ -134,6 +241,8 @@ def tool_create_file(path: str, content: str) -> dict:
             os.makedirs(dir_name, exist_ok=True)
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        dir_cache.invalidate(os.path.dirname(path))
+        brain_index.update_paths([full_path])
         session_state.index_file(path, os.path.splitext(path)[1], "Created by EAI")
         return {'status': 'created', 'path': path, 'size': len(content)}
     except Exception as e:
@@ -152,91 +261,162 @@ def tool_edit_file(path: str, find: str, replace: str) -> dict:
         new_content = content.replace(find, replace, 1)
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write(new_content)
+        brain_index.update_paths([full_path])
         return {'status': 'edited', 'path': path}
     except Exception as e:
         return {'status': 'error', 'message': str(e)}
 
 def tool_execute_python(code: str) -> dict:
     try:
-        result = subprocess.run(['python', '-c', code], cwd=config['brain_path'], capture_output=True, text=True, timeout=30)
-        return {'status': 'executed', 'stdout': result.stdout[:1000], 'stderr': result.stderr[:500]}
-    except subprocess.TimeoutExpired:
-        return {'status': 'error', 'message': 'Timeout (30s)'}
+        result = python_pool.run(code)
+        if result['status'] != 'executed':
+            return result
+        return {'status': 'executed', 'stdout': result['stdout'][:1000], 'stderr': result['stderr'][:500]}
     except Exception as e:
         return {'status': 'error', 'message': str(e)}
 
 def tool_list_dir(path: str = '') -> dict:
     try:
-        full_path = os.path.join(config['brain_path'], path)
-        items = []
-        for item in os.listdir(full_path)[:50]:
-            item_path = os.path.join(full_path, item)
-            items.append({'name': item, 'type': 'dir' if os.path.isdir(item_path) else 'file'})
-        session_state.cache_directory(path or '.', items)
+        items, _ = dir_cache.list(path)
         return {'status': 'listed', 'path': path or '.', 'items': items}
     except Exception as e:
         return {'status': 'error', 'message': str(e)}
 
-def execute_actions(actions: list) -> tuple:
+def execute_action(action: dict) -> tuple:
+    """Run one EAI action. Returns (log_entry, succeeded); succeeded is None for actions that aren't scored."""
+    if 'error' in action:
+        return {'error': action.get('error')}, False
+    action_type = action.get('action', '')
+    if action_type == 'create_file':
+        result = tool_create_file(action.get('path', ''), action.get('content', ''))
+        return result, result['status'] == 'created'
+    elif action_type == 'edit_file':
+        result = tool_edit_file(action.get('path', ''), action.get('find', ''), action.get('replace', ''))
+        return result, result['status'] == 'edited'
+    elif action_type == 'execute_python':
+        result = tool_execute_python(action.get('code', ''))
+        return result, result['status'] == 'executed'
+    elif action_type == 'list_dir':
+        return tool_list_dir(action.get('path', '')), None
+    return None, None
+
+def record_actions(entries: list) -> tuple:
+    """Fold (action, log_entry, succeeded) triples into created/edited/log and update task counters"""
     files_created, files_edited, execution_log = [], [], []
-    for action in actions:
-        if 'error' in action:
-            execution_log.append({'error': action.get('error')})
-            memory["failed_tasks"] += 1
-            continue
-        action_type = action.get('action', '')
-        if action_type == 'create_file':
-            result = tool_create_file(action.get('path', ''), action.get('content', ''))
-            if result['status'] == 'created':
-                files_created.append(action.get('path'))
-                memory["successful_tasks"] += 1
-            else:
-                memory["failed_tasks"] += 1
+    succeeded = failed = 0
+    for action, result, ok in entries:
+        if result is not None:
             execution_log.append(result)
-        elif action_type == 'edit_file':
-            result = tool_edit_file(action.get('path', ''), action.get('find', ''), action.get('replace', ''))
-            if result['status'] == 'edited':
+        if ok:
+            succeeded += 1
+            if action.get('action') == 'create_file':
+                files_created.append(action.get('path'))
+            elif action.get('action') == 'edit_file':
                 files_edited.append(action.get('path'))
-                memory["successful_tasks"] += 1
-            else:
-                memory["failed_tasks"] += 1
-            execution_log.append(result)
-        elif action_type == 'execute_python':
-            result = tool_execute_python(action.get('code', ''))
-            execution_log.append(result)
-            memory["successful_tasks" if result['status'] == 'executed' else "failed_tasks"] += 1
-        elif action_type == 'list_dir':
-            result = tool_list_dir(action.get('path', ''))
-            execution_log.append(result)
-    memory["total_tasks"] += len(actions)
-    save_memory(memory)
+        elif ok is False:
+            failed += 1
+    with memory_store.lock:
+        memory["successful_tasks"] += succeeded
+        memory["failed_tasks"] += failed
+        memory["total_tasks"] += len(entries)
+    memory_store.mark_dirty()
     return files_created, files_edited, execution_log
 
+async def eai_events(prompt: str, model: str, system_prompt: str, use_cache: bool = True):
+    """Stream EAI output and execute each action as soon as its JSON object closes, so files land
+    while the model is still writing the rest. Independent actions run concurrently on action_pool;
+    ActionPlanner orders the ones that touch the same paths and treats execute_python as a barrier.
+    Yields (event, data): 'token', 'action', then 'done' or 'error'."""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    parser = ActionStreamParser()
+    planner = ActionPlanner()
+    chunks, entries, tasks = [], [], []
+
+    async def run(index, action, deps):
+        if deps:
+            await asyncio.wait(deps)
+        result, ok = await loop.run_in_executor(action_pool, execute_action, action)
+        entries[index] = (action, result, ok)
+        if result is not None:
+            events.put_nowait(('action', {'index': index, **result}))
+
+    def schedule(action):
+        deps = [tasks[i] for i in planner.add(action)]
+        entries.append(None)
+        tasks.append(asyncio.create_task(run(len(entries) - 1, action, deps)))
+
+    def finish():
+        files_created, files_edited, execution_log = record_actions([e for e in entries if e is not None])
+        print(f'[EAI] Done: {len(files_created)} created, {len(files_edited)} edited')
+        return {'status': 'success', 'created': files_created, 'edited': files_edited, 'log': execution_log, 'model': model}
+
+    async def produce():
+        try:
+            async for token in model_tokens(prompt, model, system_prompt, 90, use_cache):
+                chunks.append(token)
+                events.put_nowait(('token', {'text': token}))
+                for action in parser.feed(token):
+                    schedule(action)
+        except Exception as e:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            finish()
+            events.put_nowait(('error', {'status': 'error', 'message': str(e) or type(e).__name__}))
+            return
+        text = ''.join(chunks)
+        print(f'[EAI] Response: {text[:150]}')
+        # Nothing usable came out incrementally: fall back to the whole-text parser
+        leftovers = parse_json_response(text) if not parser.count else [{'error': 'Parse failed', 'raw': raw[:300]} for raw in parser.failed]
+        for action in leftovers:
+            schedule(action)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        events.put_nowait(('done', finish()))
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            event, data = await events.get()
+            yield event, data
+            if event in ('done', 'error'):
+                return
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
 @app.post('/view')
-async def view_brain(cmd: Command):
+async def view_brain(cmd: Command, if_none_match: Optional[str] = Header(None)):
+    """read_file pages with offset/length (bytes) or start_line/end_line, stream_file streams raw bytes.
+    Both answer 304 when If-None-Match matches the file's mtime+size ETag."""
     brain_path = config['brain_path']
     try:
-        if cmd.operation == 'read_file':
+        if cmd.operation in ('read_file', 'stream_file'):
             file_path = os.path.join(brain_path, cmd.path or '')
-            if not os.path.exists(file_path):
+            if not os.path.isfile(file_path):
                 raise HTTPException(status_code=404, detail=f'Not found: {cmd.path}')
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            stat = os.stat(file_path)
+            etag = file_etag(stat)
+            if if_none_match and etag in [t.strip() for t in if_none_match.split(',')]:
+                return Response(status_code=304, headers={'ETag': etag})
+            if cmd.operation == 'stream_file':
+                offset = max(0, min(cmd.offset or 0, stat.st_size))
+                length = stat.st_size - offset if cmd.length is None else max(0, min(cmd.length, stat.st_size - offset))
+                return StreamingResponse(iter_file(file_path, offset, length), media_type='application/octet-stream',
+                                         headers={'ETag': etag, 'Content-Length': str(length)})
+            if cmd.start_line is not None or cmd.end_line is not None:
+                page = await asyncio.to_thread(read_lines, file_path, etag, cmd.start_line or 1, cmd.end_line)
+            elif cmd.offset is not None or cmd.length is not None:
+                page = await asyncio.to_thread(read_bytes, file_path, cmd.offset or 0, cmd.length)
+            else:
+                page = read_head(file_path)
             session_state.mark_file_viewed(cmd.path)
-            return {'status': 'success', 'content': content[:8000], 'truncated': len(content) > 8000}
+            return JSONResponse({'status': 'success', **page, 'size': stat.st_size, 'etag': etag}, headers={'ETag': etag})
         elif cmd.operation == 'list_directory':
-            cached = session_state.get_cached_directory(cmd.path or '.')
-            if cached:
-                return {'status': 'cached', 'items': cached}
-            dir_path = os.path.join(brain_path, cmd.path or '')
-            if not os.path.exists(dir_path):
+            try:
+                items, cached = dir_cache.list(cmd.path)
+            except (FileNotFoundError, NotADirectoryError):
                 raise HTTPException(status_code=404, detail=f'Not found: {cmd.path}')
-            items = []
-            for item in os.listdir(dir_path)[:50]:
-                item_path = os.path.join(dir_path, item)
-                items.append({'name': item, 'type': 'dir' if os.path.isdir(item_path) else 'file'})
-            session_state.cache_directory(cmd.path or '.', items)
-            return {'status': 'success', 'items': items}
+            return {'status': 'cached' if cached else 'success', 'items': items}
         raise HTTPException(status_code=403, detail='Invalid operation')
     except HTTPException:
         raise
@@ -250,20 +430,13 @@ async def execute_task(task: ExecutorTask):
         session_state.set_working_on(task.task_description[:100])
         model = task.model or MODELS["hands"]
         system_prompt = get_eai_system_prompt(task.task_description)
-        result = call_model(f'{task.task_description}\n\nJSON only:', model, system_prompt, timeout=90)
-        if result["status"] != "success":
-            return {'status': 'error', 'message': result.get('message')}
-        print(f'[EAI] Response: {result["response"][:150]}')
-        actions = parse_json_response(result["response"])
-        files_created, files_edited, execution_log = execute_actions(actions)
-        print(f'[EAI] Done: {len(files_created)} created, {len(files_edited)} edited')
-        return {
-            'status': 'success',
-            'created': files_created,
-            'edited': files_edited,
-            'log': execution_log,
-            'model': model
-        }
+        prompt = f'{task.task_description}\n\nJSON only:'
+        events = eai_events(prompt, model, system_prompt, use_cache=not task.fresh)
+        if task.stream:
+            return sse_response(sse(event, data) async for event, data in events)
+        async for event, data in events:
+            if event in ('done', 'error'):
+                return data
     except Exception as e:
         print(f'[EAI ERROR] {str(e)}')
         traceback.print_exc()
@@ -276,35 +449,109 @@ async def deep_think(req: ThinkRequest):
         prompt = req.question
         if req.context:
             prompt = f"Context:\n{req.context}\n\nQuestion:\n{req.question}"
-        result = call_model(prompt, MODELS["thinker"], None, timeout=180)
+        if req.stream:
+            async def finish(text):
+                return {'status': 'success', 'reasoning': text}
+            return sse_response(stream_model(prompt, MODELS["thinker"], None, 180, finish, use_cache=not req.fresh, priority=PRIORITY_THINKER))
+        result = await call_model(prompt, MODELS["thinker"], None, timeout=180, use_cache=not req.fresh, priority=PRIORITY_THINKER)
         if result["status"] != "success":
             return {'status': 'error', 'message': result.get('message')}
         return {'status': 'success', 'reasoning': result["response"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post('/pluribus')
+async def pluribus(task: ExecutorTask):
+    """Run the TinyLlama swarm; workers queue behind commander and thinker calls"""
+    try:
+        return await asyncio.to_thread(run_swarm, task.task_description, task.num_agents, task.rounds)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post('/search')
 async def search_brain(query: SearchQuery):
-    """Search entire brain without directory traversal"""
-    results = brain_index.search(query.query)
-    return {'status': 'success', 'results': results, 'count': len(results)}
+    """Search entire brain without directory traversal. mode: text (BM25), regex (trigram-narrowed)
+    or semantic (embedding similarity; results improve as pending chunks are embedded).
+    Filters apply in every mode; text mode also returns facet counts and a cursor for the next page,
+    and with an empty query lists the filtered files newest first. Responses are cached until the index changes."""
+    limit = max(1, min(query.limit or 20, 200))
+    filters = {k: getattr(query, k) for k in ('type', 'ext', 'dir', 'modified_after', 'modified_before') if getattr(query, k)}
+    mode = query.mode or 'text'
+    # Semantic results also change as chunks get embedded, not only when files do
+    generation = brain_index.store.generation()
+    if mode == 'semantic':
+        generation = (generation, brain_index.semantic.version)
+    # The embedder sees the query as typed, so semantic queries that differ in case rank differently
+    case_sensitive = (mode == 'regex' and not query.ignore_case) or mode == 'semantic'
+    key = search_cache.make_key(mode, query.query, case_sensitive, limit=limit,
+                                filters=filters, ignore_case=bool(query.ignore_case), cursor=query.cursor)
+    cached = search_cache.get(key, generation)
+    if cached is not None:
+        return {**cached, 'cached': True}
+    started = time.perf_counter()
+    response = await run_search(query, mode, limit, filters)
+    search_cache.put(key, generation, response, (time.perf_counter() - started) * 1000)
+    return response
+
+async def run_search(query: SearchQuery, mode: str, limit: int, filters: dict) -> dict:
+    if mode == 'regex':
+        try:
+            found = await asyncio.to_thread(brain_index.search_regex, query.query, limit, query.ignore_case, filters)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f'Invalid regex: {e}')
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {'status': 'success', 'mode': 'regex', **found, 'count': len(found['results'])}
+    if mode == 'semantic':
+        try:
+            found = await asyncio.to_thread(brain_index.search_semantic, query.query, limit, filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f'Embedding failed: {e}')
+        return {'status': 'success', 'mode': 'semantic', **found, 'count': len(found['results'])}
+    if mode != 'text':
+        raise HTTPException(status_code=400, detail=f'Invalid mode: {mode}')
+    try:
+        found = await asyncio.to_thread(brain_index.search_page, query.query, limit, filters, query.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'status': 'success', **found, 'count': len(found['results'])}
+
+@app.post('/symbols')
+async def find_symbol(query: SymbolQuery):
+    """Where classes, functions, methods, module-level variables and imports are defined"""
+    if query.mode not in ('auto', 'exact', 'prefix', 'fuzzy'):
+        raise HTTPException(status_code=400, detail=f'Invalid mode: {query.mode}')
+    found = await asyncio.to_thread(brain_index.find_symbol, query.name, query.mode, query.kind,
+                                    max(1, min(query.limit or 50, 500)))
+    return {'status': 'success', **found, 'count': len(found['results'])}
 
 @app.post('/reindex')
-async def reindex_brain():
-    """Reindex entire brain for search"""
-    count = brain_index.reindex()
-    return {'status': 'indexed', 'files': count}
+async def reindex_brain(full: bool = False):
+    """Bring the search index up to date; returns the added/changed/removed/renamed delta"""
+    delta = await asyncio.to_thread(brain_index.reindex, full)
+    return {'status': 'indexed', 'files': delta['total_files'], **delta}
+
+@app.get('/changes')
+async def get_changes(since: Optional[int] = None, limit: int = 1000):
+    """Index change feed. Without `since`, just the current generation; with it, every change after that
+    generation. reset or truncated means the caller is too far behind and should rescan."""
+    if since is None:
+        return {'status': 'success', 'generation': brain_index.store.generation(), 'changes': [], 'reset': False, 'truncated': False}
+    found = await asyncio.to_thread(brain_index.changes, since, max(1, min(limit, 10000)))
+    return {'status': 'success', **found}
 
 @app.get('/context')
 async def get_context():
     """Get full session context for Opus"""
     return {
-        'working_on': session_state.state.get('working_on'),
-        'recent_files': session_state.state.get('last_viewed', [])[-10:],
-        'active_problems': session_state.state.get('active_problems', []),
-        'directory_cache': list(session_state.state.get('directory_cache', {}).keys()),
-        'hugo_preferences': session_state.state.get('hugo_preferences'),
-        'project_context': session_state.state.get('project_context')
+        'working_on': session_state.get('working_on'),
+        'recent_files': session_state.recent_files(10),
+        'active_problems': session_state.active_problems(),
+        'directory_cache': dir_cache.paths(),
+        'hugo_preferences': session_state.get('hugo_preferences'),
+        'project_context': session_state.get('project_context')
     }
 
 @app.get('/status')
@@ -312,28 +559,52 @@ async def status():
     ollama_status = "unknown"
     models = []
     try:
-        r = requests.get("http://localhost:11434/api/tags", timeout=2)
-        if r.status_code == 200:
-            ollama_status = "online"
-            models = [m['name'] for m in r.json().get('models', [])]
+        models = await model_client.tags(timeout=2)
+        ollama_status = "online"
     except:
         ollama_status = "offline"
     return {
         'status': 'online',
         'hierarchy': {'commander': 'Opus', 'hands': MODELS['hands'], 'thinker': MODELS['thinker'], 'swarm': MODELS['swarm']},
         'memory': {'tasks': memory['total_tasks'], 'success_rate': f"{(memory['successful_tasks'] / max(memory['total_tasks'], 1)) * 100:.0f}%"},
-        'session': {'working_on': session_state.state.get('working_on'), 'cached_dirs': len(session_state.state.get('directory_cache', {}))},
+        'session': {'working_on': session_state.get('working_on'), 'cached_dirs': len(dir_cache.paths()), **session_state.get_stats()},
+        'directory_cache': dir_cache.get_stats(),
+        'watcher': fs_watcher.get_stats(),
+        'index': {'files': int(brain_index.store.get_meta('total_files', 0)), 'generation': brain_index.store.generation()},
+        'semantic': brain_index.semantic.get_stats(),
+        'cache': response_cache.get_stats(),
+        'search_cache': search_cache.get_stats(),
+        'scheduler': model_scheduler.get_stats(),
+        'python_pool': python_pool.get_stats(),
         'ollama': ollama_status,
         'models': models,
-        'endpoints': ['/execute', '/think', '/search', '/reindex', '/view', '/context', '/status']
+        'endpoints': ['/execute', '/think', '/pluribus', '/search', '/symbols', '/reindex', '/changes', '/view', '/context', '/status']
     }
 
+@app.on_event('startup')
+async def startup():
+    await asyncio.to_thread(python_pool.start)
+    if config.get('watch_files', True) and not fs_watcher.start():
+        print('[BRAIN] watchdog not installed; index updates on /reindex only')
+    if semantic_config.get('enabled', True):
+        brain_index.semantic.start()
+
+@app.on_event('shutdown')
+async def shutdown():
+    await model_client.close()
+    memory_store.close()
+    python_pool.close()
+    fs_watcher.close()
+    brain_index.semantic.close()
+    dir_cache.close()
+    await asyncio.to_thread(response_cache.flush)
+
 if __name__ == '__main__':
     import uvicorn
     # Auto-index on startup
     print('[BRAIN] Indexing files...')
-    count = brain_index.reindex()
-    print(f'[BRAIN] Indexed {count} files')
+    delta = brain_index.reindex()
+    print(f'[BRAIN] Indexed {delta["total_files"]} files (+{delta["counts"]["added"]} ~{delta["counts"]["changed"]} -{delta["counts"]["removed"]} >{delta["counts"]["renamed"]}) in {delta["elapsed_ms"]:.0f}ms')
     print('='*60)
     print('🧠 BRAIN SERVER v2.0')
     print('='*60)
@@ -341,7 +612,7 @@ if __name__ == '__main__':
     print(f'🤖 Hands: {MODELS["hands"]}')
     print(f'🧠 Thinker: {MODELS["thinker"]}')
     print(f'🐜 Swarm: {MODELS["swarm"]}')
-    print(f'📁 Indexed: {count} files')
+    print(f'📁 Indexed: {delta["total_files"]} files')
     print(f'🔍 Search: ENABLED')
     print(f'💾 Session State: ENABLED')
     print('='*60)
@@ -3,6 +3,8 @@ Jaw Dropper Dashboard (safe version)
 
 Purpose: give Opus a live, read-only pulse on Python files without executing them.
 Pulls brain_path from brain_config.json via workshop.config; no hardcoded paths or exec().
+With the brain server running, refreshes follow its index change feed (/changes) and re-analyze
+only the files that changed; otherwise each refresh rescans the tree.
 """
 from __future__ import annotations
 
@@ -11,7 +13,7 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import dash
 import pandas as pd
@@ -34,6 +36,11 @@ except Exception:  # fallback if workshop is missing
             "_warning": "workshop.config not available; using repo root",
         }
 
+try:
+    from workshop.status import fetch_changes
+except Exception:  # no change feed: every refresh is a full scan
+    fetch_changes = None
+
 
 SKIP_DIRS = {".git", "__pycache__", ".venv", "Logs", "Tests"}
 
@@ -100,9 +107,48 @@ def scan_repo(root: Path) -> pd.DataFrame:
     return pd.DataFrame(records)
 
 
-def build_app(root: Path) -> dash.Dash:
+class RepoScanner:
+    """Per-file analysis kept between refreshes and updated from the index change feed."""
+
+    def __init__(self, root: Path, cfg: Dict):
+        self.root = root
+        self.cfg = cfg
+        self.records: Dict[str, Dict] = {}
+        self.generation: Optional[int] = None
+
+    def _tracked(self, rel_path: str) -> bool:
+        parts = Path(rel_path).parts
+        return rel_path.endswith(".py") and not SKIP_DIRS.intersection(parts[:-1])
+
+    def _rescan(self) -> None:
+        self.records = {record["path"]: record for record in scan_repo(self.root).to_dict("records")}
+
+    def refresh(self) -> pd.DataFrame:
+        feed = fetch_changes(self.cfg, self.generation) if fetch_changes else {"online": False}
+        if not feed.get("online"):
+            self.generation = None
+            self._rescan()
+        elif self.generation is None or feed.get("reset") or feed.get("truncated"):
+            # First refresh, or too far behind the feed: rescan and follow from here
+            self.generation = feed["generation"]
+            self._rescan()
+        else:
+            for change in feed["changes"]:
+                for rel_path in (change.get("old_path"), change["path"]):
+                    if rel_path and self._tracked(rel_path):
+                        full_path = self.root / rel_path
+                        if full_path.is_file():
+                            self.records[str(full_path)] = analyze_file(full_path)
+                        else:
+                            self.records.pop(str(full_path), None)
+            self.generation = feed["generation"]
+        return pd.DataFrame(list(self.records.values()))
+
+
+def build_app(root: Path, cfg: Optional[Dict] = None) -> dash.Dash:
     app = dash.Dash(__name__)
     app.title = "Jaw Dropper Dashboard"
+    scanner = RepoScanner(root, cfg or load_config())
 
     app.layout = html.Div(
         [
@@ -137,7 +183,7 @@ def build_app(root: Path) -> dash.Dash:
         if n is None:
             raise PreventUpdate
 
-        df = scan_repo(root)
+        df = scanner.refresh()
         if df.empty:
             return (
                 "Total files: 0",
@@ -186,7 +232,7 @@ def build_app(root: Path) -> dash.Dash:
 def main() -> None:
     cfg = load_config()
     root = Path(cfg.get("brain_path", REPO_ROOT))
-    app = build_app(root)
+    app = build_app(root, cfg)
     app.run_server(debug=True, host="127.0.0.1", port=8050)
 
 
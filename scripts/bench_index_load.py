@@ -0,0 +1,121 @@
+"""
+Index load benchmark: startup time and RSS of the old JSON index vs the SQLite index store.
+
+Writes N synthetic file records (200k by default) in both formats, then measures each load in a fresh
+subprocess so RSS numbers don't bleed into each other:
+  - json:   json.load of brain_index.json, as BrainIndex did at import time
+  - sqlite: BrainIndex construction on system/brain_index.db, plus one lookup and one search
+
+Usage: python scripts/bench_index_load.py [--records 200000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+TYPES = [(".py", "python"), (".md", "markdown"), (".json", "config"), (".txt", "text"), (".bin", "other")]
+
+
+def rss_kb() -> int:
+    """Current resident set size; falls back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def synthetic(records: int):
+    for i in range(records):
+        ext, file_type = TYPES[i % len(TYPES)]
+        name = f"file_{i}{ext}"
+        yield (f"d{i % 100}{os.sep}d{i // 100 % 100}{os.sep}{name}", name, ext, file_type, 100 + i % 5000,
+               1_700_000_000_000_000_000 + i, 1_000_000 + i, f"# file {i}\n" + "lorem ipsum " * 15)
+
+
+def write_json(path: Path, records: int) -> None:
+    files = {}
+    for rel_path, name, ext, file_type, size, mtime_ns, inode, preview in synthetic(records):
+        files[rel_path] = {"name": name, "ext": ext, "size": size, "modified": "2026-01-01T00:00:00",
+                           "mtime_ns": mtime_ns, "inode": inode, "type": file_type, "preview": preview}
+    path.write_text(json.dumps({"files": files, "last_indexed": None, "total_files": records}, indent=2), encoding="utf-8")
+
+
+def write_sqlite(db_path: Path, records: int) -> None:
+    from system.brain_index import BrainIndex
+    from system.index_store import FileRecord
+
+    index = BrainIndex(str(db_path.parent), db_path=str(db_path))
+    with index.fulltext.batch():
+        for row in synthetic(records):
+            index.store.put(FileRecord(*row))
+            index.fulltext.upsert(row[0], row[1], row[7])
+        index.store.set_meta("total_files", records)
+    index.store.close()
+
+
+def measure(mode: str, path: str) -> None:
+    """Runs in the child process: print one JSON line with load seconds and RSS growth"""
+    before = rss_kb()
+    started = time.perf_counter()
+    if mode == "json":
+        with open(path, "r") as f:
+            index = json.load(f)
+        first = next(iter(index["files"]))
+        index["files"][first]
+    else:
+        from system.brain_index import BrainIndex
+        index = BrainIndex(os.path.dirname(path), db_path=path)
+        index.store.get(f"d1{os.sep}d0{os.sep}file_1.md")
+        index.search("file_123")
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"seconds": elapsed, "rss_kb": rss_kb() - before}))
+
+
+def run_child(mode: str, path: Path) -> dict:
+    out = subprocess.run([sys.executable, __file__, "--measure", mode, str(path)],
+                         capture_output=True, text=True, check=True, cwd=REPO_ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    scratch = Path(tempfile.mkdtemp(prefix="bench_index_load_"))
+    try:
+        json_path, db_path = scratch / "brain_index.json", scratch / "brain_index.db"
+        write_json(json_path, args.records)
+        write_sqlite(db_path, args.records)
+        print(f"{args.records:,} records")
+        for label, mode, path in (("json (before)", "json", json_path), ("sqlite (after)", "sqlite", db_path)):
+            result = run_child(mode, path)
+            size = path.stat().st_size + sum(p.stat().st_size for p in scratch.glob(path.name + "-*"))
+            print(f"{label:<16} load {result['seconds'] * 1000:9.1f} ms   RSS +{result['rss_kb'] / 1024:8.1f} MB   "
+                  f"on disk {size / 1024 / 1024:7.1f} MB")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
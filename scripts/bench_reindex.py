@@ -0,0 +1,117 @@
+"""
+Reindex benchmark.
+
+Generates a synthetic tree (100k files by default) and reports files/sec for:
+  - the old crawl: os.walk + os.stat per file + one preview read at a time
+  - the scandir crawler alone (no reads)
+  - a full BrainIndex reindex (crawler + pooled reads + full-text index)
+  - a no-op incremental reindex
+
+Usage: python scripts/bench_reindex.py [--files 100000] [--workers 8] [--tree DIR] [--keep]
+The index files are written to a scratch directory, never to this repo's system/.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from system.crawler import SkipRules, crawl, DEFAULT_IGNORE
+
+EXTENSIONS = [".py", ".md", ".txt", ".json", ".js", ".bin"]
+FILES_PER_DIR = 100
+DIRS_PER_DIR = 10
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike".split()
+
+
+def make_tree(root: Path, count: int) -> None:
+    """Write `count` small files, FILES_PER_DIR per directory, DIRS_PER_DIR directories per level"""
+    for i in range(count):
+        leaf = i // FILES_PER_DIR
+        parts = []
+        while True:
+            parts.append(f"d{leaf % DIRS_PER_DIR}")
+            leaf //= DIRS_PER_DIR
+            if not leaf:
+                break
+        directory = root.joinpath(*reversed(parts))
+        if i % FILES_PER_DIR == 0:
+            directory.mkdir(parents=True, exist_ok=True)
+        ext = EXTENSIONS[i % len(EXTENSIONS)]
+        words = " ".join(WORDS[(i + j) % len(WORDS)] for j in range(40))
+        (directory / f"file_{i}{ext}").write_text(f"# file {i}\n{words}\n" * (1 + i % 20), encoding="utf-8")
+    # Something the skip rules must prune
+    (root / "node_modules" / "pkg").mkdir(parents=True, exist_ok=True)
+    (root / "node_modules" / "pkg" / "index.js").write_text("module.exports = 1\n", encoding="utf-8")
+
+
+def legacy_crawl(root: str) -> int:
+    """The pre-crawler loop: os.walk, os.stat per file, previews read one by one"""
+    skip_dirs = {".venv", "__pycache__", ".git", "node_modules"}
+    count = 0
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in skip_dirs]
+        for file in files:
+            if file.startswith("."):
+                continue
+            full_path = os.path.join(dirpath, file)
+            os.stat(full_path)
+            if os.path.splitext(file)[1] in (".py", ".js", ".md", ".txt", ".json", ".html", ".css"):
+                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
+                    f.read(500)
+            count += 1
+    return count
+
+
+def timed(label: str, fn) -> None:
+    started = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {count:>8} files  {elapsed:8.2f}s  {count / max(elapsed, 1e-9):>10,.0f} files/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tree", help="Reuse or create the synthetic tree here")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated tree")
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(prefix="bench_reindex_"))
+    tree = Path(args.tree) if args.tree else scratch / "tree"
+    try:
+        if not tree.exists() or not any(tree.iterdir()):
+            started = time.perf_counter()
+            make_tree(tree, args.files)
+            print(f"Generated {args.files} files in {time.perf_counter() - started:.1f}s under {tree}")
+
+        # BrainIndex keeps its files relative to the working directory
+        os.chdir(scratch)
+        from system.brain_index import BrainIndex
+
+        rules = SkipRules(DEFAULT_IGNORE)
+        timed("legacy os.walk + reads", lambda: legacy_crawl(str(tree)))
+        timed("scandir crawl (no reads)", lambda: sum(1 for _ in crawl(str(tree), rules)))
+        index = BrainIndex(str(tree), rules, read_workers=args.workers)
+        timed(f"full reindex ({args.workers} readers)", lambda: sum(index.reindex(full=True)["counts"].values()))
+        timed("incremental, no changes", lambda: index.reindex()["total_files"])
+        index.fulltext.close()
+    finally:
+        os.chdir(REPO_ROOT)
+        if args.keep:
+            print(f"Kept {scratch}")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
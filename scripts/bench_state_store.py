@@ -0,0 +1,133 @@
+"""
+State store benchmark: throughput and lost updates with several processes writing one JSON document.
+
+Each writer process increments a shared counter --ops times; the final count shows how many updates survived.
+  - unlocked:     read, modify, write_text with no lock, as the state files were written before
+  - transaction:  StateStore.transaction (file lock held across the read-modify-write)
+  - cas:          optimistic StateStore.load + compare_and_swap, retried on VersionConflict
+  - write-behind: WriteBehindStore with the counter as a counter key, flushed every --flush-every increments
+
+Usage: python scripts/bench_state_store.py [--writers 8] [--ops 200] [--flush-every 20] [--modes unlocked,cas]
+The documents are written to a scratch directory, never to this repo's system/.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from system.json_store import StateStore, VersionConflict, WriteBehindStore
+
+MODES = ("unlocked", "transaction", "cas", "write-behind")
+
+
+def write_unlocked(path: Path, ops: int, flush_every: int) -> int:
+    for _ in range(ops):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {"count": 0}  # a torn read of a half-written file
+        data["count"] = data.get("count", 0) + 1
+        path.write_text(json.dumps(data), encoding="utf-8")
+    return 0
+
+
+def write_transaction(path: Path, ops: int, flush_every: int) -> int:
+    store = StateStore(path, {"count": 0})
+    for _ in range(ops):
+        with store.transaction() as data:
+            data["count"] += 1
+    return 0
+
+
+def write_cas(path: Path, ops: int, flush_every: int) -> int:
+    store = StateStore(path, {"count": 0})
+    for _ in range(ops):
+        while True:
+            data, version = store.load()
+            data["count"] += 1
+            try:
+                store.compare_and_swap(data, version)
+                break
+            except VersionConflict:
+                continue
+    return store.stats["conflicts"]
+
+
+def write_behind(path: Path, ops: int, flush_every: int) -> int:
+    store = WriteBehindStore(str(path), {"count": 0}, flush_interval=3600, dirty_threshold=10 ** 9,
+                             timestamp_key=None, counter_keys=("count",))
+    for i in range(1, ops + 1):
+        with store.lock:
+            store.data["count"] += 1
+        store.mark_dirty()
+        if i % flush_every == 0:
+            store.flush()
+    store.close()
+    return store.merges
+
+
+WRITERS = {"unlocked": write_unlocked, "transaction": write_transaction, "cas": write_cas,
+           "write-behind": write_behind}
+
+
+def worker(mode: str, path: str, ops: int, flush_every: int, start, results) -> None:
+    start.wait()
+    results.put(WRITERS[mode](Path(path), ops, flush_every))
+
+
+def run(mode: str, scratch: Path, writers: int, ops: int, flush_every: int) -> None:
+    path = scratch / f"{mode}.json"
+    path.write_text(json.dumps({"count": 0}), encoding="utf-8")
+    start, results = multiprocessing.Event(), multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(mode, str(path), ops, flush_every, start, results))
+             for _ in range(writers)]
+    for proc in procs:
+        proc.start()
+    started = time.perf_counter()
+    start.set()
+    retries = sum(results.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - started
+
+    expected = writers * ops
+    count = StateStore(path).read().get("count", 0)
+    label = "merges" if mode == "write-behind" else "conflicts"
+    print(f"{mode:<13} {expected:>7} ops  {elapsed:7.2f}s  {expected / max(elapsed, 1e-9):>9,.0f} ops/s  "
+          f"final {count:>7}  lost {expected - count:>6}  {label} {retries}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="Increments per writer")
+    parser.add_argument("--flush-every", type=int, default=20, help="Increments between write-behind flushes")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    scratch = Path(tempfile.mkdtemp(prefix="bench_state_store_"))
+    try:
+        print(f"{args.writers} writer processes, {args.ops} increments each")
+        for mode in modes:
+            run(mode, scratch, args.writers, args.ops, args.flush_every)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,107 @@
-﻿import json
+﻿from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-import threading
+
+from system.json_store import StateStore
 
 class HiveMind:
+    """Shared blackboard for swarm agents. Every change is a read-modify-write of the hive file under
+    a cross-process lock, so agents in other processes (or a second swarm run) don't lose updates.
+    Each write rewrites and fsyncs the whole file, so batch what belongs together (mark_agents, record)."""
+
     def __init__(self):
         self.memory_file = Path("swarm/hive_memory.json")
         self.memory_file.parent.mkdir(exist_ok=True)
-        self.lock = threading.Lock()
-        self.state = {
+        self.store = StateStore(self.memory_file, {
             "task": None,
             "discoveries": [],
             "errors": [],
             "solutions": [],
             "agent_status": {},
             "votes": {}
-        }
-        self._load()
-    
-    def _load(self):
-        if self.memory_file.exists():
-            try:
-                self.state = json.loads(self.memory_file.read_text())
-            except:
-                pass
-    
-    def _save(self):
-        self.memory_file.write_text(json.dumps(self.state, indent=2))
-    
+        })
+        self.lock = self.store.lock
+        self.state = self.store.read()
+
+    @contextmanager
+    def _update(self):
+        with self.store.transaction() as state:
+            yield state
+        self.state = state
+
     def set_task(self, task: str):
-        with self.lock:
-            self.state["task"] = task
-            self.state["discoveries"] = []
-            self.state["errors"] = []
-            self.state["solutions"] = []
-            self.state["votes"] = {}
-            self._save()
-    
+        with self._update() as state:
+            state["task"] = task
+            state["discoveries"] = []
+            state["errors"] = []
+            state["solutions"] = []
+            state["votes"] = {}
+            state["agent_status"] = {}
+
     def broadcast(self, agent_id: str, message_type: str, content):
-        with self.lock:
-            entry = {
-                "agent": agent_id,
-                "type": message_type,
-                "content": content,
-                "timestamp": datetime.now().isoformat()
-            }
-            if message_type == "discovery":
-                self.state["discoveries"].append(entry)
-            elif message_type == "error":
-                self.state["errors"].append(entry)
-            elif message_type == "solution":
-                self.state["solutions"].append(entry)
-            self.state["agent_status"][agent_id] = "active"
-            self._save()
+        entry = {
+            "agent": agent_id,
+            "type": message_type,
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        }
+        with self._update() as state:
+            self._post(state, entry)
+            state["agent_status"][agent_id] = "active"
+
+    @staticmethod
+    def _post(state: dict, entry: dict):
+        key = {"discovery": "discoveries", "error": "errors", "solution": "solutions"}.get(entry["type"])
+        if key:
+            state[key].append(entry)
+
+    @staticmethod
+    def _vote(state: dict, agent_id: str, proposal: str):
+        voters = state["votes"].setdefault(proposal, [])
+        if agent_id not in voters:
+            voters.append(agent_id)
+
+    def record(self, agent_id: str, parsed: dict, status: str = "active"):
+        """An agent's whole turn in one write: its discovery, solution (with a vote for it), error and status"""
+        timestamp = datetime.now().isoformat()
+        with self._update() as state:
+            for message_type in ("discovery", "solution", "error"):
+                if parsed.get(message_type):
+                    self._post(state, {"agent": agent_id, "type": message_type,
+                                       "content": parsed[message_type], "timestamp": timestamp})
+            if parsed.get("solution"):
+                self._vote(state, agent_id, str(parsed["solution"])[:200])
+            state["agent_status"][agent_id] = status
 
     def read_all(self) -> dict:
-        with self.lock:
-            self._load()
-            return self.state.copy()
-    
+        self.state = self.store.read()
+        return self.state.copy()
+
     def vote(self, agent_id: str, proposal: str):
-        with self.lock:
-            if proposal not in self.state["votes"]:
-                self.state["votes"][proposal] = []
-            if agent_id not in self.state["votes"][proposal]:
-                self.state["votes"][proposal].append(agent_id)
-            self._save()
-    
+        with self._update() as state:
+            self._vote(state, agent_id, proposal)
+
     def get_consensus(self):
-        with self.lock:
-            if not self.state["votes"]:
-                return None
-            return max(self.state["votes"], key=lambda x: len(self.state["votes"][x]))
-    
+        votes = self.read_all()["votes"]
+        if not votes:
+            return None
+        return max(votes, key=lambda x: len(votes[x]))
+
     def get_all_discoveries(self):
-        with self.lock:
-            return self.state["discoveries"]
-    
+        return self.read_all()["discoveries"]
+
     def agent_count(self):
-        with self.lock:
-            return len(self.state["agent_status"])
+        return len(self.read_all()["agent_status"])
 
     def mark_agent(self, agent_id: str, status: str):
         """Set agent status explicitly (launching/active/failed)."""
-        with self.lock:
-            self.state["agent_status"][agent_id] = status
-            self._save()
+        with self._update() as state:
+            state["agent_status"][agent_id] = status
+
+    def mark_agents(self, agent_ids, status: str):
+        """Set many agents' status in one write"""
+        with self._update() as state:
+            for agent_id in agent_ids:
+                state["agent_status"][agent_id] = status
 
 hive = HiveMind()
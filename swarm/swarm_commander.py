@@ -1,8 +1,20 @@
 ﻿import concurrent.futures
+import math
 import time
 import json
 from swarm.hive_mind import hive
-from swarm.swarm_worker import worker_think, parse_worker_response
+from swarm.swarm_worker import worker_think, parse_worker_response, REQUEST_TIMEOUT, WORKER_MODEL
+from system.model_scheduler import model_scheduler
+
+MAX_THREADS = 12
+# A round never gets less than this, however few agents it runs
+MIN_ROUND_SECONDS = 90
+
+def round_budget(num_agents: int) -> float:
+    """Seconds for one round: the agents run in waves of the swarm model's concurrency, each wave
+    bounded by one request timeout"""
+    waves = math.ceil(num_agents / max(1, model_scheduler.concurrency(WORKER_MODEL)))
+    return max(MIN_ROUND_SECONDS, waves * REQUEST_TIMEOUT)
 
 def run_swarm(task: str, num_agents: int = 50, rounds: int = 2) -> dict:
     print(f"[PLURIBUS] Starting swarm: {num_agents} agents, {rounds} rounds")
@@ -14,23 +26,17 @@ def run_swarm(task: str, num_agents: int = 50, rounds: int = 2) -> dict:
     for round_num in range(rounds):
         print(f"[PLURIBUS] Round {round_num + 1}/{rounds}")
         hive_state = hive.read_all()
-        # mark all agents as launching for visibility
-        for i in range(num_agents):
-            hive.mark_agent(f"agent_{i}", "launching")
+        budget = round_budget(num_agents)
+        deadline = time.monotonic() + budget
+        # mark all agents as launching for visibility (one write for the lot)
+        hive.mark_agents([f"agent_{i}" for i in range(num_agents)], "launching")
         
         def run_agent(agent_id):
             try:
-                result = worker_think(f"agent_{agent_id}", task, hive_state)
+                result = worker_think(f"agent_{agent_id}", task, hive_state, deadline)
                 if result["status"] == "success":
                     parsed = parse_worker_response(result["response"])
-                    if parsed.get("discovery"):
-                        hive.broadcast(f"agent_{agent_id}", "discovery", parsed["discovery"])
-                    if parsed.get("solution"):
-                        hive.broadcast(f"agent_{agent_id}", "solution", parsed["solution"])
-                        hive.vote(f"agent_{agent_id}", str(parsed["solution"])[:200])
-                    if parsed.get("error"):
-                        hive.broadcast(f"agent_{agent_id}", "error", parsed["error"])
-                    hive.mark_agent(f"agent_{agent_id}", "active")
+                    hive.record(f"agent_{agent_id}", parsed, "active")
                     return {"success": True, "parsed": parsed}
                 hive.mark_agent(f"agent_{agent_id}", "failed")
                 return {"success": False, "error": result.get("message")}
@@ -41,17 +47,28 @@ def run_swarm(task: str, num_agents: int = 50, rounds: int = 2) -> dict:
         round_success = 0
         round_fail = 0
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=12) as executor:
-            futures = {executor.submit(run_agent, i): i for i in range(num_agents)}
-            for future in concurrent.futures.as_completed(futures, timeout=90):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS)
+        futures = {executor.submit(run_agent, i): i for i in range(num_agents)}
+        try:
+            # Agents stop waiting for slots at the deadline; the margin lets the last wave's requests finish
+            for future in concurrent.futures.as_completed(futures, timeout=budget + REQUEST_TIMEOUT):
                 try:
-                    result = future.result(timeout=15)
+                    result = future.result()
                     if result.get("success"):
                         round_success += 1
                     else:
                         round_fail += 1
                 except:
                     round_fail += 1
+        except concurrent.futures.TimeoutError:
+            unfinished = [f for f in futures if not f.done()]
+            for future in unfinished:
+                future.cancel()
+            round_fail += len(unfinished)
+            print(f"[PLURIBUS] Round {round_num + 1} over budget ({budget:.0f}s): {len(unfinished)} agents abandoned")
+        finally:
+            # Don't wait on agents still mid-request; they finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
         
         successful_agents += round_success
         failed_agents += round_fail
@@ -1,10 +1,17 @@
 ﻿import requests
 import json
+import time
+from system.model_scheduler import model_scheduler, PRIORITY_SWARM
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 WORKER_MODEL = "tinyllama"
+REQUEST_TIMEOUT = 30
+# How long an agent waits for a model slot when the caller sets no deadline
+SLOT_TIMEOUT = 60
 
-def worker_think(agent_id: str, task: str, hive_state: dict) -> dict:
+def worker_think(agent_id: str, task: str, hive_state: dict, deadline: float = None) -> dict:
+    """One agent turn. `deadline` (time.monotonic()) bounds the wait for a model slot; an agent that
+    can't get one in time gives up with an error result instead of holding up the round."""
     context = f"""You are Agent {agent_id} in a swarm. Build on peers and keep responses short.
 
 TASK: {task}
@@ -27,16 +34,20 @@ Respond with JSON: {{"discovery": "what you found", "solution": "your solution",
 JSON only:"""
     
     for attempt in range(2):
+        slot_timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else SLOT_TIMEOUT
         try:
-            response = requests.post(OLLAMA_URL, json={
-                "model": WORKER_MODEL,
-                "prompt": context,
-                "stream": False,
-                "options": {"temperature": 0.3, "num_predict": 256}
-            }, timeout=30)
+            with model_scheduler.slot_sync(WORKER_MODEL, PRIORITY_SWARM, slot_timeout):
+                response = requests.post(OLLAMA_URL, json={
+                    "model": WORKER_MODEL,
+                    "prompt": context,
+                    "stream": False,
+                    "options": {"temperature": 0.3, "num_predict": 256}
+                }, timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 200:
                 return {"status": "success", "response": response.json().get("response", "")}
+        except TimeoutError:
+            return {"status": "error", "message": f"No {WORKER_MODEL} slot within {slot_timeout:.0f}s"}
         except requests.exceptions.Timeout:
             if attempt == 0:
                 continue
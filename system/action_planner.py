@@ -0,0 +1,62 @@
+import os
+
+BARRIER_ACTIONS = {'execute_python'}
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path or '.'))
+
+def _within(path: str, directory: str) -> bool:
+    return directory == '.' or path == directory or path.startswith(directory + os.sep)
+
+def action_access(action: dict) -> tuple:
+    '''Return (reads, writes, listed_dirs, barrier) for one EAI action'''
+    action_type = action.get('action', '') if isinstance(action, dict) else ''
+    path = _norm(action.get('path', '')) if isinstance(action, dict) else '.'
+    if action_type == 'create_file':
+        return set(), {path}, set(), False
+    if action_type == 'edit_file':
+        return {path}, {path}, set(), False
+    if action_type == 'list_dir':
+        return set(), set(), {path}, False
+    if action_type in BARRIER_ACTIONS:
+        return set(), set(), set(), True
+    return set(), set(), set(), False
+
+class ActionPlanner:
+    '''Builds the dependency graph of an EAI action list one action at a time.
+
+    Writes to different files are independent. A read or write of a path waits for earlier
+    writes (and reads) of that path, a list_dir waits for earlier writes inside the directory,
+    and execute_python is a barrier: it waits for everything before it and everything after waits for it.'''
+
+    def __init__(self):
+        self.count = 0
+        self.barrier = None
+        self.since_barrier = []  # (index, reads, writes, listed_dirs)
+
+    def add(self, action: dict) -> list:
+        '''Register the next action; return the indices of earlier actions it must wait for'''
+        index = self.count
+        self.count += 1
+        reads, writes, listed, barrier = action_access(action)
+        if barrier:
+            deps = [i for i, *_ in self.since_barrier] or ([self.barrier] if self.barrier is not None else [])
+            self.barrier = index
+            self.since_barrier = []
+            return deps
+        deps = []
+        for i, prev_reads, prev_writes, prev_listed in self.since_barrier:
+            if (writes & (prev_writes | prev_reads)
+                    or reads & prev_writes
+                    or any(_within(p, d) for p in writes for d in prev_listed)
+                    or any(_within(p, d) for p in prev_writes for d in listed)):
+                deps.append(i)
+        if not deps and self.barrier is not None:
+            deps.append(self.barrier)
+        self.since_barrier.append((index, reads, writes, listed))
+        return deps
+
+def plan_actions(actions: list) -> list:
+    '''Dependency lists for a complete action list, aligned with its indices'''
+    planner = ActionPlanner()
+    return [planner.add(action) for action in actions]
@@ -0,0 +1,58 @@
+import json
+
+class ActionStreamParser:
+    '''Pulls complete JSON objects out of a model's token stream the moment they close.
+
+    Only braces outside of strings are tracked, so surrounding prose, markdown fences and the
+    enclosing [ ... ] of an action list are skipped without waiting for the rest of the output.'''
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.count = 0
+        self.failed = []
+
+    def feed(self, text: str) -> list:
+        '''Consume the next chunk; return the actions completed by it'''
+        actions = []
+        for ch in text:
+            if self.depth == 0:
+                if ch == '{':
+                    self.depth = 1
+                    self.buffer = [ch]
+                continue
+            self.buffer.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    actions.extend(self._complete(''.join(self.buffer)))
+                    self.buffer = []
+        return actions
+
+    def _complete(self, raw: str) -> list:
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            self.failed.append(raw)
+            return []
+        if 'action' in obj or 'error' in obj:
+            actions = [obj]
+        elif isinstance(obj.get('actions'), list):
+            actions = [a for a in obj['actions'] if isinstance(a, dict)]
+        else:
+            actions = []
+        self.count += len(actions)
+        return actions
@@ -1,73 +1,254 @@
-﻿import os
+﻿import base64
+import hashlib
+import heapq
 import json
+import os
+import threading
+import time
 from datetime import datetime
 
-INDEX_FILE = "system/brain_index.json"
+from system.crawler import SkipRules, crawl, load_skip_rules, map_bounded
+from system.fulltext_index import FullTextIndex
+from system.index_store import INDEX_DB, MTIME_BUCKET_NS, FileRecord, IndexStore
+from system.semantic_index import HashingEmbedder, SemanticIndex
+from system.symbol_index import SymbolIndex, extract_symbols
+from system.trigram_index import TrigramIndex
+
+TEXT_EXTENSIONS = {'.py', '.js', '.ts', '.md', '.txt', '.json', '.html', '.css', '.yml', '.yaml',
+                   '.toml', '.ini', '.cfg', '.sh', '.ps1', '.bat', '.sql', '.csv', '.rs', '.go', '.java', '.c', '.h'}
+# Contents beyond this many bytes are not searchable
+MAX_INDEXED_BYTES = 256 * 1024
+# Python files are parsed for symbols up to this size
+MAX_PARSED_BYTES = 4 * 1024 * 1024
+# Regex searches re-read files whose indexed contents were capped, up to this much of each
+MAX_REGEX_BYTES = 32 * 1024 * 1024
+# Paths listed per delta category; the counts are always exact
+DELTA_PATHS = 100
+# Bump when the database gains something every file must be re-read for; the next reindex rebuilds
+SCHEMA_VERSION = '4'
+# Files are hashed in blocks of this size, so large files are never held in memory whole
+HASH_BLOCK_BYTES = 1024 * 1024
+# Facet values listed per field (most frequent first); the modified facet counts files changed within each window
+FACET_VALUES = 20
+RECENCY_WINDOWS = (("24h", 1), ("7d", 7), ("30d", 30), ("365d", 365))
+
+def _encode_cursor(sort_key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(sort_key).encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        rank, path = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (rank, path)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def _parse_time_ns(value) -> int:
+    """ISO date/datetime or epoch seconds -> epoch nanoseconds"""
+    try:
+        return int(float(value) * 1e9)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value)).timestamp() * 1e9)
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
 
 class BrainIndex:
-    def __init__(self, brain_path: str):
+    def __init__(self, brain_path: str, skip_rules: SkipRules = None, read_workers: int = 8, db_path: str = INDEX_DB,
+                 embedder=None, semantic_options: dict = None):
         self.brain_path = brain_path
-        self.index = self._load()
+        self.skip_rules = skip_rules or load_skip_rules()
+        self.read_workers = read_workers
+        self.lock = threading.RLock()
+        # Records and full-text rows share one connection, so every change commits atomically across both
+        self.store = IndexStore(db_path)
+        self.fulltext = FullTextIndex(conn=self.store.conn, lock=self.store.lock)
+        self.symbols = SymbolIndex(conn=self.store.conn, lock=self.store.lock)
+        self.fulltext.trigrams = TrigramIndex(conn=self.store.conn, lock=self.store.lock)
+        self.semantic = SemanticIndex(embedder or HashingEmbedder(), conn=self.store.conn, lock=self.store.lock,
+                                      **(semantic_options or {}))
+        # The index's own files may live inside the tree; watcher events for them must not loop back
+        self.own_files = {os.path.abspath(db_path + suffix) for suffix in ('', '-wal', '-shm', '-journal')}
     
-    def _load(self):
-        try:
-            if os.path.exists(INDEX_FILE):
-                with open(INDEX_FILE, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return {"files": {}, "last_indexed": None}
-    
-    def save(self):
-        os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
-        with open(INDEX_FILE, 'w') as f:
-            json.dump(self.index, f, indent=2)
-    
-    def reindex(self):
-        """Full reindex of brain directory"""
-        self.index["files"] = {}
-        skip_dirs = {'.venv', '__pycache__', '.git', 'node_modules'}
-        
-        for root, dirs, files in os.walk(self.brain_path):
-            dirs[:] = [d for d in dirs if d not in skip_dirs]
-            
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                
-                full_path = os.path.join(root, file)
+    def reindex(self, full: bool = False) -> dict:
+        """Bring the index up to date with the tree. Only new, changed (mtime, size, inode) and removed
+        files are touched; full=True rebuilds from scratch."""
+        started = time.perf_counter()
+        delta = {"added": [], "changed": [], "removed": [], "renamed": []}
+        with self.lock, self.fulltext.batch():
+            # Records written by an older version lack rows in the newer tables, so rebuild
+            rebuild = full or (self.store.count() and self.store.get_meta("schema") != SCHEMA_VERSION)
+            if rebuild:
+                self.store.clear()
+                self.fulltext.clear()
+                self.symbols.clear()
+                self.semantic.clear()
+            known = self.store.signatures()
+            seen = set()
+            entries = list(self._walk(self.brain_path, seen))
+            self._apply(entries, [p for p in known if p not in seen], delta, known)
+            self._finish(delta, reset=bool(rebuild))
+        return self._summary(delta, started)
+    
+    def update_paths(self, paths) -> dict:
+        """Apply changes for specific absolute paths (files or directories, present or deleted)"""
+        started = time.perf_counter()
+        delta = {"added": [], "changed": [], "removed": [], "renamed": []}
+        with self.lock, self.fulltext.batch():
+            entries, vanished = [], []
+            for full_path in paths:
+                full_path = os.path.abspath(full_path)
                 rel_path = os.path.relpath(full_path, self.brain_path)
-                
-                try:
-                    stat = os.stat(full_path)
-                    ext = os.path.splitext(file)[1].lower()
-                    
-                    file_info = {
-                        "name": file,
-                        "ext": ext,
-                        "size": stat.st_size,
-                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        "type": self._get_file_type(ext),
-                        "preview": None
-                    }
-                    
-                    # Get preview for text files
-                    if ext in ['.py', '.js', '.md', '.txt', '.json', '.html', '.css']:
-                        try:
-                            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read(500)
-                                file_info["preview"] = content[:200]
-                        except:
-                            pass
-                    
-                    self.index["files"][rel_path] = file_info
-                except:
-                    pass
-        
-        self.index["last_indexed"] = datetime.now().isoformat()
-        self.index["total_files"] = len(self.index["files"])
-        self.save()
-        return self.index["total_files"]
+                if full_path in self.own_files or rel_path.startswith('..') or self.skip_rules.skip_path(rel_path):
+                    continue
+                if os.path.isdir(full_path):
+                    entries.extend(self._walk(full_path))
+                elif os.path.isfile(full_path):
+                    try:
+                        entries.append((rel_path, full_path, os.stat(full_path)))
+                    except OSError:
+                        pass
+                else:
+                    # Gone: the path itself, or everything under it if it was a directory
+                    vanished.extend(self.store.paths_under(rel_path))
+            # A move shows up as one path vanishing and another appearing; handled together they pair up
+            self._apply(entries, vanished, delta)
+            if any(delta.values()):
+                self._finish(delta)
+        return self._summary(delta, started)
+    
+    def on_change(self, paths: set):
+        """FileWatcher callback"""
+        self.update_paths(paths)
+    
+    def _walk(self, top: str, seen: set = None):
+        for rel_path, full_path, stat in crawl(self.brain_path, self.skip_rules, top):
+            if os.path.abspath(full_path) in self.own_files:
+                continue
+            if seen is not None:
+                seen.add(rel_path)
+            yield rel_path, full_path, stat
+    
+    def _apply(self, entries: list, vanished: list, delta: dict, known: dict = None):
+        """Index new and changed entries and drop vanished paths, pairing the two up as renames:
+        first by (mtime, size, inode), which needs no read, then by content hash.
+        `known` maps paths to stored ((mtime, size, inode), hash); without it each entry is looked up."""
+        gone = self.store.get_many(vanished) if vanished else {}
+        by_signature = {record.signature(): record for record in gone.values()}
+        stale = []
+        for rel_path, full_path, stat in entries:
+            if known is not None:
+                old = known.get(rel_path)
+            else:
+                record = self.store.get(rel_path)
+                old = (record.signature(), record.hash) if record else None
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            moved = by_signature.get(signature) if old is None else None
+            if moved and moved.path in gone and moved.ext == os.path.splitext(rel_path)[1].lower():
+                del gone[moved.path]
+                self._rename(moved, rel_path, delta)
+            elif old is None or old[0] != signature:
+                stale.append((rel_path, full_path, stat, old))
+        by_hash = {record.hash: record for record in gone.values() if record.hash}
+        for (rel_path, full_path, stat, old), (digest, content, symbols) in map_bounded(self._read, stale, self.read_workers):
+            if old is not None and digest is not None and old[1] == digest:
+                # Touched but not modified: keep the indexed contents, refresh the signature
+                self._put_record(rel_path, stat, content, digest)
+                continue
+            self._index_file(rel_path, stat, content, symbols, digest)
+            moved = by_hash.pop(digest, None) if old is None else None
+            if moved and moved.path in gone:
+                # Same contents under a new name (copied then deleted, or saved as a new file)
+                del gone[moved.path]
+                self._drop(moved.path)
+                delta["renamed"].append({"from": moved.path, "to": rel_path})
+            else:
+                delta["changed" if old is not None else "added"].append(rel_path)
+        for rel_path in gone:
+            self._remove(rel_path, delta)
+    
+    @staticmethod
+    def _read(job: tuple) -> tuple:
+        """(content hash, searchable contents or None, symbols or None); runs on the read pool"""
+        rel_path, full_path = job[0], job[1]
+        ext = os.path.splitext(rel_path)[1].lower()
+        keep = (MAX_PARSED_BYTES if ext == '.py' else MAX_INDEXED_BYTES) if ext in TEXT_EXTENSIONS else 0
+        digest, head = hashlib.blake2b(digest_size=16), b''
+        try:
+            with open(full_path, 'rb') as f:
+                while True:
+                    block = f.read(HASH_BLOCK_BYTES)
+                    if not block:
+                        break
+                    digest.update(block)
+                    if len(head) < keep:
+                        head += block[:keep - len(head)]
+        except OSError:
+            return None, None, None
+        if not keep:
+            return digest.hexdigest(), None, None
+        content = head.decode('utf-8-sig', errors='ignore')
+        if ext == '.py':
+            return digest.hexdigest(), content[:MAX_INDEXED_BYTES], extract_symbols(content)
+        return digest.hexdigest(), content, None
+    
+    def _drop(self, rel_path: str):
+        self.store.delete(rel_path)
+        self.fulltext.delete(rel_path)
+        self.symbols.delete(rel_path)
+        self.semantic.delete(rel_path)
+    
+    def _remove(self, rel_path: str, delta: dict):
+        self._drop(rel_path)
+        delta["removed"].append(rel_path)
+    
+    def _rename(self, record: FileRecord, rel_path: str, delta: dict):
+        """Move a file's rows to its new path without reading it again"""
+        record_path, record.path, record.name = record.path, rel_path, os.path.basename(rel_path)
+        self.store.delete(record_path)
+        self.store.put(record)
+        self.fulltext.rename(record_path, rel_path, record.name)
+        self.symbols.rename(record_path, rel_path)
+        self.semantic.rename(record_path, rel_path)
+        delta["renamed"].append({"from": record_path, "to": rel_path})
+    
+    def _put_record(self, rel_path: str, stat: os.stat_result, content, digest: str = None):
+        file = os.path.basename(rel_path)
+        ext = os.path.splitext(file)[1].lower()
+        self.store.put(FileRecord(
+            rel_path, file, ext, self._get_file_type(ext), stat.st_size, stat.st_mtime_ns, stat.st_ino,
+            content[:200] if content is not None else None, digest
+        ))
+    
+    def _index_file(self, rel_path: str, stat: os.stat_result, content, symbols=None, digest: str = None):
+        self._put_record(rel_path, stat, content, digest)
+        self.fulltext.upsert(rel_path, os.path.basename(rel_path), content or '')
+        self.semantic.replace(rel_path, content or '')
+        if rel_path.lower().endswith('.py'):
+            self.symbols.replace(rel_path, symbols or [])
+    
+    def _finish(self, delta: dict, reset: bool = False):
+        if reset or any(delta.values()):
+            rows = ([("added", p, None) for p in delta["added"]] + [("changed", p, None) for p in delta["changed"]] +
+                    [("removed", p, None) for p in delta["removed"]] +
+                    [("renamed", r["to"], r["from"]) for r in delta["renamed"]])
+            self.store.log_changes(rows, reset)
+        self.store.set_meta("last_indexed", datetime.now().isoformat())
+        self.store.set_meta("total_files", self.store.count())
+        self.store.set_meta("schema", SCHEMA_VERSION)
+    
+    def _summary(self, delta: dict, started: float) -> dict:
+        return {
+            **{k: v[:DELTA_PATHS] for k, v in delta.items()},
+            "counts": {k: len(v) for k, v in delta.items()},
+            "total_files": int(self.store.get_meta("total_files", 0)),
+            "generation": self.store.generation(),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    def changes(self, since: int, limit: int = 1000) -> dict:
+        """The change feed: what was added, changed, removed or renamed after generation `since`"""
+        return self.store.changes_since(since, limit)
     
     def _get_file_type(self, ext: str) -> str:
         types = {
@@ -83,42 +264,161 @@ class BrainIndex:
         }
         return types.get(ext, 'other')
     
-    def search(self, query: str) -> list:
-        """Search files by name, path, or content preview"""
+    def search(self, query: str, limit: int = 20) -> list:
+        """Search file names, paths and contents (BM25 over the full-text index). Supports "quoted phrases"."""
+        return self.search_page(query, limit)["results"]
+    
+    def search_page(self, query: str, limit: int = 20, filters: dict = None, cursor: str = None) -> dict:
+        """Ranked search restricted by `filters` (type, ext, dir, modified_after, modified_before), with facet
+        counts over every match and a cursor for the next page. A blank query lists the matching files,
+        newest first. Raises ValueError for a bad filter or cursor."""
+        where, params = self._filter_sql(filters or {})
+        after = _decode_cursor(cursor) if cursor else None
+        match = None
+        if query.strip():
+            join = 'JOIN files ON files.path = docs.path'
+            match = self.fulltext.resolve_match(query, join, where, params)
+            if match is None:
+                page, source, where, params = [], 'files', '0', ()
+            else:
+                # Sort key: BM25 rank (lower is better), then path so equal ranks still page deterministically
+                page = [((rank, path), rowid) for rowid, path, rank in
+                        self.fulltext.ranked(match, limit + 1, after, join, where, params)]
+                source = f'docs {join}'
+                where, params = ' AND '.join(['docs MATCH ?'] + ([where] if where else [])), (match, *params)
+        else:
+            clauses, bound = [where] if where else [], list(params)
+            if after is not None:
+                clauses.append('(coalesce(mtime_ns, 0) < ? OR (coalesce(mtime_ns, 0) = ? AND path > ?))')
+                bound.extend((-after[0], -after[0], after[1]))
+            with self.store.lock:
+                rows = self.store.conn.execute(
+                    f"SELECT path, coalesce(mtime_ns, 0) AS mtime FROM files "
+                    f"{'WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY mtime DESC, path LIMIT ?",
+                    (*bound, limit + 1)
+                ).fetchall()
+            page = [((-mtime, path), None) for path, mtime in rows]
+            source = 'files'
+        next_cursor = _encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+        page = page[:limit]
+        snippets = self.fulltext.snippets(match, [rowid for _, rowid in page]) if match else {}
+        records = self.store.get_many([key[1] for key, _ in page])
         results = []
-        query_lower = query.lower()
-        
-        for path, info in self.index.get("files", {}).items():
-            score = 0
-            
-            if query_lower in path.lower():
-                score += 10
-            if query_lower in info.get("name", "").lower():
-                score += 20
-            if info.get("preview") and query_lower in info["preview"].lower():
-                score += 5
-            
-            if score > 0:
-                results.append({"path": path, "score": score, **info})
-        
-        return sorted(results, key=lambda x: x["score"], reverse=True)[:20]
+        for (sort_key, path), rowid in page:
+            if path in records:
+                hit = {"path": path, "score": round(-sort_key, 3), "snippet": snippets.get(rowid)} if match else {"path": path}
+                results.append({**hit, **records[path].to_dict()})
+        total, facets = self._facets(source, where, params)
+        return {"results": results, "total": total, "facets": facets, "next_cursor": next_cursor}
+    
+    def _facets(self, source: str, where: str, params: tuple) -> tuple:
+        """(total, facets): counts per type, extension, top-level directory and recency over
+        `SELECT ... FROM source WHERE where`, aggregated in SQLite so no matching row is loaded"""
+        now = time.time_ns()
+        windows = [(label, now - days * MTIME_BUCKET_NS) for label, days in RECENCY_WINDOWS]
+        with self.store.lock:
+            # One pass over the matches; there are only as many groups as distinct (type, ext, dir) combinations
+            rows = self.store.conn.execute(
+                f"SELECT files.type, files.ext, files.top_dir, count(*), "
+                f"{', '.join('sum(coalesce(files.mtime_ns, 0) >= ?)' for _ in windows)} FROM {source} "
+                f"{'WHERE ' + where if where else ''} GROUP BY files.type, files.ext, files.top_dir",
+                (*(since for _, since in windows), *params)
+            ).fetchall()
+        counts = {"type": {}, "ext": {}, "dir": {}}
+        recent = dict.fromkeys([label for label, _ in windows] + ["older"], 0)
+        total = 0
+        for file_type, ext, top, n, *within in rows:
+            total += n
+            for field, value in (("type", file_type), ("ext", ext or ""), ("dir", top or ".")):
+                counts[field][value] = counts[field].get(value, 0) + n
+            for (label, _), count in zip(windows, within):
+                recent[label] += count
+            recent["older"] += n - within[-1]
+        facets = {field: dict(heapq.nlargest(FACET_VALUES, values.items(), key=lambda kv: kv[1]))
+                  for field, values in counts.items()}
+        facets["modified"] = recent
+        return total, facets
+    
+    @staticmethod
+    def _filter_sql(filters: dict) -> tuple:
+        """WHERE fragment over the files table for the search filters; each one can use a secondary index"""
+        clauses, params = [], []
+        if filters.get("type"):
+            clauses.append("files.type = ?")
+            params.append(filters["type"])
+        if filters.get("ext"):
+            clauses.append("files.ext = ?")
+            params.append("." + filters["ext"].lower().lstrip("."))
+        if filters.get("dir"):
+            prefix = os.path.normpath(filters["dir"].strip("/\\"))
+            if os.sep not in prefix:
+                clauses.append("files.top_dir = ?")
+                params.append(prefix)
+            else:
+                # Everything below the directory is one primary-key range
+                clauses.append("files.path > ? AND files.path < ?")
+                params.extend([prefix + os.sep, prefix + chr(ord(os.sep) + 1)])
+        for key, op in (("modified_after", ">="), ("modified_before", "<")):
+            if filters.get(key):
+                ns = _parse_time_ns(filters[key])
+                # The bucket bound lets the bucket index narrow the range before mtime_ns is compared exactly
+                clauses.append(f"files.bucket {op} ? AND files.mtime_ns {op} ?")
+                params.extend([ns // MTIME_BUCKET_NS + (1 if op == "<" else 0), ns])
+        return " AND ".join(clauses), tuple(params)
+    
+    def search_regex(self, pattern: str, limit: int = 20, ignore_case: bool = False, filters: dict = None) -> dict:
+        """Regex over file contents, narrowed by the trigram index; matches come with line numbers"""
+        where, params = self._filter_sql(filters or {})
+        join = "JOIN files ON files.path = docs.path" if where else ""
+        # Text files past MAX_INDEXED_BYTES are only partly in the index; the regex runs over them from disk
+        capped = f"docs.path IN (SELECT path FROM files WHERE size > ? AND ext IN ({','.join('?' * len(TEXT_EXTENSIONS))}))"
+        found = self.fulltext.trigrams.search(pattern, limit, ignore_case, join, where, params,
+                                              capped, (MAX_INDEXED_BYTES, *sorted(TEXT_EXTENSIONS)), self._read_full)
+        records = self.store.get_many([r["path"] for r in found["results"]])
+        for result in found["results"]:
+            record = records.get(result["path"])
+            if record:
+                result.update({k: v for k, v in record.to_dict().items() if k != "preview"})
+        return found
+    
+    def _read_full(self, rel_path: str) -> tuple:
+        """(contents up to MAX_REGEX_BYTES, whether the file is longer still) for the regex pass"""
+        try:
+            with open(os.path.join(self.brain_path, rel_path), 'rb') as f:
+                data = f.read(MAX_REGEX_BYTES + 1)
+        except OSError:
+            return '', False
+        return data[:MAX_REGEX_BYTES].decode('utf-8-sig', errors='ignore'), len(data) > MAX_REGEX_BYTES
+    
+    def find_symbol(self, name: str, mode: str = 'auto', kind: str = None, limit: int = 50) -> dict:
+        """Where a class, function, method, module-level variable or import is defined"""
+        used, results = self.symbols.lookup(name, mode, kind, limit)
+        return {"mode": used, "results": results}
+    
+    def search_semantic(self, query: str, limit: int = 20, filters: dict = None) -> dict:
+        """Files conceptually close to the query, by embedding similarity of their chunks. `pending`
+        counts chunks still waiting to be embedded (they can't match yet)."""
+        where, params = self._filter_sql(filters or {})
+        # Filters apply after ranking, so ask for more files than needed
+        found = self.semantic.search(query, limit * 5 if where else limit)
+        if where:
+            paths = [r["path"] for r in found["results"]]
+            with self.store.lock:
+                allowed = {row[0] for row in self.store.conn.execute(
+                    f'SELECT path FROM files WHERE path IN ({",".join("?" * len(paths))}) AND {where}', (*paths, *params)
+                )} if paths else set()
+            found["results"] = [r for r in found["results"] if r["path"] in allowed][:limit]
+        records = self.store.get_many([r["path"] for r in found["results"]])
+        for result in found["results"]:
+            record = records.get(result["path"])
+            if record:
+                result.update({k: v for k, v in record.to_dict().items() if k != "preview"})
+        return found
     
     def get_by_type(self, file_type: str) -> list:
-        """Get all files of a specific type"""
-        return [
-            {"path": path, **info}
-            for path, info in self.index.get("files", {}).items()
-            if info.get("type") == file_type
-        ]
+        """Get all files of a specific type (a lookup on the type index)"""
+        return [{"path": r.path, **r.to_dict()} for r in self.store.iter_records('WHERE type = ?', (file_type,))]
     
     def get_structure(self) -> dict:
-        """Get directory structure summary"""
-        structure = {}
-        for path in self.index.get("files", {}).keys():
-            parts = path.split(os.sep)
-            if len(parts) > 1:
-                folder = parts[0]
-                if folder not in structure:
-                    structure[folder] = []
-                structure[folder].append(path)
-        return {k: len(v) for k, v in structure.items()}
+        """Get directory structure summary (counted off the top_dir index)"""
+        return self.store.top_level_counts()
@@ -0,0 +1,149 @@
+import json
+import re
+
+from system.memory_store import estimate_tokens
+
+ROLE_LABELS = {'user': 'User', 'assistant': 'Assistant'}
+TRANSCRIPT_CHARS = 2000  # per message, in what the summarizer is sent
+SUMMARY_LINE_CHARS = 200  # per message, in the extractive fallback
+
+def _text(message: dict) -> str:
+    content = message.get('content')
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+def message_tokens(message: dict) -> int:
+    '''Estimated cost of one message, including a few tokens of role framing'''
+    return estimate_tokens(_text(message)) + 4
+
+def transcript(messages: list, limit: int = TRANSCRIPT_CHARS) -> str:
+    return '\n'.join(f"{ROLE_LABELS.get(m['role'], m['role'])}: {_text(m)[:limit]}" for m in messages)
+
+def extractive_summary(previous: str, messages: list, max_tokens: int) -> str:
+    '''Fallback when no summarizer is available: the previous summary plus the opening sentence of each
+    folded message, dropping the oldest lines until it fits max_tokens'''
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        text = ' '.join(_text(message).split())
+        if text:
+            first = re.split(r'(?<=[.!?])\s', text, maxsplit=1)[0][:SUMMARY_LINE_CHARS]
+            lines.append(f"- {ROLE_LABELS.get(message['role'], message['role'])}: {first}")
+    while lines and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+class ConversationCompactor:
+    '''The chat history, with an estimated token count per message. Once a request would exceed
+    budget_tokens, the oldest turns are folded into a rolling summary (via `summarize`, or extractively
+    if that fails) until what is left fits keep_recent_tokens; the most recent user turn is always kept
+    verbatim. Each compaction and turn is checkpointed through the TokenManager, and restore() picks a
+    checkpoint back up.
+
+    `summarize(previous_summary, transcript, max_tokens) -> str` is the model call; it may raise.'''
+
+    def __init__(self, token_manager, summarize=None, budget_tokens: int = None, keep_recent_tokens: int = None,
+                 summary_tokens: int = 800):
+        self.token_manager = token_manager
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens or token_manager.checkpoint_interval
+        self.keep_recent_tokens = keep_recent_tokens or self.budget_tokens // 3
+        self.summary_tokens = summary_tokens
+        self.messages = []
+        self.tokens = []  # parallel to messages
+        self.summary = ''
+        self.overhead = 0  # system prompt and tool definitions, learned from reported usage
+        self.stats = {'compactions': 0, 'summarized_messages': 0, 'fallbacks': 0, 'tokens_saved': 0}
+
+    def add(self, role: str, content):
+        message = {'role': role, 'content': content}
+        self.messages.append(message)
+        self.tokens.append(message_tokens(message))
+
+    def pop(self) -> dict:
+        '''Take back the last message (a turn the API rejected)'''
+        self.tokens.pop()
+        return self.messages.pop()
+
+    def observe(self, input_tokens: int):
+        '''Record the input tokens the API reported for a request made with exactly `messages`; whatever
+        the messages and summary don't account for is the fixed cost of each request'''
+        self.overhead = max(0, input_tokens - sum(self.tokens) - estimate_tokens(self.summary))
+
+    @property
+    def total_tokens(self) -> int:
+        '''Estimated input tokens of the next request'''
+        return self.overhead + estimate_tokens(self.summary) + sum(self.tokens)
+
+    def _cut(self) -> int:
+        '''Index of the first message to keep: the oldest user turn from which the rest fits
+        keep_recent_tokens, but never later than the last user turn'''
+        cut, kept = len(self.messages), 0
+        for i in range(len(self.messages) - 1, -1, -1):
+            kept += self.tokens[i]
+            if self.messages[i]['role'] == 'user' and isinstance(self.messages[i]['content'], str):
+                if kept > self.keep_recent_tokens and cut < len(self.messages):
+                    break
+                cut = i
+        return cut
+
+    def _summarize(self, older: list, extractive: bool = False) -> str:
+        if self.summarize and not extractive:
+            try:
+                summary = (self.summarize(self.summary, transcript(older), self.summary_tokens) or '').strip()
+                if summary:
+                    return summary[:self.summary_tokens * 4]
+            except Exception as e:
+                print(f'[COMPACT] Summarizer failed, falling back to an extractive summary: {e}')
+        if not extractive:
+            self.stats['fallbacks'] += 1
+        return extractive_summary(self.summary, older, self.summary_tokens)
+
+    def compact(self, force: bool = False, extractive: bool = False) -> bool:
+        '''Fold older turns into the summary if over budget (or regardless, with force). extractive=True
+        skips the summarizer call, for error paths that shouldn't block on a model. Returns whether
+        anything was folded.'''
+        if not force and self.total_tokens <= self.budget_tokens:
+            return False
+        cut = self._cut()
+        if cut == 0:
+            return False
+        before = self.total_tokens
+        self.summary = self._summarize(self.messages[:cut], extractive)
+        del self.messages[:cut]
+        del self.tokens[:cut]
+        self.stats['compactions'] += 1
+        self.stats['summarized_messages'] += cut
+        self.stats['tokens_saved'] += max(0, before - self.total_tokens)
+        self.checkpoint()
+        return True
+
+    def checkpoint(self) -> str:
+        return self.token_manager.checkpoint(self.messages, {'summary': self.summary, 'stats': self.stats},
+                                             keep=len(self.messages))
+
+    def restore(self, checkpoint_file: str = None):
+        '''Replace the history with a checkpoint's (the latest one if no file is given). Returns the
+        checkpoint data, or None if there was nothing to restore.'''
+        data = self.token_manager.restore(checkpoint_file)
+        if not data:
+            return None
+        self.messages, self.tokens = [], []
+        for message in data.get('conversation') or []:
+            if message.get('role') in ROLE_LABELS and message.get('content'):
+                self.add(message['role'], message['content'])
+        # Checkpoints that kept only the last N messages may open mid-turn; a request must start with the user
+        while self.messages and self.messages[0]['role'] != 'user':
+            self.messages.pop(0)
+            self.tokens.pop(0)
+        context = data.get('context') or {}
+        self.summary = context.get('summary', '')
+        self.stats.update(context.get('stats') or {})
+        return data
+
+    def get_stats(self) -> dict:
+        return {
+            'messages': len(self.messages),
+            'estimated_tokens': self.total_tokens,
+            'budget_tokens': self.budget_tokens,
+            'summary_tokens': estimate_tokens(self.summary) if self.summary else 0,
+            **self.stats
+        }
@@ -0,0 +1,105 @@
+import fnmatch
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_IGNORE = ['.venv', '__pycache__', 'Logs', 'node_modules', '.git']
+# State the server itself writes while running; skipped whatever the profile says, or every /view and
+# write-behind flush would show up as a change and bump the index generation
+STATE_FILES = ['system/session_state.db*', 'system/memory.db*', 'system/directory_cache.json',
+               'system/brain_memory.json', '*.json.lock']
+
+class SkipRules:
+    '''Ignore patterns from config/ops_profile.json. A bare name ("node_modules") matches that file or
+    directory anywhere, a glob without a slash ("*.pyc") matches names, and an entry with a slash
+    ("system/response_cache") matches relative paths from the root.'''
+
+    def __init__(self, patterns: list, skip_hidden_files: bool = True):
+        self.patterns = list(patterns)
+        self.skip_hidden_files = skip_hidden_files
+        self.names = set()
+        self.name_globs = []
+        self.path_globs = []
+        for pattern in self.patterns:
+            pattern = pattern.replace('\\', '/').strip('/')
+            if '/' in pattern:
+                self.path_globs.append(pattern)
+            elif any(c in pattern for c in '*?['):
+                self.name_globs.append(pattern)
+            elif pattern:
+                self.names.add(pattern)
+
+    def skip_name(self, name: str) -> bool:
+        return name in self.names or any(fnmatch.fnmatch(name, g) for g in self.name_globs)
+
+    def skip_entry(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        '''Check one entry while crawling; its parents were already checked'''
+        if not is_dir and self.skip_hidden_files and name.startswith('.'):
+            return True
+        if self.skip_name(name):
+            return True
+        return bool(self.path_globs) and any(fnmatch.fnmatch(rel_path.replace(os.sep, '/'), g) for g in self.path_globs)
+
+    def skip_path(self, rel_path: str) -> bool:
+        '''Check a relative path from outside a crawl (watcher events): every component counts'''
+        parts = rel_path.replace('\\', '/').split('/')
+        for i, part in enumerate(parts):
+            if self.skip_entry('/'.join(parts[:i + 1]), part, i < len(parts) - 1):
+                return True
+        return False
+
+def load_skip_rules(profile: dict = None) -> SkipRules:
+    if profile is None:
+        try:
+            from workshop.ops_profile import load_ops_profile
+            profile = load_ops_profile()
+        except ImportError:
+            profile = {}
+    return SkipRules((profile.get('ignore') or DEFAULT_IGNORE) + STATE_FILES)
+
+def crawl(root: str, rules: SkipRules, top: str = None):
+    '''Yield (rel_path, full_path, stat) for every file under `top` (default: root).
+    Uses os.scandir so type checks come from the directory entry and stats are cached per entry.'''
+    stack = [top or root]
+    while stack:
+        directory = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                rel_path = os.path.relpath(entry.path, root)
+                try:
+                    is_dir = entry.is_dir()
+                    if rules.skip_entry(rel_path, entry.name, is_dir):
+                        continue
+                    if is_dir:
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        if not stat.st_ino:
+                            # Windows directory entries carry no inode; os.stat has it, and watcher
+                            # updates use os.stat, so both must agree or the file is re-read every crawl
+                            stat = os.stat(entry.path)
+                        yield rel_path, entry.path, stat
+                except OSError:
+                    continue
+
+def map_bounded(fn, items, workers: int = 8, window: int = 256):
+    '''Yield (item, fn(item)) in input order, running fn on a thread pool with at most `window` items in flight.
+    File reads release the GIL, so this overlaps I/O without holding the whole tree in memory.'''
+    if workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+    with ThreadPoolExecutor(workers, thread_name_prefix='crawl') as pool:
+        pending = deque()
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            if len(pending) >= window:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from system.json_store import WriteBehindStore
+
+DIR_CACHE_FILE = "system/directory_cache.json"
+LIST_LIMIT = 50
+# A directory modified this close to the scan may change again within the same mtime tick
+RACY_WINDOW_NS = 2_000_000_000
+
+class DirectoryCache:
+    '''Bounded LRU of directory listings, each validated against the directory's mtime on every hit.
+    Also invalidated by FileWatcher events when watching. Persisted to its own file, not the session state.'''
+
+    def __init__(self, root: str, max_entries: int = 512, cache_file: str = DIR_CACHE_FILE):
+        self.root = root
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.store = WriteBehindStore(cache_file, {"entries": {}}, timestamp_key=None)
+        self.entries = self.store.data.setdefault("entries", {})
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(path or '.').replace('\\', '/')
+
+    def _scan(self, full_path: str) -> list:
+        items = []
+        with os.scandir(full_path) as it:
+            for entry in it:
+                items.append({'name': entry.name, 'type': 'dir' if entry.is_dir() else 'file'})
+                if len(items) >= LIST_LIMIT:
+                    break
+        return items
+
+    def list(self, path: str) -> tuple:
+        '''Return (items, from_cache). Raises FileNotFoundError/NotADirectoryError for bad paths.'''
+        key = self._key(path)
+        full_path = os.path.join(self.root, key)
+        mtime_ns = os.stat(full_path).st_mtime_ns
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry and entry['mtime_ns'] == mtime_ns and entry['scanned_ns'] - mtime_ns > RACY_WINDOW_NS:
+                self.entries[key] = entry
+                self.stats['hits'] += 1
+                return entry['items'], True
+            self.stats['stale' if entry else 'misses'] += 1
+        scanned_ns = time.time_ns()
+        items = self._scan(full_path)
+        with self.store.lock, self.lock:
+            self.entries[key] = {'mtime_ns': mtime_ns, 'scanned_ns': scanned_ns, 'items': items,
+                                 'cached_at': datetime.now().isoformat()}
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+        self.store.mark_dirty()
+        return items, False
+
+    def invalidate(self, path: str):
+        with self.store.lock, self.lock:
+            removed = self.entries.pop(self._key(path), None)
+        if removed:
+            self.store.mark_dirty()
+
+    def paths(self) -> list:
+        with self.lock:
+            return list(self.entries)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {**self.stats, 'entries': len(self.entries)}
+
+    def on_change(self, paths: set):
+        '''FileWatcher callback: drop the listings of the directories containing the changed paths'''
+        root = os.path.abspath(self.root)
+        for changed in paths:
+            self.invalidate(os.path.relpath(changed, root))
+            self.invalidate(os.path.relpath(os.path.dirname(changed), root))
+
+    def close(self):
+        self.store.close()
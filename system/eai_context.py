@@ -1,5 +1,6 @@
-﻿import json
-import os
+﻿import os
+
+from system.json_store import StateStore
 
 CONTEXT_FILE = "system/eai_context.json"
 
@@ -56,19 +57,13 @@ DEFAULT_CONTEXT = {
     ]
 }
 
+context_store = StateStore(CONTEXT_FILE, DEFAULT_CONTEXT)
+
 def load_eai_context():
-    try:
-        if os.path.exists(CONTEXT_FILE):
-            with open(CONTEXT_FILE, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    return DEFAULT_CONTEXT
+    return context_store.read()
 
 def save_eai_context(context):
-    os.makedirs(os.path.dirname(CONTEXT_FILE), exist_ok=True)
-    with open(CONTEXT_FILE, 'w') as f:
-        json.dump(context, f, indent=2)
+    context_store.save(context)
 
 def get_eai_system_prompt(task_description: str) -> str:
     ctx = load_eai_context()
@@ -0,0 +1,112 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+READ_LIMIT = 8000
+MAX_READ = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+LINE_MARK_EVERY = 1000
+
+# full path -> (etag, [byte offset of line 1, 1 + LINE_MARK_EVERY, 1 + 2 * LINE_MARK_EVERY, ...])
+_line_marks = OrderedDict()
+_line_marks_lock = threading.Lock()
+_LINE_MARKS_MAX = 64
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+def read_head(full_path: str, limit: int = READ_LIMIT) -> dict:
+    '''First `limit` characters, without reading the rest of the file'''
+    with open(full_path, 'r', encoding='utf-8', errors='replace') as f:
+        content = f.read(limit + 1)
+    return {'content': content[:limit], 'truncated': len(content) > limit}
+
+def read_bytes(full_path: str, offset: int = 0, length: int = None) -> dict:
+    '''Byte range [offset, offset + length) decoded as UTF-8; next_offset continues the read'''
+    size = os.path.getsize(full_path)
+    offset = max(0, min(offset or 0, size))
+    length = max(0, min(READ_LIMIT if length is None else length, MAX_READ))
+    with open(full_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    end = offset + len(data)
+    return {
+        'content': data.decode('utf-8', errors='replace'),
+        'offset': offset,
+        'next_offset': end if end < size else None,
+        'truncated': end < size
+    }
+
+def _marks_for(full_path: str, f, etag: str, needed: int) -> list:
+    '''Line-start checkpoints up to index `needed`, extended with mmap scans and cached per etag'''
+    with _line_marks_lock:
+        cached = _line_marks.get(full_path)
+        marks = list(cached[1]) if cached and cached[0] == etag else [0]
+    if needed >= len(marks) and os.fstat(f.fileno()).st_size:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = marks[-1]
+            while len(marks) <= needed and pos != -1:
+                for _ in range(LINE_MARK_EVERY):
+                    pos = mm.find(b'\n', pos)
+                    if pos == -1:
+                        break
+                    pos += 1
+                else:
+                    marks.append(pos)
+    with _line_marks_lock:
+        _line_marks[full_path] = (etag, marks)
+        _line_marks.move_to_end(full_path)
+        while len(_line_marks) > _LINE_MARKS_MAX:
+            _line_marks.popitem(last=False)
+    return marks
+
+def read_lines(full_path: str, etag: str, start_line: int = 1, end_line: int = None, limit: int = READ_LIMIT) -> dict:
+    '''1-based inclusive line range; seeks through cached checkpoints instead of scanning from the top'''
+    start_line = max(1, start_line or 1)
+    with open(full_path, 'rb') as f:
+        marks = _marks_for(full_path, f, etag, (start_line - 1) // LINE_MARK_EVERY)
+        mark = min((start_line - 1) // LINE_MARK_EVERY, len(marks) - 1)
+        f.seek(marks[mark])
+        for _ in range(start_line - 1 - mark * LINE_MARK_EVERY):
+            if not f.readline():
+                break
+        lines, used, line_no = [], 0, start_line
+        truncated = eof = False
+        while end_line is None or line_no <= end_line:
+            raw = f.readline()
+            if not raw:
+                eof = True
+                break
+            text = raw.decode('utf-8', errors='replace')
+            if used + len(text) > limit:
+                truncated = True
+                if not lines:
+                    # A single line longer than the limit: return its head and move past it
+                    lines.append(text[:limit])
+                    line_no += 1
+                break
+            lines.append(text)
+            used += len(text)
+            line_no += 1
+        more = truncated or (not eof and bool(f.readline()))
+    return {
+        'content': ''.join(lines),
+        'start_line': start_line,
+        'end_line': start_line + len(lines) - 1,
+        'next_line': line_no if more else None,
+        'truncated': truncated
+    }
+
+def iter_file(full_path: str, offset: int = 0, length: int = None):
+    '''Yield the file in CHUNK_SIZE pieces, for streaming responses'''
+    remaining = length
+    with open(full_path, 'rb') as f:
+        f.seek(offset or 0)
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,81 @@
+import os
+import threading
+
+from system.crawler import SkipRules, load_skip_rules
+
+class FileWatcher:
+    '''One recursive watchdog observer over the brain tree, shared by the caches and indexes that need it.
+    Events are coalesced: subscribers receive the set of changed absolute paths once things go quiet
+    for `debounce` seconds. Without watchdog installed, start() returns False and nothing is delivered.'''
+
+    def __init__(self, root: str, debounce: float = 0.5, skip_rules: SkipRules = None):
+        self.root = os.path.abspath(root)
+        self.debounce = debounce
+        self.skip_rules = skip_rules or load_skip_rules()
+        self.subscribers = []
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.timer = None
+        self.observer = None
+        self.batches = 0
+
+    def subscribe(self, callback):
+        '''callback(paths: set) is called from a timer thread'''
+        self.subscribers.append(callback)
+
+    def _ignored(self, path: str) -> bool:
+        rel = os.path.relpath(path, self.root)
+        return rel.startswith('..') or self.skip_rules.skip_path(rel)
+
+    def notify(self, *paths):
+        with self.lock:
+            self.pending.update(os.fsdecode(p) for p in paths if p and not self._ignored(os.fsdecode(p)))
+            if not self.pending:
+                return
+            if self.timer:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.debounce, self._deliver)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _deliver(self):
+        with self.lock:
+            paths, self.pending, self.timer = self.pending, set(), None
+        if not paths:
+            return
+        self.batches += 1
+        for callback in self.subscribers:
+            try:
+                callback(paths)
+            except Exception as e:
+                print(f'[WATCH] {getattr(callback, "__qualname__", callback)} failed: {e}')
+
+    def start(self) -> bool:
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return False
+        watcher = self
+
+        class Forward(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type not in ('opened', 'closed_no_write'):
+                    watcher.notify(event.src_path, getattr(event, 'dest_path', ''))
+
+        self.observer = Observer()
+        self.observer.schedule(Forward(), self.root, recursive=True)
+        self.observer.daemon = True
+        self.observer.start()
+        return True
+
+    def get_stats(self) -> dict:
+        return {'watching': self.observer is not None, 'batches': self.batches, 'pending': len(self.pending)}
+
+    def close(self):
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+        if self.observer:
+            self.observer.stop()
+            self.observer = None
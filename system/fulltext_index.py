@@ -0,0 +1,179 @@
+import re
+import sqlite3
+import threading
+
+from system.index_store import INDEX_DB, open_index_db
+
+FULLTEXT_DB = INDEX_DB
+# bm25 column weights for (path, name, body), in the spirit of the old 10/20/5 substring scores
+COLUMN_WEIGHTS = (10.0, 20.0, 1.0)
+
+def build_match(query: str, any_term: bool = False) -> str:
+    '''Turn a user query into an FTS5 MATCH expression: "quoted phrases" stay phrases, bare words become prefix terms'''
+    phrases = [p.replace('"', ' ').strip() for p in re.findall(r'"([^"]*)"?', query)]
+    terms = re.findall(r'\w+', re.sub(r'"[^"]*"?', ' ', query))
+    parts = [f'"{p}"' for p in phrases if p] + [f'"{t}"*' for t in terms]
+    return (' OR ' if any_term else ' AND ').join(parts)
+
+class FullTextIndex:
+    '''SQLite FTS5 inverted index over file paths, names and contents, ranked with BM25'''
+
+    def __init__(self, db_path: str = FULLTEXT_DB, conn: sqlite3.Connection = None, lock=None):
+        '''Pass conn and lock to share a connection (and so transactions) with another store'''
+        # A TrigramIndex over the stored bodies, attached by the owner once `docs` exists
+        self.trigrams = None
+        self.lock = lock or threading.RLock()
+        self.conn = conn or open_index_db(db_path)
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5("
+            "path, name, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        # FTS5 can only look rows up by rowid cheaply; a WHERE on a column scans the whole table
+        self.conn.execute('CREATE TABLE IF NOT EXISTS doc_ids (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL)')
+        if not self.conn.execute('SELECT 1 FROM doc_ids LIMIT 1').fetchone():
+            # Rows from before doc_ids existed can't be addressed; drop them and let the next reindex rebuild
+            self.conn.execute('DELETE FROM docs')
+
+    def batch(self):
+        '''Use as `with index.batch():` to apply many changes in one transaction'''
+        return _Batch(self)
+
+    def upsert(self, path: str, name: str, body: str):
+        with self.lock:
+            row = self.conn.execute('SELECT id FROM doc_ids WHERE path = ?', (path,)).fetchone()
+            if row:
+                doc_id = row[0]
+                self._delete_doc(doc_id)
+            else:
+                doc_id = self.conn.execute('INSERT INTO doc_ids (path) VALUES (?)', (path,)).lastrowid
+            self.conn.execute('INSERT INTO docs (rowid, path, name, body) VALUES (?, ?, ?, ?)', (doc_id, path, name, body or ''))
+            if self.trigrams:
+                self.trigrams.add(doc_id, body or '')
+
+    def _delete_doc(self, doc_id: int):
+        if self.trigrams:
+            old = self.conn.execute('SELECT body FROM docs WHERE rowid = ?', (doc_id,)).fetchone()
+            if old:
+                self.trigrams.remove(doc_id, old[0])
+        self.conn.execute('DELETE FROM docs WHERE rowid = ?', (doc_id,))
+
+    def delete(self, path: str):
+        with self.lock:
+            row = self.conn.execute('SELECT id FROM doc_ids WHERE path = ?', (path,)).fetchone()
+            if row:
+                self._delete_doc(row[0])
+                self.conn.execute('DELETE FROM doc_ids WHERE id = ?', (row[0],))
+
+    def rename(self, old_path: str, new_path: str, name: str):
+        '''Move a document without re-tokenizing its body (trigram postings are keyed by rowid)'''
+        with self.lock:
+            row = self.conn.execute('SELECT id FROM doc_ids WHERE path = ?', (old_path,)).fetchone()
+            if row:
+                self.conn.execute('UPDATE doc_ids SET path = ? WHERE id = ?', (new_path, row[0]))
+                self.conn.execute('UPDATE docs SET path = ?, name = ? WHERE rowid = ?', (new_path, name, row[0]))
+
+    def clear(self):
+        with self.lock:
+            if self.trigrams:
+                self.trigrams.clear()
+            self.conn.execute('DELETE FROM docs')
+            self.conn.execute('DELETE FROM doc_ids')
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT count(*) FROM docs').fetchone()[0]
+
+    def search(self, query: str, limit: int = 20) -> list:
+        '''Top-k matches as dicts with path, score (higher is better) and a body snippet'''
+        results = []
+        for any_term in (False, True):
+            match = build_match(query, any_term)
+            if not match:
+                return []
+            with self.lock:
+                try:
+                    rows = self.conn.execute(
+                        "SELECT path, bm25(docs, ?, ?, ?) AS rank, snippet(docs, 2, '[', ']', '…', 12) "
+                        "FROM docs WHERE docs MATCH ? ORDER BY rank LIMIT ?",
+                        (*COLUMN_WEIGHTS, match, limit)
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    return []
+            results = [{'path': path, 'score': round(-rank, 3), 'snippet': snippet} for path, rank, snippet in rows]
+            # Every term must match first; fall back to any term only when that finds nothing
+            if results or ' ' not in match:
+                break
+        return results
+
+    def resolve_match(self, query: str, join: str = '', where: str = '', params: tuple = ()):
+        '''The MATCH expression to rank `query` by: every term, or any term when every term finds nothing
+        (like search()). `join`/`where` are SQL fragments bound by `params`. None when nothing can match.'''
+        match = None
+        for any_term in (False, True):
+            match = build_match(query, any_term)
+            if not match:
+                return None
+            with self.lock:
+                try:
+                    found = self.conn.execute(
+                        f"SELECT 1 FROM docs {join} WHERE docs MATCH ? {'AND ' + where if where else ''} LIMIT 1",
+                        (match, *params)
+                    ).fetchone()
+                except sqlite3.OperationalError:
+                    return None
+            if found or ' ' not in match:
+                break
+        return match
+
+    def ranked(self, match: str, limit: int, after: tuple = None, join: str = '', where: str = '', params: tuple = ()) -> list:
+        '''Up to `limit` (rowid, path, bm25 rank) rows for a resolve_match() expression, ordered by (rank, path)
+        and starting past the (rank, path) key `after`. Ordering and paging happen in SQLite, so only the
+        page is ever loaded.'''
+        rank = 'bm25(docs, ?, ?, ?)'
+        clauses, bound = [], []
+        if where:
+            clauses.append(where)
+            bound.extend(params)
+        if after is not None:
+            # The alias can't be used here: `rank` in a WHERE is the table's own (unweighted) rank column
+            clauses.append(f'({rank} > ? OR ({rank} = ? AND docs.path > ?))')
+            bound.extend((*COLUMN_WEIGHTS, after[0], *COLUMN_WEIGHTS, after[0], after[1]))
+        with self.lock:
+            try:
+                return self.conn.execute(
+                    f"SELECT docs.rowid, docs.path, {rank} AS rank FROM docs {join} WHERE docs MATCH ? "
+                    f"{''.join(' AND ' + c for c in clauses)} ORDER BY rank, docs.path LIMIT ?",
+                    (*COLUMN_WEIGHTS, match, *bound, limit)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                return []
+
+    def snippets(self, match: str, rowids: list) -> dict:
+        '''rowid -> highlighted body snippet for a few rows of a ranked() page'''
+        if not match or not rowids:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT rowid, snippet(docs, 2, '[', ']', '…', 12) FROM docs "
+                f"WHERE docs MATCH ? AND rowid IN ({','.join('?' * len(rowids))})", (match, *rowids)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class _Batch:
+    def __init__(self, index: FullTextIndex):
+        self.index = index
+
+    def __enter__(self):
+        self.index.lock.acquire()
+        self.index.conn.execute('BEGIN')
+        return self.index
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.index.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.index.lock.release()
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+INDEX_DB = "system/brain_index.db"
+# Let SQLite read the database through a shared memory map instead of read() calls
+MMAP_BYTES = 256 * 1024 * 1024
+# Width of the modified-time buckets the bucket index groups files into (one day)
+MTIME_BUCKET_NS = 86400 * 10**9
+# Generations of the change feed kept; clients further behind are told to resync
+CHANGE_LOG_GENERATIONS = 10000
+
+def open_index_db(db_path: str = INDEX_DB) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA mmap_size={MMAP_BYTES}')
+    return conn
+
+class FileRecord:
+    '''One indexed file. Slots keep the per-record overhead to a single small object (no __dict__).
+    `hash` is the blake2b digest of the contents, computed when the size or mtime changes.'''
+    __slots__ = ('path', 'name', 'ext', 'type', 'size', 'mtime_ns', 'inode', 'preview', 'hash')
+
+    def __init__(self, path, name, ext, type, size, mtime_ns, inode, preview, hash=None):
+        self.path = path
+        self.name = name
+        self.ext = ext
+        self.type = type
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.preview = preview
+        self.hash = hash
+
+    def signature(self) -> tuple:
+        return (self.mtime_ns, self.size, self.inode)
+
+    def to_dict(self) -> dict:
+        '''The shape search results and the /search API have always used'''
+        return {
+            "name": self.name,
+            "ext": self.ext,
+            "size": self.size,
+            "modified": datetime.fromtimestamp(self.mtime_ns / 1e9).isoformat() if self.mtime_ns else None,
+            "type": self.type,
+            "preview": self.preview,
+            "hash": self.hash
+        }
+
+COLUMNS = ', '.join(FileRecord.__slots__)
+
+def top_dir(path: str):
+    '''First path component, None for files at the root'''
+    return path.split(os.sep, 1)[0] if os.sep in path else None
+
+class IndexStore:
+    '''File records in an SQLite table, read on demand. Opening the store costs nothing per file:
+    rows are only materialized for the paths a caller asks about.'''
+
+    def __init__(self, db_path: str = INDEX_DB):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = open_index_db(db_path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, name TEXT NOT NULL, ext TEXT, type TEXT, size INTEGER, '
+            'mtime_ns INTEGER, inode INTEGER, preview TEXT, hash TEXT) WITHOUT ROWID'
+        )
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(files)')]
+        if 'hash' not in columns:
+            self.conn.execute('ALTER TABLE files ADD COLUMN hash TEXT')
+        if 'top_dir' not in columns:
+            # Derived columns for the secondary indexes; filled in place, nothing needs re-reading
+            self.conn.execute('ALTER TABLE files ADD COLUMN top_dir TEXT')
+            self.conn.execute('ALTER TABLE files ADD COLUMN bucket INTEGER')
+            self.conn.execute(
+                'UPDATE files SET top_dir = CASE WHEN instr(path, ?) > 0 THEN substr(path, 1, instr(path, ?) - 1) END, '
+                'bucket = mtime_ns / ?', (os.sep, os.sep, MTIME_BUCKET_NS)
+            )
+        for column in ('type', 'ext', 'top_dir', 'bucket'):
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS files_{column} ON files ({column})')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        # The change feed: one row per added/changed/removed/renamed path, tagged with the index generation
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS changes (generation INTEGER NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL, old_path TEXT)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS changes_generation ON changes (generation)')
+
+    def get(self, path: str):
+        with self.lock:
+            row = self.conn.execute(f'SELECT {COLUMNS} FROM files WHERE path = ?', (path,)).fetchone()
+        return FileRecord(*row) if row else None
+
+    def get_many(self, paths: list) -> dict:
+        found = {}
+        with self.lock:
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                rows = self.conn.execute(
+                    f'SELECT {COLUMNS} FROM files WHERE path IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                found.update((row[0], FileRecord(*row)) for row in rows)
+        return found
+
+    def signatures(self) -> dict:
+        '''path -> ((mtime_ns, size, inode), hash) for diffing a crawl against the index'''
+        with self.lock:
+            return {row[0]: (row[1:4], row[4])
+                    for row in self.conn.execute('SELECT path, mtime_ns, size, inode, hash FROM files')}
+
+    def iter_records(self, where: str = '', params: tuple = ()):
+        with self.lock:
+            rows = self.conn.execute(f'SELECT {COLUMNS} FROM files {where}', params).fetchall()
+        return (FileRecord(*row) for row in rows)
+
+    def paths_under(self, rel_path: str) -> list:
+        '''The path itself and everything below it, as a range scan on the primary key'''
+        prefix = rel_path + os.sep
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT path FROM files WHERE path = ? OR (path > ? AND path < ?)',
+                (rel_path, prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def top_level_counts(self) -> dict:
+        '''Files per top-level directory (files at the root are not counted); read off the top_dir index'''
+        with self.lock:
+            rows = self.conn.execute('SELECT top_dir, count(*) FROM files WHERE top_dir IS NOT NULL GROUP BY top_dir').fetchall()
+        return dict(rows)
+
+    def put(self, record: FileRecord):
+        with self.lock:
+            self.conn.execute(
+                f'INSERT OR REPLACE INTO files ({COLUMNS}, top_dir, bucket) VALUES ({",".join("?" * (len(FileRecord.__slots__) + 2))})',
+                (*(getattr(record, field) for field in FileRecord.__slots__), top_dir(record.path),
+                 record.mtime_ns // MTIME_BUCKET_NS if record.mtime_ns is not None else None)
+            )
+
+    def delete(self, path: str):
+        with self.lock:
+            self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM files')
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT count(*) FROM files').fetchone()[0]
+
+    def get_meta(self, key: str, default=None):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def generation(self) -> int:
+        return int(self.get_meta('generation', 0))
+
+    def log_changes(self, rows: list, reset: bool = False) -> int:
+        '''Record (kind, path, old_path) rows as the next generation and return it. reset=True marks a
+        rebuild: its rows aren't logged and clients behind it must resync.'''
+        with self.lock:
+            generation = self.generation() + 1
+            if reset:
+                self.conn.execute('DELETE FROM changes')
+                self.set_meta('changes_floor', generation)
+            else:
+                self.conn.executemany('INSERT INTO changes (generation, kind, path, old_path) VALUES (?, ?, ?, ?)',
+                                      [(generation, *row) for row in rows])
+                floor = generation - CHANGE_LOG_GENERATIONS
+                if floor > int(self.get_meta('changes_floor', 0)):
+                    self.conn.execute('DELETE FROM changes WHERE generation <= ?', (floor,))
+                    self.set_meta('changes_floor', floor)
+            self.set_meta('generation', generation)
+            return generation
+
+    def changes_since(self, since: int, limit: int = 1000) -> dict:
+        '''Changes after generation `since`, oldest first. `reset` means the log no longer reaches back
+        that far (or the index was rebuilt) and the client should rescan; so does `truncated`.'''
+        with self.lock:
+            generation = self.generation()
+            if since < int(self.get_meta('changes_floor', 0)):
+                return {'generation': generation, 'changes': [], 'reset': True, 'truncated': False}
+            rows = self.conn.execute(
+                'SELECT generation, kind, path, old_path FROM changes WHERE generation > ? ORDER BY generation, rowid LIMIT ?',
+                (since, limit + 1)
+            ).fetchall()
+        changes = [{'generation': g, 'kind': kind, 'path': path, **({'old_path': old} if old else {})}
+                   for g, kind, path, old in rows[:limit]]
+        return {'generation': generation, 'changes': changes, 'reset': False, 'truncated': len(rows) > limit}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
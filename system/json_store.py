@@ -0,0 +1,288 @@
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+VERSION_KEY = '_version'
+
+def atomic_write_text(path: str, text: str):
+    '''Write to a temp file in the same directory, fsync, then rename over the target'''
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(path: str, data, indent: int = 2):
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock_fd(fd: int):
+        while True:
+            try:
+                # LK_LOCK itself retries for ~10s before giving up; keep waiting like flock does
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_fd(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_fd(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+@contextmanager
+def file_lock(path: str):
+    '''Exclusive advisory lock on `<path>.lock`, held across processes until the block exits.
+    The sidecar is locked rather than the document because atomic writes replace the document's inode.'''
+    fd = os.open(os.fspath(path) + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock_fd(fd)
+        try:
+            yield
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+class VersionConflict(Exception):
+    def __init__(self, expected: int, actual: int):
+        super().__init__(f'expected version {expected}, found {actual}')
+        self.expected = expected
+        self.actual = actual
+
+def rebase(target: dict, base: dict, theirs: dict, counter_keys=()):
+    '''Fold the changes that turned `base` into `theirs` into `target`, in place. Where both sides changed
+    a key, target wins, except for `counter_keys`, whose increments are added together. Nested dicts
+    are merged key by key and keep their identity, so references into `target` stay valid.'''
+    for key in set(base) | set(theirs):
+        if key == VERSION_KEY or base.get(key) == theirs.get(key):
+            continue
+        mine, old, new = target.get(key), base.get(key), theirs.get(key)
+        if isinstance(mine, dict) and isinstance(old, dict) and isinstance(new, dict):
+            rebase(mine, old, new)
+        elif key in counter_keys and all(isinstance(v, (int, float)) for v in (mine, old, new)):
+            target[key] = mine + new - old
+        elif mine == old:
+            if key in theirs:
+                target[key] = copy.deepcopy(new)
+            else:
+                target.pop(key, None)
+
+class StateStore:
+    '''A JSON document shared between processes. Every write holds an advisory file lock and bumps
+    the document's `_version`, so a writer that loaded version N can tell whether anyone else wrote
+    since (compare_and_swap) instead of silently overwriting them. Reads take no lock: writes are
+    atomic renames, so a reader always sees a whole document.'''
+
+    def __init__(self, path: str, default: dict = None):
+        self.path = os.fspath(path)
+        self.default = default or {}
+        self.lock = threading.RLock()  # flock is per open file, so threads sharing a store queue here first
+        self._depth = 0
+        self._lock_cm = None
+        self.stats = {'writes': 0, 'conflicts': 0}
+
+    @contextmanager
+    def locked(self):
+        '''Hold the cross-process lock; reentrant within a thread'''
+        with self.lock:
+            if not self._depth:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._lock_cm = file_lock(self.path)
+                self._lock_cm.__enter__()
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self._lock_cm.__exit__(None, None, None)
+                    self._lock_cm = None
+
+    def load(self) -> tuple:
+        '''(data, version). A missing or unreadable document is the default at version 0.'''
+        try:
+            with open(self.path, 'r', encoding='utf-8-sig') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data, data.pop(VERSION_KEY, 0)
+        except (OSError, ValueError):
+            pass
+        return copy.deepcopy(self.default), 0
+
+    def read(self) -> dict:
+        return self.load()[0]
+
+    def _write(self, data: dict, version: int):
+        atomic_write_text(self.path, json.dumps({**data, VERSION_KEY: version}, indent=2))
+        self.stats['writes'] += 1
+
+    def compare_and_swap(self, data: dict, expected_version: int) -> int:
+        '''Write `data` if the document is still at `expected_version`; return the new version.
+        Raises VersionConflict if another writer got there first.'''
+        with self.locked():
+            current = self.load()[1]
+            if current != expected_version:
+                self.stats['conflicts'] += 1
+                raise VersionConflict(expected_version, current)
+            self._write(data, current + 1)
+            return current + 1
+
+    @contextmanager
+    def transaction(self):
+        '''Read-modify-write under the lock: mutate the yielded document and it is written on exit.
+        Nothing is written if the block raises.'''
+        with self.locked():
+            data, version = self.load()
+            yield data
+            self._write(data, version + 1)
+
+    def save(self, data: dict) -> int:
+        '''Replace the whole document, for callers that mean last-writer-wins'''
+        with self.locked():
+            version = self.load()[1] + 1
+            self._write(data, version)
+            return version
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+class WriteBehindStore:
+    '''A JSON document held in memory and flushed to disk in the background.
+    Mutate `data` while holding `lock`, then call mark_dirty(). Flushes are coalesced:
+    they happen every flush_interval seconds, or sooner once dirty_threshold changes pile up.
+
+    Flushes go through a StateStore. If another process wrote the file since our last flush, its
+    changes are rebased under ours (see rebase) rather than overwritten, and folded back into `data`.'''
+
+    def __init__(self, path: str, default: dict, flush_interval: float = 5.0, dirty_threshold: int = 50,
+                 timestamp_key: str = 'last_updated', counter_keys=()):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.dirty_threshold = dirty_threshold
+        self.timestamp_key = timestamp_key
+        self.counter_keys = tuple(counter_keys)
+        self.lock = threading.RLock()
+        self.state = StateStore(path, default)
+        self.data, self.version = self.state.load()
+        self.base = copy.deepcopy(self.data)  # the document as of `version`, what a rebase diffs against
+        self.dirty = 0
+        self.flushes = 0
+        self.merges = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'write-behind:{os.path.basename(path)}', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def mark_dirty(self, changes: int = 1):
+        with self.lock:
+            self.dirty += changes
+            if self.dirty >= self.dirty_threshold:
+                self._wakeup.set()
+
+    def flush(self) -> bool:
+        with self.lock:
+            if not self.dirty:
+                return False
+            if self.timestamp_key:
+                self.data[self.timestamp_key] = datetime.now().isoformat()
+            text = json.dumps(self.data)
+            self.dirty = 0
+        snapshot, merged = json.loads(text), json.loads(text)
+        try:
+            with self.state.locked():
+                theirs, version = self.state.load()
+                # Version 0 means the file is gone or unreadable: nothing to merge, just write ours back
+                if version and version != self.version:
+                    rebase(merged, self.base, theirs, self.counter_keys)
+                    self.merges += 1
+                self.version = self.state.compare_and_swap(merged, version)
+        except OSError as e:
+            print(f'[STORE] Flush of {self.path} failed: {e}')
+            self.mark_dirty()
+            return False
+        if merged != snapshot:
+            with self.lock:
+                rebase(self.data, snapshot, merged, self.counter_keys)
+        self.base = merged
+        self.flushes += 1
+        return True
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+def _apply_entry(data: dict, entry: dict):
+    *parents, key = entry['path']
+    target = data
+    for part in parents:
+        target = target.setdefault(part, {})
+    if entry['op'] == 'set':
+        target[key] = entry['value']
+    elif entry['op'] == 'del':
+        target.pop(key, None)
+    elif entry['op'] == 'append':
+        items = target.setdefault(key, [])
+        items.append(entry['value'])
+        if entry.get('keep'):
+            del items[:-entry['keep']]
+
+def read_journaled(path: str) -> dict:
+    '''Read a document kept as a JSON snapshot plus a `<path>.journal` of sequence-numbered set/del/append
+    entries, as SessionState was stored before it moved to SQLite'''
+    data = {}
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                data = json.load(f)
+    except (OSError, ValueError):
+        pass
+    seq = data.pop('_journal_seq', 0)
+    try:
+        with open(path + '.journal', 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # a crash mid-append; nothing after it can be trusted
+                if entry['seq'] > seq:
+                    _apply_entry(data, entry)
+                    seq = entry['seq']
+    except FileNotFoundError:
+        pass
+    return data
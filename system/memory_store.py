@@ -0,0 +1,235 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from system.json_store import StateStore
+
+MEMORY_DB = "system/memory.db"
+# The JSON document remember() used to append to (capped at 20 facts); imported once into a new database
+CONVO_MEMORY_FILE = "system/conversation_memory.json"
+
+KINDS = ('key_fact', 'project', 'preference')
+HEADINGS = {'key_fact': 'REMEMBERED FACTS', 'project': 'ONGOING PROJECTS', 'preference': 'USER PREFERENCES'}
+LEGACY_KEYS = {'key_facts': 'key_fact', 'ongoing_projects': 'project', 'user_preferences': 'preference'}
+# Reciprocal rank fusion constant: how much a top rank outweighs a middling one
+RRF_K = 60
+CANDIDATES = 50
+STOPWORDS = frozenset(
+    'the and for are but not you your with this that from have has had was were will would can could '
+    'what when where which who why how all any our out its into about than then them they there these '
+    'those been being just also some more most very should does did doing please lets let make'.split()
+)
+
+# Memories are an external-content porter-stemmed FTS5 table kept in step by triggers, ranked with bm25
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE IF NOT EXISTS memories (id INTEGER PRIMARY KEY, kind TEXT NOT NULL, content TEXT NOT NULL, '
+    'created REAL NOT NULL, used REAL, hits INTEGER NOT NULL DEFAULT 0, model TEXT, vec BLOB, UNIQUE (kind, content))',
+    'CREATE INDEX IF NOT EXISTS memories_model ON memories (model)',
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memory_search USING fts5(content, content='memories', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN '
+    'INSERT INTO memory_search (rowid, content) VALUES (new.id, new.content); END',
+    'CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN '
+    "INSERT INTO memory_search (memory_search, rowid, content) VALUES ('delete', old.id, old.content); END",
+    'CREATE TRIGGER IF NOT EXISTS memories_au AFTER UPDATE OF content ON memories BEGIN '
+    "INSERT INTO memory_search (memory_search, rowid, content) VALUES ('delete', old.id, old.content); "
+    'INSERT INTO memory_search (rowid, content) VALUES (new.id, new.content); END',
+)
+
+def estimate_tokens(text: str) -> int:
+    '''Rough count for budgeting (about four characters per token for English and code)'''
+    return len(text) // 4 + 1
+
+def _terms(text: str) -> list:
+    seen = []
+    for word in re.findall(r'\w+', text.lower()):
+        if len(word) >= 3 and word not in STOPWORDS and word not in seen:
+            seen.append(word)
+    return seen
+
+def _unit(vector) -> array:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return array('f', (v / norm for v in vector))
+
+class MemoryStore:
+    '''Long-term memory for the orchestrator in SQLite (WAL, so several chats can share it). Nothing is
+    dropped: instead of injecting the newest few facts into every prompt, retrieve() ranks all of
+    them against the current user turn (bm25, fused with embedding similarity when an embedder is
+    configured) and returns only the best that fit a token budget.'''
+
+    def __init__(self, db_path: str = MEMORY_DB, legacy_path: str = CONVO_MEMORY_FILE, embedder=None,
+                 token_budget: int = 400, max_memories: int = 10, min_similarity: float = 0.35):
+        self.embedder = embedder
+        self.token_budget = token_budget
+        self.max_memories = max_memories
+        self.min_similarity = min_similarity
+        self.lock = threading.RLock()
+        self.last_retrieval = {'memories': 0, 'tokens': 0}
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.lock:
+            self.conn.execute('BEGIN')
+            fresh = not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'memories'").fetchone()
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+            if fresh:
+                self._migrate(legacy_path)
+            self.conn.execute('COMMIT')
+
+    def _migrate(self, legacy_path: str):
+        '''Carry over conversation_memory.json, oldest first so ids keep their order'''
+        if not os.path.exists(legacy_path):
+            return
+        legacy = StateStore(legacy_path).read()
+        now = time.time()
+        for key, kind in LEGACY_KEYS.items():
+            items = legacy.get(key) or []
+            for i, content in enumerate(items):
+                if isinstance(content, str) and content.strip():
+                    self.conn.execute('INSERT OR IGNORE INTO memories (kind, content, created) VALUES (?, ?, ?)',
+                                      (kind, content.strip(), now - len(items) + i))
+        self.conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES ('sessions', ?)", (str(legacy.get('sessions', 0)),))
+        self.conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES ('migrated_from', ?)", (legacy_path,))
+
+    def start_session(self) -> int:
+        '''Count a new chat session; returns its number'''
+        with self.lock:
+            self.conn.execute("INSERT INTO kv (key, value) VALUES ('sessions', '1') "
+                              "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+            return int(self.conn.execute("SELECT value FROM kv WHERE key = 'sessions'").fetchone()[0])
+
+    def add(self, kind: str, content: str) -> int:
+        '''Store a memory; remembering the same thing again refreshes it rather than duplicating it'''
+        if kind not in KINDS:
+            raise ValueError(f'kind must be one of {", ".join(KINDS)}')
+        content = ' '.join(content.split())
+        if not content:
+            raise ValueError('content is empty')
+        with self.lock:
+            self.conn.execute('INSERT INTO memories (kind, content, created) VALUES (?, ?, ?) '
+                              'ON CONFLICT (kind, content) DO UPDATE SET created = excluded.created',
+                              (kind, content, time.time()))
+            return self.conn.execute('SELECT id FROM memories WHERE kind = ? AND content = ?', (kind, content)).fetchone()[0]
+
+    def forget(self, memory_id: int) -> bool:
+        with self.lock:
+            return self.conn.execute('DELETE FROM memories WHERE id = ?', (memory_id,)).rowcount > 0
+
+    def _lexical(self, query: str) -> list:
+        '''Memory ids sharing terms with the query, best bm25 first'''
+        terms = _terms(query)
+        if not terms:
+            return []
+        match = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                'SELECT rowid FROM memory_search WHERE memory_search MATCH ? ORDER BY bm25(memory_search) LIMIT ?',
+                (match, CANDIDATES)
+            )]
+
+    def embed_pending(self, batch: int = 32) -> int:
+        '''Embed memories stored without a vector for the current model (new ones, or after a model change)'''
+        if not self.embedder:
+            return 0
+        done = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute('SELECT id, content FROM memories WHERE model IS NOT ? LIMIT ?',
+                                         (self.embedder.name, batch)).fetchall()
+            if not rows:
+                return done
+            vectors = self.embedder.embed([content for _, content in rows])
+            with self.lock:
+                self.conn.executemany('UPDATE memories SET model = ?, vec = ? WHERE id = ?',
+                                      [(self.embedder.name, _unit(v).tobytes(), memory_id)
+                                       for (memory_id, _), v in zip(rows, vectors)])
+            done += len(rows)
+
+    def _semantic(self, query: str) -> list:
+        '''Memory ids at least min_similarity from the query, most similar first. Empty (lexical ranking
+        only) when no embedder is configured or it can't be reached.'''
+        if not self.embedder or not query.strip():
+            return []
+        try:
+            self.embed_pending()
+            q = _unit(self.embedder.embed([query])[0])
+        except Exception as e:  # a model server that's down only costs the semantic half of the ranking
+            print(f'[MEMORY] Embedding failed, using lexical ranking only: {e}')
+            return []
+        scored = []
+        with self.lock:
+            for memory_id, blob in self.conn.execute('SELECT id, vec FROM memories WHERE model = ?', (self.embedder.name,)):
+                score = sum(a * b for a, b in zip(q, array('f', blob)))
+                if score >= self.min_similarity:
+                    scored.append((score, memory_id))
+        return [memory_id for _, memory_id in sorted(scored, reverse=True)[:CANDIDATES]]
+
+    def retrieve(self, query: str, token_budget: int = None) -> list:
+        '''Memories relevant to `query`, best first: at most max_memories, whose combined size fits the token budget'''
+        budget = self.token_budget if token_budget is None else token_budget
+        scores = {}
+        for ranking in (self._lexical(query), self._semantic(query)):
+            for rank, memory_id in enumerate(ranking):
+                scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        if not scores:
+            self.last_retrieval = {'memories': 0, 'tokens': 0}
+            return []
+        with self.lock:
+            ids = list(scores)
+            rows = {row[0]: row for row in self.conn.execute(
+                f'SELECT id, kind, content, created FROM memories WHERE id IN ({",".join("?" * len(ids))})', ids
+            )}
+        picked, used = [], 0
+        # Ties (same fused score) go to the newer memory
+        for memory_id in sorted(rows, key=lambda i: (scores[i], rows[i][3]), reverse=True):
+            _, kind, content, _ = rows[memory_id]
+            cost = estimate_tokens(content) + 2
+            if used + cost > budget:
+                continue
+            if len(picked) >= self.max_memories:
+                break
+            picked.append({'id': memory_id, 'kind': kind, 'content': content, 'score': round(scores[memory_id], 4)})
+            used += cost
+        if picked:
+            with self.lock:
+                self.conn.executemany('UPDATE memories SET used = ?, hits = hits + 1 WHERE id = ?',
+                                      [(time.time(), m['id']) for m in picked])
+        self.last_retrieval = {'memories': len(picked), 'tokens': used}
+        return picked
+
+    def format(self, memories: list) -> str:
+        '''Retrieved memories as system prompt sections, one per kind'''
+        sections = []
+        for kind in KINDS:
+            lines = [f"- {m['content']}" for m in memories if m['kind'] == kind]
+            if lines:
+                sections.append(f'{HEADINGS[kind]}:\n' + '\n'.join(lines))
+        return '\n\n'.join(sections)
+
+    def context_for(self, user_turn: str) -> str:
+        return self.format(self.retrieve(user_turn))
+
+    def count(self) -> dict:
+        with self.lock:
+            counts = dict(self.conn.execute('SELECT kind, count(*) FROM memories GROUP BY kind').fetchall())
+        return {kind: counts.get(kind, 0) for kind in KINDS}
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            embedded = self.conn.execute('SELECT count(*) FROM memories WHERE model = ?',
+                                         (self.embedder.name if self.embedder else None,)).fetchone()[0]
+        return {
+            **self.count(),
+            'embedder': self.embedder.name if self.embedder else None,
+            'embedded': embedded,
+            'token_budget': self.token_budget,
+            'max_memories': self.max_memories,
+            'last_retrieval': self.last_retrieval
+        }
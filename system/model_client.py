@@ -0,0 +1,62 @@
+import json
+
+import httpx
+
+OLLAMA_HOST = "http://localhost:11434"
+
+class ModelClient:
+    '''Async Ollama client with one pooled, keep-alive connection set per host'''
+
+    def __init__(self, host: str = OLLAMA_HOST, max_connections: int = 32,
+                 max_keepalive: int = 16, keepalive_expiry: float = 120.0):
+        self.host = host.rstrip('/')
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the server's running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.host, limits=self.limits, timeout=httpx.Timeout(120, connect=5))
+        return self._client
+
+    def build_payload(self, prompt: str, model: str, system: str = None, options: dict = None, stream: bool = False) -> dict:
+        payload = {'model': model, 'prompt': prompt, 'stream': stream, 'options': options or {}}
+        if system:
+            payload['system'] = system
+        return payload
+
+    async def generate(self, prompt: str, model: str, system: str = None, options: dict = None, timeout: float = 120) -> httpx.Response:
+        payload = self.build_payload(prompt, model, system, options)
+        return await self.client.post('/api/generate', json=payload, timeout=httpx.Timeout(timeout, connect=5))
+
+    async def stream(self, prompt: str, model: str, system: str = None, options: dict = None, timeout: float = 120):
+        '''Yield response tokens as Ollama produces them; closing the generator aborts the generation'''
+        payload = self.build_payload(prompt, model, system, options, stream=True)
+        async with self.client.stream('POST', '/api/generate', json=payload, timeout=httpx.Timeout(timeout, connect=5)) as response:
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(f"Ollama returned {response.status_code}", request=response.request, response=response)
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise RuntimeError(chunk['error'])
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    break
+
+    async def tags(self, timeout: float = 2) -> list:
+        response = await self.client.get('/api/tags', timeout=timeout)
+        response.raise_for_status()
+        return [m['name'] for m in response.json().get('models', [])]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+PRIORITY_COMMANDER = 0
+PRIORITY_THINKER = 1
+PRIORITY_SWARM = 2
+
+PRIORITY_NAMES = {PRIORITY_COMMANDER: 'commander', PRIORITY_THINKER: 'thinker', PRIORITY_SWARM: 'swarm'}
+
+class _Waiter:
+    __slots__ = ('priority', 'enqueued', 'granted', 'cancelled', 'event', 'loop', 'future')
+
+    def __init__(self, priority: int, loop=None):
+        self.priority = priority
+        self.enqueued = time.time()
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def wake(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+class _ModelQueue:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters = []  # heap of (priority, seq, waiter)
+        self.depth = {p: 0 for p in PRIORITY_NAMES}
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+class ModelScheduler:
+    '''Bounded per-model concurrency with priority admission (commander > thinker > swarm).
+    total_limit caps calls across all models, since they share one Ollama host.
+    Usable from the event loop (slot) and from worker threads (slot_sync).'''
+
+    def __init__(self, limits: dict = None, default_limit: int = 2, total_limit: int = None):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.total_limit = total_limit
+        self.active_total = 0
+        self.queues = {}
+        self.lock = threading.Lock()
+        self.seq = itertools.count()
+
+    def configure(self, limits: dict, default_limit: int = None, total_limit: int = None):
+        with self.lock:
+            self.limits.update(limits)
+            if default_limit is not None:
+                self.default_limit = default_limit
+            if total_limit is not None:
+                self.total_limit = total_limit
+            for model, queue in self.queues.items():
+                queue.limit = max(1, self.limits.get(model, self.default_limit))
+            self._dispatch()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self.queues.get(model)
+        if queue is None:
+            queue = self.queues[model] = _ModelQueue(max(1, self.limits.get(model, self.default_limit)))
+        return queue
+
+    def _grant(self, queue: _ModelQueue, waiter: _Waiter):
+        waited = time.time() - waiter.enqueued
+        queue.active += 1
+        self.active_total += 1
+        queue.admitted += 1
+        queue.total_wait += waited
+        queue.max_wait = max(queue.max_wait, waited)
+        waiter.granted = True
+
+    def _enqueue(self, model: str, waiter: _Waiter) -> bool:
+        '''Queue the waiter and admit whoever ranks highest; True if it was admitted at once. Caller holds the lock.'''
+        queue = self._queue(model)
+        heapq.heappush(queue.waiters, (waiter.priority, next(self.seq), waiter))
+        queue.depth[waiter.priority] += 1
+        self._dispatch()
+        return waiter.granted
+
+    def _dispatch(self):
+        '''Hand free slots to the highest-priority waiters across all models. Caller holds the lock.'''
+        while self.total_limit is None or self.active_total < self.total_limit:
+            best = None
+            for queue in self.queues.values():
+                while queue.waiters and queue.waiters[0][2].cancelled:
+                    heapq.heappop(queue.waiters)
+                if queue.waiters and queue.active < queue.limit:
+                    if best is None or queue.waiters[0][:2] < best.waiters[0][:2]:
+                        best = queue
+            if best is None:
+                return
+            _, _, waiter = heapq.heappop(best.waiters)
+            best.depth[waiter.priority] -= 1
+            self._grant(best, waiter)
+            waiter.wake()
+
+    def _abandon(self, model: str, waiter: _Waiter):
+        '''Withdraw a waiter that gave up; return its slot if it was granted in the meantime.'''
+        with self.lock:
+            if waiter.granted:
+                self._release(model)
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._queue(model).depth[waiter.priority] -= 1
+
+    def _release(self, model: str):
+        queue = self._queue(model)
+        if queue.active > 0:
+            queue.active -= 1
+            self.active_total -= 1
+        self._dispatch()
+
+    def release(self, model: str):
+        with self.lock:
+            self._release(model)
+
+    async def acquire(self, model: str, priority: int = PRIORITY_COMMANDER):
+        waiter = _Waiter(priority, asyncio.get_running_loop())
+        with self.lock:
+            if self._enqueue(model, waiter):
+                return
+        try:
+            await waiter.future
+        except BaseException:
+            self._abandon(model, waiter)
+            raise
+
+    def acquire_sync(self, model: str, priority: int = PRIORITY_SWARM, timeout: float = None) -> bool:
+        waiter = _Waiter(priority)
+        with self.lock:
+            if self._enqueue(model, waiter):
+                return True
+        if waiter.event.wait(timeout):
+            return True
+        self._abandon(model, waiter)
+        return False
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: int = PRIORITY_COMMANDER):
+        await self.acquire(model, priority)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    @contextmanager
+    def slot_sync(self, model: str, priority: int = PRIORITY_SWARM, timeout: float = None):
+        if not self.acquire_sync(model, priority, timeout):
+            raise TimeoutError(f'No {model} slot within {timeout}s')
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def concurrency(self, model: str) -> int:
+        '''How many calls to `model` can run at once under its own and the total limit'''
+        with self.lock:
+            limit = self._queue(model).limit
+            return min(limit, self.total_limit) if self.total_limit is not None else limit
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            models = {
+                model: {
+                    'limit': q.limit,
+                    'active': q.active,
+                    'queued': {PRIORITY_NAMES[p]: n for p, n in q.depth.items()},
+                    'admitted': q.admitted,
+                    'avg_wait_ms': int(q.total_wait / max(q.admitted, 1) * 1000),
+                    'max_wait_ms': int(q.max_wait * 1000)
+                }
+                for model, q in self.queues.items()
+            }
+            return {'total_limit': self.total_limit, 'active': self.active_total, 'models': models}
+
+model_scheduler = ModelScheduler()
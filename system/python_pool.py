@@ -0,0 +1,142 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python_worker.py')
+MARKER = '\x00pool\x00'
+
+DEFAULT_PRELOAD = ['json', 'os', 're', 'math', 'datetime', 'pathlib', 'collections', 'itertools', 'subprocess']
+
+class _Worker:
+    def __init__(self, cwd: str, preload: list):
+        self.proc = subprocess.Popen(
+            [sys.executable, '-u', WORKER_SCRIPT, ','.join(preload)],
+            cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding='utf-8', errors='replace', bufsize=1
+        )
+        self.runs = 0
+        # Whether calls run in forked children; set from the ready message. Inline workers are single-use
+        self.forking = True
+        self.ready = threading.Event()
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        # Anything the snippet writes straight to the worker's stdout is dropped; replies carry the marker
+        for line in self.proc.stdout:
+            if not line.startswith(MARKER):
+                continue
+            payload = json.loads(line[len(MARKER):])
+            if payload.get('ready'):
+                self.forking = payload.get('forking', True)
+                self.ready.set()
+            else:
+                self.replies.put(payload)
+        self.replies.put(None)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def call(self, request: dict, timeout: float):
+        '''Send one request; None if the worker died or missed the deadline'''
+        try:
+            self.proc.stdin.write(json.dumps(request) + '\n')
+            self.proc.stdin.flush()
+            return self.replies.get(timeout=timeout)
+        except (OSError, ValueError, queue.Empty):
+            return None
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+class PythonPool:
+    '''Pre-warmed interpreters for execute_python.
+
+    Workers import the preload modules once at startup. Each call runs in a forked child of a warm
+    worker (isolated, with the timeout and memory limit applied to the child). Without fork a worker
+    serves a single call under the limits and is then replaced. Forking workers are recycled after
+    max_runs calls, and an idle worker is always kept warm.'''
+
+    def __init__(self, cwd: str, size: int = 2, preload: list = None, max_runs: int = 100,
+                 timeout: float = 30, memory_mb: int = 2048):
+        self.cwd = cwd
+        self.size = size
+        self.preload = DEFAULT_PRELOAD if preload is None else preload
+        self.max_runs = max_runs
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.idle = queue.Queue()
+        self.closed = False
+        self.stats = {'runs': 0, 'warm_hits': 0, 'cold_starts': 0, 'timeouts': 0, 'recycled': 0}
+
+    def start(self):
+        for _ in range(self.size - self.idle.qsize()):
+            self.idle.put(_Worker(self.cwd, self.preload))
+
+    def _replenish(self):
+        if not self.closed and self.idle.qsize() < self.size:
+            threading.Thread(target=lambda: self._release(_Worker(self.cwd, self.preload)), daemon=True).start()
+
+    def _acquire(self) -> _Worker:
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                self.stats['cold_starts'] += 1
+                return _Worker(self.cwd, self.preload)
+            if worker.alive():
+                self.stats['warm_hits'] += 1
+                return worker
+            worker.kill()
+
+    def _release(self, worker: _Worker):
+        spent = worker.runs >= (self.max_runs if worker.forking else 1)
+        if self.closed or not worker.alive() or spent or self.idle.qsize() >= self.size:
+            if spent:
+                self.stats['recycled'] += 1
+            worker.kill()
+            self._replenish()
+            return
+        self.idle.put(worker)
+
+    def run(self, code: str, timeout: float = None, memory_mb: int = None) -> dict:
+        timeout = timeout or self.timeout
+        worker = self._acquire()
+        self.stats['runs'] += 1
+        if not worker.ready.wait(timeout):
+            worker.kill()
+            return {'status': 'error', 'message': 'Interpreter failed to start'}
+        # Forking workers enforce the timeout on the child, so the margin only covers hangs; an inline
+        # worker runs the code itself and is killed at the deadline
+        result = worker.call({'code': code, 'timeout': timeout, 'memory_mb': memory_mb if memory_mb is not None else self.memory_mb},
+                             timeout + 5 if worker.forking else timeout)
+        worker.runs += 1
+        if result is None and not worker.alive():
+            self._release(worker)
+            return {'status': 'error', 'message': 'Interpreter exited unexpectedly'}
+        if result is None or result.get('status') == 'timeout':
+            self.stats['timeouts'] += 1
+            if result is None:
+                worker.kill()
+            self._release(worker)
+            return {'status': 'error', 'message': f'Timeout ({timeout:g}s)'}
+        self._release(worker)
+        return result
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'idle': self.idle.qsize(), 'size': self.size}
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().kill()
+            except queue.Empty:
+                return
@@ -0,0 +1,167 @@
+"""
+Warm interpreter for brain_server's execute_python action (started by system/python_pool.py).
+
+Imports the preload modules once, then serves one JSON request per stdin line. Where fork() exists,
+every call runs in a forked child of this warm process, so calls are isolated from each other and
+the per-call timeout and memory limit are enforced on the child. Elsewhere (Windows) the worker is
+single-use: it limits its own memory, runs the one call inline and exits, and the pool kills it at the
+timeout and starts a fresh warm worker in its place.
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+MARKER = '\x00pool\x00'
+
+def reply(payload: dict):
+    sys.__stdout__.write(MARKER + json.dumps(payload) + '\n')
+    sys.__stdout__.flush()
+
+def limit_memory(memory_mb: int):
+    limit = memory_mb * 1024 * 1024
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except ImportError:
+        if os.name == 'nt':
+            limit_memory_job(limit)
+    except (ValueError, OSError):
+        pass
+
+def limit_memory_job(limit: int):
+    '''Windows has no setrlimit: put this process in a job object with a process memory cap'''
+    import ctypes
+    from ctypes import wintypes
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+    class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [('PerProcessUserTimeLimit', ctypes.c_int64), ('PerJobUserTimeLimit', ctypes.c_int64),
+                    ('LimitFlags', wintypes.DWORD), ('MinimumWorkingSetSize', ctypes.c_size_t),
+                    ('MaximumWorkingSetSize', ctypes.c_size_t), ('ActiveProcessLimit', wintypes.DWORD),
+                    ('Affinity', ctypes.c_size_t), ('PriorityClass', wintypes.DWORD),
+                    ('SchedulingClass', wintypes.DWORD)]
+
+    class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [('BasicLimitInformation', JOBOBJECT_BASIC_LIMIT_INFORMATION), ('IoInfo', IO_COUNTERS),
+                    ('ProcessMemoryLimit', ctypes.c_size_t), ('JobMemoryLimit', ctypes.c_size_t),
+                    ('PeakProcessMemoryUsed', ctypes.c_size_t), ('PeakJobMemoryUsed', ctypes.c_size_t)]
+
+    JOB_OBJECT_LIMIT_PROCESS_MEMORY = 0x100
+    JobObjectExtendedLimitInformation = 9
+    try:
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        job = kernel32.CreateJobObjectW(None, None)
+        if not job:
+            return
+        info = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+        info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_PROCESS_MEMORY
+        info.ProcessMemoryLimit = limit
+        if kernel32.SetInformationJobObject(wintypes.HANDLE(job), JobObjectExtendedLimitInformation,
+                                            ctypes.byref(info), ctypes.sizeof(info)):
+            kernel32.AssignProcessToJobObject(wintypes.HANDLE(job), wintypes.HANDLE(kernel32.GetCurrentProcess()))
+    except (AttributeError, OSError):
+        pass
+
+def print_user_traceback():
+    '''Print the traceback without this module's frames, as `python -c` would'''
+    etype, value, tb = sys.exc_info()
+    while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+        tb = tb.tb_next
+    traceback.print_exception(etype, value, tb)
+
+def run_code(code: str):
+    sys.argv = ['-c']
+    exec(compile(code, '<string>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+
+def run_forked(code: str, timeout: float, memory_mb: int) -> dict:
+    out_file, err_file = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(out_file.fileno(), 1)
+            os.dup2(err_file.fileno(), 2)
+            if memory_mb:
+                limit_memory(memory_mb)
+            run_code(code)
+        except SystemExit as e:
+            if e.code is not None and not isinstance(e.code, int):
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            print_user_traceback()
+        finally:
+            with contextlib.suppress(Exception):
+                sys.stdout.flush()
+                sys.stderr.flush()
+            os._exit(0)
+
+    deadline = time.time() + timeout
+    delay = 0.001
+    while True:
+        done, _ = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        if time.time() >= deadline:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+            out_file.close()
+            err_file.close()
+            return {'status': 'timeout'}
+        time.sleep(delay)
+        delay = min(delay * 2, 0.02)
+
+    def read(f):
+        with f:
+            f.seek(0)
+            return f.read().decode('utf-8', errors='replace')
+    return {'status': 'executed', 'stdout': read(out_file), 'stderr': read(err_file)}
+
+def run_inline(code: str) -> dict:
+    out, err = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            run_code(code)
+        except SystemExit as e:
+            if e.code is not None and not isinstance(e.code, int):
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            print_user_traceback()
+    return {'status': 'executed', 'stdout': out.getvalue(), 'stderr': err.getvalue()}
+
+def main():
+    preload = [m for m in (sys.argv[1] if len(sys.argv) > 1 else '').split(',') if m]
+    for module in preload:
+        with contextlib.suppress(Exception):
+            importlib.import_module(module)
+    forking = hasattr(os, 'fork')
+    reply({'ready': True, 'pid': os.getpid(), 'forking': forking})
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if forking:
+            reply(run_forked(request['code'], request.get('timeout', 30), request.get('memory_mb', 0)))
+            continue
+        # No fork: this process is the sandbox, so it takes the limit itself and serves only this call
+        if request.get('memory_mb'):
+            limit_memory(request['memory_mb'])
+        reply(run_inline(request['code']))
+        break
+
+if __name__ == '__main__':
+    main()
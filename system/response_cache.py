@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = "system/response_cache"
+
+class ResponseCache:
+    '''LRU + TTL cache for model responses with an on-disk tier that survives restarts.
+
+    The in-memory lookup is synchronous; from the event loop use aget(), which reads the disk tier on a
+    worker thread. put() only touches memory and hands the disk write (and periodic pruning) to a
+    background writer thread, so callers never wait on the disk.'''
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_entries: int = 256, ttl_seconds: int = 24 * 3600,
+                 max_disk_entries: int = 5000, prune_every: int = 100):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.prune_every = prune_every
+        self.entries = OrderedDict()  # key -> (stored_at, response)
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self.writes = queue.Queue()
+        self._writer = None
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str, options: dict) -> str:
+        raw = json.dumps([model, system or '', prompt, options or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def _fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttl_seconds
+
+    def get(self, key: str):
+        '''Blocking lookup through both tiers, for worker threads'''
+        response = self.get_memory(key)
+        return response if response is not None else self._get_disk(key)
+
+    async def aget(self, key: str):
+        '''Lookup from the event loop: memory inline, the disk tier on a thread'''
+        response = self.get_memory(key)
+        return response if response is not None else await asyncio.to_thread(self._get_disk, key)
+
+    def get_memory(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self._fresh(entry[0]):
+                self.entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[1]
+            if entry:
+                del self.entries[key]
+        return None
+
+    def _get_disk(self, key: str):
+        entry = self._read_disk(key)
+        with self.lock:
+            if entry:
+                self._remember(key, entry)
+                self.stats['disk_hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key: str, response: str):
+        entry = (time.time(), response)
+        with self.lock:
+            self._remember(key, entry)
+            self.stats['stores'] += 1
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='response-cache-writer', daemon=True)
+                self._writer.start()
+        self.writes.put((key, entry))
+
+    def _write_loop(self):
+        written = 0
+        while True:
+            key, entry = self.writes.get()
+            try:
+                self._write_disk(key, entry)
+                written += 1
+                if written % self.prune_every == 0:
+                    self.prune_disk()
+            finally:
+                self.writes.task_done()
+
+    def flush(self):
+        '''Wait until every stored response has reached the disk'''
+        self.writes.join()
+
+    def _remember(self, key: str, entry: tuple):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _read_disk(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._fresh(data.get('stored_at', 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return (data['stored_at'], data['response'])
+
+    def _write_disk(self, key: str, entry: tuple):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'stored_at': entry[0], 'response': entry[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def prune_disk(self) -> int:
+        '''Drop expired files, then the oldest ones beyond max_disk_entries'''
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        files.sort()
+        cutoff = time.time() - self.ttl_seconds
+        overflow = len(files) - self.max_disk_entries
+        removed = 0
+        for i, (mtime, path) in enumerate(files):
+            if mtime >= cutoff and i >= overflow:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        stats['hit_rate'] = f"{(hits / max(hits + stats['misses'], 1)) * 100:.0f}%"
+        return stats
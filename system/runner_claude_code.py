@@ -1,4 +1,4 @@
-﻿import os, json, time, datetime as dt
+﻿import os, sys, json, time, datetime as dt
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -7,6 +7,12 @@ from anthropic import Anthropic
 load_dotenv()
 
 BASE = Path(__file__).resolve().parent.parent
+# Run as a script by the executor, so the repo root isn't on the path
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from system.json_store import StateStore
+
 SYSTEM = BASE / "system"
 TO_CLAUDE = SYSTEM / "queues" / "to_claude_code"
 FROM_CLAUDE = SYSTEM / "queues" / "from_claude_code"
@@ -16,6 +22,15 @@ LOGS = BRAIN / "Logs"
 
 CFG_PATH = SYSTEM / "state" / "claude_code_config.json"
 
+# JSON documents other processes also write (server, orchestrator, token manager). Writes to these go
+# through a StateStore so they take the same lock and bump the same version; every other file is
+# written exactly as given.
+SHARED_STATE_FILES = {
+    (SYSTEM / name).resolve() for name in (
+        "brain_memory.json", "directory_cache.json", "eai_context.json", "token_manager_state.json"
+    )
+}
+
 ALLOWED_WRITE_ROOTS = {
     (BRAIN / "Operating").resolve(),
     (BRAIN / "Candidates").resolve(),
@@ -67,6 +82,20 @@ def within_allowed_write(path: Path) -> bool:
 def ensure_parent(path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
 
+def write_state_file(path: Path, content: str) -> bool:
+    """Replace one of the SHARED_STATE_FILES through a StateStore, so the write takes the same lock, and
+    bumps the same version, as the other writers. False for any other file (the caller writes it as is)."""
+    if path.resolve() not in SHARED_STATE_FILES:
+        return False
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return False
+    if not isinstance(data, dict):
+        return False
+    StateStore(path).save(data)
+    return True
+
 def append_actions(line: str):
     LOGS.mkdir(exist_ok=True)
     (LOGS / "actions.log").open("a", encoding="utf-8").write(line.rstrip() + "\n")
@@ -164,7 +193,8 @@ def apply_ops(ops: list[dict]):
                 raise SystemExit(f"DENY write: {rel}")
             ensure_parent(tgt)
             content = item.get("content","")
-            tgt.write_text(content, encoding="utf-8")
+            if not write_state_file(tgt, content):
+                tgt.write_text(content, encoding="utf-8")
 
         elif op == "append":
             if not within_allowed_write(tgt):
@@ -0,0 +1,60 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+
+class SearchCache:
+    '''LRU cache for /search responses, each tagged with the index generation it was computed at.
+    An entry whose tag no longer matches the current generation is stale and dropped on access,
+    so any change to the index invalidates every cached result without explicit bookkeeping.'''
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (generation, response, elapsed_ms)
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'saved_ms': 0.0, 'miss_ms': 0.0}
+
+    @staticmethod
+    def make_key(mode: str, query: str, case_sensitive: bool, **options) -> str:
+        '''Whitespace never matters; case only matters where the search honours it (regex, semantic)'''
+        query = re.sub(r'\s+', ' ', query.strip())
+        return json.dumps([mode, query if case_sensitive else query.lower(), options], sort_keys=True)
+
+    def get(self, key: str, generation):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == generation:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['saved_ms'] += entry[2]
+                return entry[1]
+            if entry:
+                del self.entries[key]
+                self.stats['stale'] += 1
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, generation, response: dict, elapsed_ms: float):
+        with self.lock:
+            self.entries[key] = (generation, response, elapsed_ms)
+            self.entries.move_to_end(key)
+            self.stats['miss_ms'] += elapsed_ms
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **{k: v for k, v in self.stats.items() if not k.endswith('_ms')},
+                'entries': len(self.entries),
+                'hit_rate': f"{self.stats['hits'] / max(lookups, 1) * 100:.0f}%",
+                # Time the hits would have cost had they run, and what a search costs when it does
+                'saved_ms': round(self.stats['saved_ms'], 1),
+                'avg_miss_ms': round(self.stats['miss_ms'] / max(self.stats['misses'], 1), 2)
+            }
@@ -0,0 +1,439 @@
+import hashlib
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional: without it similarity is computed in pure Python and IVF is unavailable
+    np = None
+
+from system.index_store import INDEX_DB, open_index_db
+from system.model_scheduler import PRIORITY_COMMANDER, PRIORITY_SWARM
+
+CHUNK_LINES = 40
+CHUNK_OVERLAP = 10
+CHUNK_CHARS = 2000
+EMBED_BATCH = 32
+SNIPPET_CHARS = 200
+# The IVF partition is rebuilt once rows added or removed since the last build pass this share of it
+IVF_REBUILD_FRACTION = 0.2
+# Masked (deleted) rows are squeezed out of the matrix once they outnumber the live ones
+COMPACT_MIN_DEAD = 1024
+# Paths/hashes per IN (...) lookup
+LOOKUP_BATCH = 500
+
+def chunk_text(text: str) -> list:
+    '''(start_line, end_line, text) windows of CHUNK_LINES lines overlapping by CHUNK_OVERLAP'''
+    lines = text.splitlines()
+    chunks = []
+    step = CHUNK_LINES - CHUNK_OVERLAP
+    for start in range(0, max(len(lines), 1), step):
+        window = '\n'.join(lines[start:start + CHUNK_LINES]).strip()
+        if window:
+            chunks.append((start + 1, min(start + CHUNK_LINES, len(lines)), window[:CHUNK_CHARS]))
+        if start + CHUNK_LINES >= len(lines):
+            break
+    return chunks
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8', errors='replace'), digest_size=16).hexdigest()
+
+def _normalize(vector) -> list:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+class HashingEmbedder:
+    '''Deterministic, dependency-free stand-in: signed feature hashing of words and identifier parts.
+    Captures shared vocabulary, not meaning, but needs no model server (tests, offline use).'''
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text: str) -> dict:
+        counts = {}
+        for word in re.findall(r'[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+', text):
+            word = word.lower()
+            counts[word] = counts.get(word, 0) + 1
+        return counts
+
+    def embed(self, texts: list, priority: int = PRIORITY_SWARM) -> list:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dim
+            for word, count in self._features(text).items():
+                digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dim
+                vector[bucket] += (1.0 + math.log(count)) * (1 if digest[4] & 1 else -1)
+            vectors.append(vector)
+        return vectors
+
+class OllamaEmbedder:
+    '''Embeddings from a local Ollama model, admitted through the model scheduler: bulk embedding at
+    swarm priority, interactive queries at commander priority'''
+
+    def __init__(self, host: str, model: str = 'nomic-embed-text', timeout: float = 60):
+        import httpx
+        self.model = model
+        self.name = f'ollama:{model}'
+        self.client = httpx.Client(base_url=host.rstrip('/'), timeout=httpx.Timeout(timeout, connect=5))
+
+    def embed(self, texts: list, priority: int = PRIORITY_SWARM) -> list:
+        from system.model_scheduler import model_scheduler
+        vectors = []
+        for text in texts:
+            with model_scheduler.slot_sync(self.model, priority):
+                response = self.client.post('/api/embeddings', json={'model': self.model, 'prompt': text})
+            response.raise_for_status()
+            vectors.append(response.json()['embedding'])
+        return vectors
+
+def make_embedder(settings: dict, host: str):
+    if settings.get('backend', 'ollama') == 'hashing':
+        return HashingEmbedder(settings.get('dim', 256))
+    return OllamaEmbedder(host, settings.get('model', 'nomic-embed-text'))
+
+class _Matrix:
+    '''The query-side copy of the embedded chunks, one slot per chunk. Index changes append slots for
+    new chunks and mask the slots of removed ones, so they never force a reload from SQLite.'''
+
+    def __init__(self):
+        self.rows = []      # (path, start_line, end_line) per slot
+        self.ids = []       # chunk rowid per slot
+        self.slots = {}     # live chunk rowid -> slot
+        self.by_path = {}   # path -> its slots
+        self.alive = np.zeros(0, dtype=bool) if np is not None else []
+        self.vectors = None
+        self.dead = 0
+        self.ivf = None     # (centroids, [slot indices per list])
+        self.ivf_size = 0   # live slots when the partition was built
+        self.churn = 0      # slots added or removed since
+
+    def live(self) -> int:
+        return len(self.rows) - self.dead
+
+    def drop_path(self, path: str):
+        for slot in self.by_path.pop(path, ()):
+            if self.alive[slot]:
+                self.alive[slot] = False
+                self.slots.pop(self.ids[slot], None)
+                self.dead += 1
+                self.churn += 1
+
+    def append(self, entries) -> list:
+        '''Add (chunk rowid, path, start, end, vector blob) entries not already present; returns the new slots'''
+        entries = [e for e in entries if e[0] not in self.slots]
+        first = len(self.rows)
+        for offset, (chunk_id, path, start, end, _) in enumerate(entries):
+            self.rows.append((path, start, end))
+            self.ids.append(chunk_id)
+            self.slots[chunk_id] = first + offset
+            self.by_path.setdefault(path, []).append(first + offset)
+        self.churn += len(entries)
+        if np is None:
+            self.vectors = self.vectors or []
+            self.vectors.extend(array('f', e[4]) for e in entries)
+            self.alive.extend([True] * len(entries))
+            return list(range(first, len(self.rows)))
+        if entries:
+            block = np.frombuffer(b''.join(e[4] for e in entries), dtype=np.float32).reshape(len(entries), -1)
+            if self.vectors is None:
+                self.vectors = np.empty((max(len(entries), 1024), block.shape[1]), dtype=np.float32)
+                self.alive = np.zeros(len(self.vectors), dtype=bool)
+            if len(self.rows) > len(self.vectors):
+                # Grow by doubling so appends stay amortized O(1) per row
+                extra = max(len(self.rows), 2 * len(self.vectors)) - len(self.vectors)
+                self.vectors = np.concatenate([self.vectors, np.empty((extra, block.shape[1]), np.float32)])
+                self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+            self.vectors[first:len(self.rows)] = block
+            self.alive[first:len(self.rows)] = True
+        return list(range(first, len(self.rows)))
+
+    def compact(self):
+        '''Squeeze out masked slots; slot numbers change, so the IVF partition is dropped'''
+        keep = [slot for slot in range(len(self.rows)) if self.alive[slot]]
+        self.rows = [self.rows[slot] for slot in keep]
+        self.ids = [self.ids[slot] for slot in keep]
+        if np is None:
+            self.vectors = [self.vectors[slot] for slot in keep]
+            self.alive = [True] * len(keep)
+        else:
+            self.vectors = self.vectors[np.asarray(keep, dtype=np.int64)] if keep else None
+            self.alive = np.ones(len(keep), dtype=bool)
+        self.slots = {chunk_id: slot for slot, chunk_id in enumerate(self.ids)}
+        self.by_path = {}
+        for slot, (path, _, _) in enumerate(self.rows):
+            self.by_path.setdefault(path, []).append(slot)
+        self.dead = 0
+        self.ivf = None
+
+class SemanticIndex:
+    '''Chunk embeddings for conceptual search.
+
+    Files are split into overlapping line windows; each window is identified by the blake2b hash of
+    its text and its vector is cached by (embedder, hash), so only chunks whose text changed are ever
+    re-embedded (moved or reverted code reuses its vectors). Chunking happens inline with indexing;
+    embedding runs on a background thread. Queries take the top-k by cosine similarity with NumPy
+    when available, through an IVF partition (k-means lists, nprobe probed) once the corpus is large.
+    The query matrix is kept up to date incrementally from the paths and hashes changed since the last
+    query; the partition is rebuilt only after IVF_REBUILD_FRACTION of it has churned.'''
+
+    def __init__(self, embedder, db_path: str = INDEX_DB, conn=None, lock=None,
+                 ivf_threshold: int = 20000, nprobe: int = 8):
+        self.embedder = embedder
+        self.lock = lock or threading.RLock()
+        self.conn = conn or open_index_db(db_path)
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks (path TEXT NOT NULL, start_line INTEGER, end_line INTEGER, hash TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (hash)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS vectors (model TEXT NOT NULL, hash TEXT NOT NULL, vec BLOB NOT NULL, '
+            'PRIMARY KEY (model, hash)) WITHOUT ROWID'
+        )
+        self.version = 0
+        self._matrix = None
+        # Serializes queries and matrix updates; indexing only takes self.lock, so it never waits on a query
+        self._matrix_lock = threading.Lock()
+        # What changed since the matrix was last brought up to date
+        self._changed_paths = set()
+        self._embedded = set()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.stats = {'embedded': 0, 'errors': 0, 'last_error': None}
+
+    # --- Maintenance (called by BrainIndex inside its transactions) ---
+
+    def replace(self, path: str, text: str):
+        chunks = chunk_text(text) if text else []
+        with self.lock:
+            self.conn.execute('DELETE FROM chunks WHERE path = ?', (path,))
+            self.conn.executemany('INSERT INTO chunks (path, start_line, end_line, hash) VALUES (?, ?, ?, ?)',
+                                  [(path, start, end, content_hash(body)) for start, end, body in chunks])
+            self._changed_paths.add(path)
+            self.version += 1
+        self._wakeup.set()
+
+    def delete(self, path: str):
+        with self.lock:
+            self.conn.execute('DELETE FROM chunks WHERE path = ?', (path,))
+            self._changed_paths.add(path)
+            self.version += 1
+
+    def rename(self, old_path: str, new_path: str):
+        with self.lock:
+            self.conn.execute('UPDATE chunks SET path = ? WHERE path = ?', (new_path, old_path))
+            self._changed_paths.update((old_path, new_path))
+            self.version += 1
+
+    def clear(self):
+        '''Drops chunks; cached vectors stay, keyed by content'''
+        with self.lock:
+            self.conn.execute('DELETE FROM chunks')
+            self._matrix = None
+            self.version += 1
+
+    # --- Embedding ---
+
+    def _chunk_texts(self, path: str) -> dict:
+        '''hash -> text for a file's chunks, re-cut from the stored contents'''
+        return {content_hash(body): body for _, _, body in chunk_text(self._body(path))}
+
+    def pending(self, limit: int = EMBED_BATCH) -> list:
+        '''(hash, text) of chunks without a cached vector for the current embedder'''
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT DISTINCT c.path, c.hash FROM chunks c LEFT JOIN vectors v ON v.model = ? AND v.hash = c.hash '
+                'WHERE v.hash IS NULL LIMIT ?', (self.embedder.name, limit)
+            ).fetchall()
+            texts, found = {}, {}
+            for path, chunk_hash in rows:
+                if path not in texts:
+                    texts[path] = self._chunk_texts(path)
+                if chunk_hash in texts[path]:
+                    found[chunk_hash] = texts[path][chunk_hash]  # identical chunks in several files embed once
+            return list(found.items())
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return self.conn.execute(
+                'SELECT count(DISTINCT c.hash) FROM chunks c LEFT JOIN vectors v ON v.model = ? AND v.hash = c.hash '
+                'WHERE v.hash IS NULL', (self.embedder.name,)
+            ).fetchone()[0]
+
+    def embed_pending(self, batch: int = EMBED_BATCH) -> int:
+        '''Embed one batch of uncached chunks; returns how many were stored'''
+        todo = self.pending(batch)
+        if not todo:
+            return 0
+        vectors = self.embedder.embed([text for _, text in todo])  # no lock held: this is the slow part
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO vectors (model, hash, vec) VALUES (?, ?, ?)',
+                [(self.embedder.name, chunk_hash, array('f', _normalize(vector)).tobytes())
+                 for (chunk_hash, _), vector in zip(todo, vectors)]
+            )
+            self._embedded.update(chunk_hash for chunk_hash, _ in todo)
+            self.version += 1
+        self.stats['embedded'] += len(todo)
+        return len(todo)
+
+    def _run(self):
+        while not self._closed:
+            try:
+                while not self._closed and self.embed_pending():
+                    pass
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.stats['last_error'] = str(e)[:200]
+                time.sleep(60)  # embedding backend down or model missing; retry later
+            self._wakeup.wait(30)
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='semantic-embed', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+
+    # --- Query ---
+
+    def _load(self) -> _Matrix:
+        '''The query matrix for the current embedder, brought up to date with what changed since the last
+        call. Runs under self._matrix_lock.'''
+        select = ('SELECT c.rowid, c.path, c.start_line, c.end_line, v.vec FROM chunks c '
+                  'JOIN vectors v ON v.model = ? AND v.hash = c.hash')
+        with self.lock:
+            matrix, paths, hashes = self._matrix, list(self._changed_paths), list(self._embedded)
+            self._changed_paths.clear()
+            self._embedded.clear()
+            if matrix is None:
+                matrix = self._matrix = _Matrix()
+                entries = self.conn.execute(select, (self.embedder.name,)).fetchall()
+            else:
+                entries = []
+                for path in paths:
+                    matrix.drop_path(path)
+                for column, keys in (('c.path', paths), ('c.hash', hashes)):
+                    for i in range(0, len(keys), LOOKUP_BATCH):
+                        batch = keys[i:i + LOOKUP_BATCH]
+                        entries += self.conn.execute(f'{select} WHERE {column} IN ({",".join("?" * len(batch))})',
+                                                     (self.embedder.name, *batch)).fetchall()
+        added = matrix.append(entries)
+        if matrix.dead >= max(COMPACT_MIN_DEAD, matrix.live()):
+            matrix.compact()
+        self._update_ivf(matrix, added)
+        return matrix
+
+    def _update_ivf(self, matrix: _Matrix, added: list):
+        '''Place new slots in their nearest list, or rebuild the partition once it has drifted'''
+        live = matrix.live()
+        if np is None or live < self.ivf_threshold:
+            matrix.ivf = None
+            return
+        if matrix.ivf is None or matrix.churn > IVF_REBUILD_FRACTION * matrix.ivf_size:
+            live_slots = np.flatnonzero(matrix.alive[:len(matrix.rows)])
+            centroids, lists = self._build_ivf(matrix.vectors[live_slots])
+            matrix.ivf = (centroids, [live_slots[members] for members in lists])
+            matrix.ivf_size, matrix.churn = live, 0
+            return
+        if added:
+            centroids, lists = matrix.ivf
+            added = np.asarray(added, dtype=np.int64)
+            nearest = np.argmax(matrix.vectors[added] @ centroids.T, axis=1)
+            for c in np.unique(nearest):
+                lists[c] = np.concatenate([lists[c], added[nearest == c]])
+
+    @staticmethod
+    def _build_ivf(vectors, iterations: int = 8):
+        '''k-means over sqrt(n) lists; returns (centroids, [row indices per list])'''
+        n = len(vectors)
+        nlist = max(1, int(math.sqrt(n)))
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(n, nlist, replace=False)].copy()
+        assign = np.empty(n, dtype=np.int64)
+        for _ in range(iterations):
+            for i in range(0, n, 8192):
+                assign[i:i + 8192] = np.argmax(vectors[i:i + 8192] @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, vectors)
+            counts = np.bincount(assign, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / np.linalg.norm(sums[filled], axis=1, keepdims=True)
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        return centroids, [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+
+    def _top(self, query, matrix: _Matrix, k: int) -> list:
+        '''(score, slot) of the k most similar live chunks'''
+        if np is None:
+            scores = ((sum(a * b for a, b in zip(query, vector)), i)
+                      for i, vector in enumerate(matrix.vectors) if matrix.alive[i])
+            return heapq.nlargest(k, scores)
+        q = np.asarray(query, dtype=np.float32)
+        if matrix.ivf is not None:
+            centroids, lists = matrix.ivf
+            probe = np.argsort(centroids @ q)[::-1][:self.nprobe]
+            candidates = np.concatenate([lists[c] for c in probe])
+        else:
+            candidates = np.arange(len(matrix.rows))
+        candidates = candidates[matrix.alive[candidates]] if matrix.dead else candidates
+        if not len(candidates):
+            return []
+        scores = matrix.vectors[candidates] @ q
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return sorted(((float(scores[i]), int(candidates[i])) for i in best), reverse=True)
+
+    def search(self, query: str, limit: int = 20) -> dict:
+        '''Files whose chunks are closest to the query, best chunk per file'''
+        with self.lock:
+            embedded = self.conn.execute(
+                'SELECT 1 FROM chunks c JOIN vectors v ON v.model = ? AND v.hash = c.hash LIMIT 1', (self.embedder.name,)
+            ).fetchone()
+        if not embedded:
+            return {'results': [], 'pending': self.pending_count()}
+        # A user is waiting: jump the background embedding backlog, and don't hold the matrix meanwhile
+        query_vector = _normalize(self.embedder.embed([query], priority=PRIORITY_COMMANDER)[0])
+        with self._matrix_lock:
+            matrix = self._load()
+            # Several chunks of one file can rank high; over-fetch so `limit` distinct files remain
+            top = [(score, matrix.rows[i]) for score, i in self._top(query_vector, matrix, limit * 4)] if matrix.live() else []
+            ivf = matrix.ivf is not None
+        results, seen = [], set()
+        for score, (path, start, end) in top:
+            if path in seen:
+                continue
+            seen.add(path)
+            results.append({'path': path, 'score': round(score, 4), 'start_line': start, 'end_line': end})
+            if len(results) >= limit:
+                break
+        with self.lock:
+            for result in results:
+                lines = self._body(result['path']).splitlines()[result['start_line'] - 1:result['end_line']]
+                result['snippet'] = '\n'.join(lines).strip()[:SNIPPET_CHARS]
+        return {'results': results, 'pending': self.pending_count(), 'ivf': ivf}
+
+    def _body(self, path: str) -> str:
+        '''A file's contents as held by the full-text index'''
+        row = self.conn.execute(
+            'SELECT docs.body FROM doc_ids JOIN docs ON docs.rowid = doc_ids.id WHERE doc_ids.path = ?', (path,)
+        ).fetchone()
+        return row[0] if row else ''
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            chunks = self.conn.execute('SELECT count(*) FROM chunks').fetchone()[0]
+        return {**self.stats, 'embedder': self.embedder.name, 'chunks': chunks, 'pending': self.pending_count(),
+                'numpy': np is not None}
@@ -1,127 +1,262 @@
 ﻿import json
 import os
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
 
+from system.json_store import read_journaled
+
+SESSION_DB = "system/session_state.db"
+# The JSON (+ journal) store that came before; imported once into a new database
 SESSION_STATE_FILE = "system/session_state.json"
 
+# The file purpose index is an external-content trigram table kept in step by triggers, so
+# substring searches on path or purpose are index lookups
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE IF NOT EXISTS file_index (path TEXT PRIMARY KEY, type TEXT, purpose TEXT, indexed TEXT, used TEXT)',
+    'CREATE INDEX IF NOT EXISTS file_index_purpose ON file_index (purpose)',
+    'CREATE INDEX IF NOT EXISTS file_index_used ON file_index (used)',
+    "CREATE VIRTUAL TABLE IF NOT EXISTS file_search USING fts5(path, purpose, content='file_index', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS file_index_ai AFTER INSERT ON file_index BEGIN '
+    'INSERT INTO file_search (rowid, path, purpose) VALUES (new.rowid, new.path, new.purpose); END',
+    'CREATE TRIGGER IF NOT EXISTS file_index_ad AFTER DELETE ON file_index BEGIN '
+    "INSERT INTO file_search (file_search, rowid, path, purpose) VALUES ('delete', old.rowid, old.path, old.purpose); END",
+    'CREATE TRIGGER IF NOT EXISTS file_index_au AFTER UPDATE OF path, purpose ON file_index BEGIN '
+    "INSERT INTO file_search (file_search, rowid, path, purpose) VALUES ('delete', old.rowid, old.path, old.purpose); "
+    'INSERT INTO file_search (rowid, path, purpose) VALUES (new.rowid, new.path, new.purpose); END',
+    'CREATE TABLE IF NOT EXISTS discovered_files (path TEXT PRIMARY KEY, viewed_at TEXT, summary TEXT)',
+    'CREATE INDEX IF NOT EXISTS discovered_files_viewed ON discovered_files (viewed_at)',
+    'CREATE TABLE IF NOT EXISTS problems (id INTEGER PRIMARY KEY, problem TEXT NOT NULL, added TEXT, solution TEXT, solved TEXT)',
+    'CREATE INDEX IF NOT EXISTS problems_open ON problems (solved, problem)',
+)
+
+def _default_state() -> dict:
+    return {
+        "created": datetime.now().isoformat(),
+        "last_session": None,
+        "working_on": None,
+        "hugo_preferences": {
+            "wants_production_ready": True,
+            "hates_confirmation_theater": True,
+            "prefers_action_over_narration": True,
+            "terminal_blocks_only": True,
+            "building": ["FEELD", "Brain"]
+        },
+        "project_context": {
+            "FEELD": "Payment system with 1% fee for global infrastructure. Safety Vault (20% cap) + Growth Vault (unlimited).",
+            "Brain": "AI command center. Opus=commander, CodeLlama=hands, DeepSeek=thinker, TinyLlama=swarm."
+        },
+        "conversation_summary": ""
+    }
+
 class SessionState:
-    def __init__(self):
-        self.state = self._load()
-    
-    def _load(self):
-        try:
-            if os.path.exists(SESSION_STATE_FILE):
-                with open(SESSION_STATE_FILE, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return {
-            "created": datetime.now().isoformat(),
-            "last_session": None,
-            "working_on": None,
-            "discovered_files": {},
-            "directory_cache": {},
-            "active_problems": [],
-            "solved_problems": [],
-            "hugo_preferences": {
-                "wants_production_ready": True,
-                "hates_confirmation_theater": True,
-                "prefers_action_over_narration": True,
-                "terminal_blocks_only": True,
-                "building": ["FEELD", "Brain"]
-            },
-            "project_context": {
-                "FEELD": "Payment system with 1% fee for global infrastructure. Safety Vault (20% cap) + Growth Vault (unlimited).",
-                "Brain": "AI command center. Opus=commander, CodeLlama=hands, DeepSeek=thinker, TinyLlama=swarm."
-            },
-            "file_index": {},
-            "last_viewed": [],
-            "conversation_summary": ""
-        }
+    """Session memory in SQLite (WAL). Scalar fields live in a key/value table; indexed files,
+    viewed files and problems are tables with indexes, file purposes are full-text searchable, and
+    the file tables are bounded: least recently used rows beyond the caps are evicted, and indexed
+    files not touched for file_ttl_days expire."""
     
-    def save(self):
-        os.makedirs(os.path.dirname(SESSION_STATE_FILE), exist_ok=True)
-        self.state["last_updated"] = datetime.now().isoformat()
-        with open(SESSION_STATE_FILE, 'w') as f:
-            json.dump(self.state, f, indent=2)
+    def __init__(self, db_path: str = SESSION_DB, legacy_path: str = SESSION_STATE_FILE, max_indexed_files: int = 10000,
+                 max_discovered_files: int = 2000, max_solved_problems: int = 500, file_ttl_days: int = 90,
+                 prune_every: int = 100):
+        self.max_indexed_files = max_indexed_files
+        self.max_discovered_files = max_discovered_files
+        self.max_solved_problems = max_solved_problems
+        self.file_ttl_days = file_ttl_days
+        self.prune_every = prune_every
+        self.writes = 0
+        # EAI actions run on a thread pool and several of them may index files at once
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.lock:
+            self.conn.execute('BEGIN')
+            fresh = self._create_tables()
+            if fresh:
+                self._migrate(legacy_path)
+            self.conn.execute('COMMIT')
     
-    def set_working_on(self, task: str):
-        self.state["working_on"] = {"task": task, "started": datetime.now().isoformat()}
-        self.save()
+    def _create_tables(self) -> bool:
+        fresh = not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'kv'").fetchone()
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        if fresh:
+            self.conn.executemany('INSERT INTO kv (key, value) VALUES (?, ?)',
+                                  [(k, json.dumps(v)) for k, v in _default_state().items()])
+        return fresh
     
-    def cache_directory(self, path: str, contents: list):
-        self.state["directory_cache"][path] = {
-            "contents": contents,
-            "cached_at": datetime.now().isoformat()
-        }
-        self.save()
+    def _migrate(self, legacy_path: str):
+        """Carry over what the JSON store held (snapshot plus any journal)"""
+        if not os.path.exists(legacy_path):
+            return
+        state = read_journaled(legacy_path)
+        state.pop("directory_cache", None)
+        for key in _default_state():
+            if key in state:
+                self._set(key, state[key])
+        for path, info in (state.get("file_index") or {}).items():
+            self.conn.execute('INSERT OR REPLACE INTO file_index (path, type, purpose, indexed, used) VALUES (?, ?, ?, ?, ?)',
+                              (path, info.get("type"), info.get("purpose", ""), info.get("indexed"), info.get("indexed")))
+        viewed = dict(state.get("discovered_files") or {})
+        # last_viewed is oldest first; give those paths increasing times so recency order survives
+        for i, path in enumerate(state.get("last_viewed") or []):
+            viewed[path] = {**viewed.get(path, {}), "viewed_at": viewed.get(path, {}).get("viewed_at") or f"0000-{i:06d}"}
+        for path, info in viewed.items():
+            self.conn.execute('INSERT OR REPLACE INTO discovered_files (path, viewed_at, summary) VALUES (?, ?, ?)',
+                              (path, info.get("viewed_at"), info.get("summary")))
+        for p in state.get("active_problems") or []:
+            self.conn.execute('INSERT INTO problems (problem, added) VALUES (?, ?)', (p.get("problem"), p.get("added")))
+        for p in state.get("solved_problems") or []:
+            self.conn.execute('INSERT INTO problems (problem, solution, solved) VALUES (?, ?, ?)',
+                              (p.get("problem"), p.get("solution"), p.get("solved")))
+        self._set("migrated_from", legacy_path)
+    
+    def _set(self, key: str, value):
+        self.conn.execute('INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+    
+    def get(self, key: str, default=None):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+    
+    def _changed(self):
+        self._set("last_updated", datetime.now().isoformat())
+        self.writes += 1
+        if self.writes % self.prune_every == 0:
+            self.prune()
+    
+    def prune(self):
+        """Expire indexed files past the TTL and evict the least recently used rows beyond the caps"""
+        cutoff = (datetime.now() - timedelta(days=self.file_ttl_days)).isoformat()
+        with self.lock:
+            self.conn.execute('DELETE FROM file_index WHERE used < ?', (cutoff,))
+            for table, column, cap in (("file_index", "used", self.max_indexed_files),
+                                       ("discovered_files", "viewed_at", self.max_discovered_files)):
+                self.conn.execute(
+                    f'DELETE FROM {table} WHERE path IN (SELECT path FROM {table} ORDER BY {column} DESC LIMIT -1 OFFSET ?)', (cap,)
+                )
+            self.conn.execute(
+                'DELETE FROM problems WHERE id IN (SELECT id FROM problems WHERE solved IS NOT NULL '
+                'ORDER BY solved DESC LIMIT -1 OFFSET ?)', (self.max_solved_problems,)
+            )
     
-    def get_cached_directory(self, path: str):
-        cached = self.state["directory_cache"].get(path)
-        if cached:
-            return cached["contents"]
-        return None
+    @property
+    def state(self) -> dict:
+        """Snapshot of the session in the shape the JSON store had, minus the file tables (use
+        search_files and recent_files for those)"""
+        with self.lock:
+            snapshot = {key: json.loads(value) for key, value in self.conn.execute('SELECT key, value FROM kv')}
+            snapshot["last_viewed"] = self.recent_files(20)
+            snapshot["active_problems"] = self.active_problems()
+        return snapshot
+    
+    def recent_files(self, limit: int = 20) -> list:
+        """Most recently viewed paths, oldest first"""
+        with self.lock:
+            rows = self.conn.execute('SELECT path FROM discovered_files ORDER BY viewed_at DESC LIMIT ?', (limit,)).fetchall()
+        return [row[0] for row in reversed(rows)]
+    
+    def active_problems(self) -> list:
+        with self.lock:
+            rows = self.conn.execute('SELECT problem, added FROM problems WHERE solved IS NULL ORDER BY id').fetchall()
+        return [{"problem": problem, "added": added} for problem, added in rows]
+    
+    def save(self):
+        """Every change is committed as it happens; this checkpoints the WAL into the main database"""
+        with self.lock:
+            self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+    
+    def set_working_on(self, task: str):
+        with self.lock:
+            self._set("working_on", {"task": task, "started": datetime.now().isoformat()})
+            self._changed()
     
     def mark_file_viewed(self, path: str, summary: str = None):
-        self.state["discovered_files"][path] = {
-            "viewed_at": datetime.now().isoformat(),
-            "summary": summary
-        }
-        self.state["last_viewed"] = (self.state["last_viewed"] + [path])[-20:]
-        self.save()
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO discovered_files (path, viewed_at, summary) VALUES (?, ?, ?)',
+                              (path, datetime.now().isoformat(), summary))
+            self._changed()
     
     def add_problem(self, problem: str):
-        self.state["active_problems"].append({
-            "problem": problem,
-            "added": datetime.now().isoformat()
-        })
-        self.save()
+        with self.lock:
+            self.conn.execute('INSERT INTO problems (problem, added) VALUES (?, ?)', (problem, datetime.now().isoformat()))
+            self._changed()
     
     def solve_problem(self, problem: str, solution: str):
-        for p in self.state["active_problems"]:
-            if p["problem"] == problem:
-                self.state["active_problems"].remove(p)
-                self.state["solved_problems"].append({
-                    "problem": problem,
-                    "solution": solution,
-                    "solved": datetime.now().isoformat()
-                })
-                break
-        self.save()
+        with self.lock:
+            self.conn.execute(
+                'UPDATE problems SET solution = ?, solved = ? WHERE id = '
+                '(SELECT id FROM problems WHERE problem = ? AND solved IS NULL ORDER BY id LIMIT 1)',
+                (solution, datetime.now().isoformat(), problem)
+            )
+            self._changed()
     
     def index_file(self, path: str, file_type: str, purpose: str):
-        self.state["file_index"][path] = {
-            "type": file_type,
-            "purpose": purpose,
-            "indexed": datetime.now().isoformat()
-        }
-        self.save()
+        now = datetime.now().isoformat()
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO file_index (path, type, purpose, indexed, used) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (path) DO UPDATE SET type = excluded.type, purpose = excluded.purpose, '
+                'indexed = excluded.indexed, used = excluded.used', (path, file_type, purpose, now, now)
+            )
+            self._changed()
     
     def search_files(self, query: str) -> list:
-        results = []
-        query_lower = query.lower()
-        for path, info in self.state["file_index"].items():
-            if query_lower in path.lower() or query_lower in info.get("purpose", "").lower():
-                results.append({"path": path, **info})
-        return results
+        """Indexed files whose path or purpose contains `query` (case-insensitive). Hits count as use."""
+        with self.lock:
+            if len(query) >= 3:
+                # The trigram index answers substring queries of three or more characters
+                rows = self.conn.execute(
+                    'SELECT f.path, f.type, f.purpose, f.indexed FROM file_search JOIN file_index f ON f.rowid = file_search.rowid '
+                    'WHERE file_search MATCH ? ORDER BY f.used DESC', ('"' + query.replace('"', '""') + '"',)
+                ).fetchall()
+            else:
+                pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                rows = self.conn.execute(
+                    "SELECT path, type, purpose, indexed FROM file_index WHERE path LIKE ? ESCAPE '\\' "
+                    "OR purpose LIKE ? ESCAPE '\\' ORDER BY used DESC", (pattern, pattern)
+                ).fetchall()
+            if rows:
+                now = datetime.now().isoformat()
+                self.conn.executemany('UPDATE file_index SET used = ? WHERE path = ?', [(now, row[0]) for row in rows])
+        return [{"path": path, "type": file_type, "purpose": purpose, "indexed": indexed}
+                for path, file_type, purpose, indexed in rows]
     
     def get_context_summary(self) -> str:
         summary = []
-        if self.state["working_on"]:
-            summary.append(f"WORKING ON: {self.state['working_on']['task']}")
-        if self.state["active_problems"]:
-            summary.append(f"ACTIVE PROBLEMS: {', '.join(p['problem'] for p in self.state['active_problems'][:3])}")
-        if self.state["last_viewed"]:
-            summary.append(f"RECENTLY VIEWED: {', '.join(self.state['last_viewed'][-5:])}")
+        working_on = self.get("working_on")
+        if working_on:
+            summary.append(f"WORKING ON: {working_on['task']}")
+        problems = self.active_problems()
+        if problems:
+            summary.append(f"ACTIVE PROBLEMS: {', '.join(p['problem'] for p in problems[:3])}")
+        recent = self.recent_files(5)
+        if recent:
+            summary.append(f"RECENTLY VIEWED: {', '.join(recent)}")
         return "\n".join(summary)
     
     def end_session(self, summary: str):
-        self.state["last_session"] = {
-            "ended": datetime.now().isoformat(),
-            "summary": summary,
-            "was_working_on": self.state.get("working_on")
-        }
-        self.state["conversation_summary"] = summary
+        with self.lock:
+            self.conn.execute('BEGIN')
+            self._set("last_session", {
+                "ended": datetime.now().isoformat(),
+                "summary": summary,
+                "was_working_on": self.get("working_on")
+            })
+            self._set("conversation_summary", summary)
+            self._changed()
+            self.conn.execute('COMMIT')
         self.save()
+    
+    def get_stats(self) -> dict:
+        with self.lock:
+            count = lambda sql: self.conn.execute(sql).fetchone()[0]
+            return {
+                "indexed_files": count('SELECT count(*) FROM file_index'),
+                "discovered_files": count('SELECT count(*) FROM discovered_files'),
+                "active_problems": count('SELECT count(*) FROM problems WHERE solved IS NULL')
+            }
 
 session_state = SessionState()
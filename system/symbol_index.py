@@ -0,0 +1,192 @@
+import ast
+import bisect
+import difflib
+import threading
+
+from system.index_store import INDEX_DB, open_index_db
+
+SYMBOL_KINDS = ('class', 'function', 'method', 'variable', 'import')
+FIELDS = ('name', 'kind', 'path', 'line', 'end_line', 'parent', 'signature')
+
+def _top_level(body: list):
+    '''Module statements, including those nested in module-level if/try/with blocks'''
+    for node in body:
+        yield node
+        if isinstance(node, (ast.If, ast.With, ast.AsyncWith)):
+            yield from _top_level(node.body)
+            yield from _top_level(getattr(node, 'orelse', []))
+        elif isinstance(node, ast.Try):
+            yield from _top_level(node.body)
+            for handler in node.handlers:
+                yield from _top_level(handler.body)
+            yield from _top_level(node.orelse)
+            yield from _top_level(node.finalbody)
+
+def _def_signature(node) -> str:
+    prefix = 'async def' if isinstance(node, ast.AsyncFunctionDef) else 'def'
+    returns = f' -> {ast.unparse(node.returns)}' if node.returns else ''
+    return f'{prefix} {node.name}({ast.unparse(node.args)}){returns}'
+
+def _class_signature(node: ast.ClassDef) -> str:
+    bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+    return f'class {node.name}({", ".join(bases)})' if bases else f'class {node.name}'
+
+def _class_symbols(node: ast.ClassDef, parent: str):
+    qualname = f'{parent}.{node.name}' if parent else node.name
+    yield (node.name, 'class', node.lineno, node.end_lineno, parent, _class_signature(node))
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield (child.name, 'method', child.lineno, child.end_lineno, qualname, _def_signature(child))
+        elif isinstance(child, ast.ClassDef):
+            yield from _class_symbols(child, qualname)
+
+def extract_symbols(source: str) -> list:
+    '''(name, kind, line, end_line, parent, signature) for a module's classes, functions, methods,
+    module-level assignments and imports. Empty if the source doesn't parse.'''
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    symbols = []
+    for node in _top_level(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append((node.name, 'function', node.lineno, node.end_lineno, None, _def_signature(node)))
+        elif isinstance(node, ast.ClassDef):
+            symbols.extend(_class_symbols(node, None))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for name in ast.walk(target):
+                    if isinstance(name, ast.Name):
+                        symbols.append((name.id, 'variable', node.lineno, node.end_lineno, None, None))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                symbols.append((alias.asname or alias.name.split('.')[0], 'import', node.lineno, node.end_lineno,
+                                None, f'import {alias.name}' + (f' as {alias.asname}' if alias.asname else '')))
+        elif isinstance(node, ast.ImportFrom):
+            module = '.' * node.level + (node.module or '')
+            for alias in node.names:
+                symbols.append((alias.asname or alias.name, 'import', node.lineno, node.end_lineno, None,
+                                f'from {module} import {alias.name}' + (f' as {alias.asname}' if alias.asname else '')))
+    return symbols
+
+class SymbolIndex:
+    '''Definitions per Python file, stored next to the file index and kept in step with it.
+
+    Rows live in SQLite; the set of distinct names is held in memory (a dict for O(1) exact and
+    case-insensitive hits, a sorted list for prefix ranges, difflib over it for fuzzy matches).'''
+
+    def __init__(self, db_path: str = INDEX_DB, conn=None, lock=None):
+        self.lock = lock or threading.RLock()
+        self.conn = conn or open_index_db(db_path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS symbols ('
+            'name TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL, line INTEGER, end_line INTEGER, '
+            'parent TEXT, signature TEXT)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path)')
+        self._names = None  # name -> number of definitions, loaded on first lookup
+        self._lower = None  # lower(name) -> {names}
+        self._sorted = None  # sorted lower-case names, rebuilt lazily after changes
+
+    def _load_names(self):
+        if self._names is None:
+            self._names, self._lower = {}, {}
+            for name, count in self.conn.execute('SELECT name, count(*) FROM symbols GROUP BY name'):
+                self._names[name] = count
+                self._lower.setdefault(name.lower(), set()).add(name)
+            self._sorted = None
+
+    def _count(self, name: str, delta: int):
+        if self._names is None:
+            return
+        count = self._names.get(name, 0) + delta
+        if count > 0:
+            if name not in self._names:
+                self._lower.setdefault(name.lower(), set()).add(name)
+                self._sorted = None
+            self._names[name] = count
+        elif name in self._names:
+            del self._names[name]
+            names = self._lower.get(name.lower(), set())
+            names.discard(name)
+            if not names:
+                self._lower.pop(name.lower(), None)
+            self._sorted = None
+
+    def replace(self, path: str, symbols: list):
+        with self.lock:
+            self.delete(path)
+            self.conn.executemany(
+                'INSERT INTO symbols (name, kind, path, line, end_line, parent, signature) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(name, kind, path, line, end_line, parent, signature)
+                 for name, kind, line, end_line, parent, signature in symbols]
+            )
+            for symbol in symbols:
+                self._count(symbol[0], 1)
+
+    def delete(self, path: str):
+        with self.lock:
+            if self._names is not None:
+                for (name,) in self.conn.execute('SELECT name FROM symbols WHERE path = ?', (path,)).fetchall():
+                    self._count(name, -1)
+            self.conn.execute('DELETE FROM symbols WHERE path = ?', (path,))
+
+    def rename(self, old_path: str, new_path: str):
+        with self.lock:
+            self.conn.execute('UPDATE symbols SET path = ? WHERE path = ?', (new_path, old_path))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM symbols')
+            self._names, self._lower, self._sorted = {}, {}, []
+
+    def _rows(self, names: list, kind: str, limit: int) -> list:
+        results = []
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            sql = f'SELECT {", ".join(FIELDS)} FROM symbols WHERE name IN ({",".join("?" * len(chunk))})'
+            params = list(chunk)
+            if kind:
+                sql += ' AND kind = ?'
+                params.append(kind)
+            rows = self.conn.execute(sql + ' LIMIT ?', params + [limit - len(results)]).fetchall()
+            results.extend(dict(zip(FIELDS, row)) for row in rows)
+            if len(results) >= limit:
+                break
+        # Definitions before imports and assignments of the same name
+        order = {kind: i for i, kind in enumerate(SYMBOL_KINDS)}
+        rank = {name: i for i, name in enumerate(names)}
+        return sorted(results, key=lambda r: (rank[r['name']], order.get(r['kind'], 9), r['path'], r['line']))
+
+    def _matching_names(self, query: str, mode: str, limit: int) -> list:
+        if mode == 'exact':
+            if query in self._names:
+                return [query]
+            return sorted(self._lower.get(query.lower(), ()))
+        if self._sorted is None:
+            self._sorted = sorted(self._lower)
+        if mode == 'prefix':
+            prefix = query.lower()
+            start = bisect.bisect_left(self._sorted, prefix)
+            stop = bisect.bisect_left(self._sorted, prefix + '\U0010ffff', start)
+            lowered = self._sorted[start:min(stop, start + limit)]
+        else:
+            lowered = difflib.get_close_matches(query.lower(), self._sorted, n=limit, cutoff=0.6)
+        return [name for low in lowered for name in sorted(self._lower[low])]
+
+    def lookup(self, query: str, mode: str = 'auto', kind: str = None, limit: int = 50) -> tuple:
+        '''Return (mode_used, results). mode is exact, prefix, fuzzy, or auto (the first of those that matches).'''
+        with self.lock:
+            self._load_names()
+            for candidate in (('exact', 'prefix', 'fuzzy') if mode == 'auto' else (mode,)):
+                names = self._matching_names(query, candidate, limit)
+                results = self._rows(names, kind, limit) if names else []
+                if results:
+                    return candidate, results
+            return mode, []
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT count(*) FROM symbols').fetchone()[0]
@@ -1,8 +1,11 @@
-﻿import json
+﻿import glob
+import json
 import os
 from datetime import datetime
 import time
 
+from system.json_store import StateStore, atomic_write_json
+
 class TokenManager:
     '''Manages token usage to enable infinite operation'''
     
@@ -13,40 +16,35 @@ class TokenManager:
         self.session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
         self.session_start = time.time()
         self.state_file = 'system/token_manager_state.json'
+        self.store = StateStore(self.state_file)
         
         # Load previous state if exists
         self.load_state()
     
     def load_state(self):
         '''Load token manager state from previous session'''
-        try:
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
-                    self.current_usage = state.get('current_usage', 0)
-        except:
-            self.current_usage = 0
+        self.current_usage = self.store.read().get('current_usage', 0)
     
-    def save_state(self):
-        '''Save current state to disk'''
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-        with open(self.state_file, 'w') as f:
-            json.dump({
+    def save_state(self, added=None):
+        '''Save current state to disk. With `added`, usage is added to what is on disk (which other
+        processes may have raised since) rather than overwriting it.'''
+        with self.store.transaction() as state:
+            if added is not None:
+                self.current_usage = state.get('current_usage', 0) + added
+            state.update({
                 'session_id': self.session_id,
                 'current_usage': self.current_usage,
                 'last_checkpoint': datetime.now().isoformat()
-            }, f, indent=2)
+            })
     
     def track_usage(self, input_tokens, output_tokens):
         '''Track token usage and determine if checkpoint needed'''
         total = input_tokens + output_tokens
-        self.current_usage += total
+        self.save_state(added=total)
         
         needs_checkpoint = self.current_usage >= self.checkpoint_interval
         needs_reset = self.current_usage >= self.max_tokens_per_session
         
-        self.save_state()
-        
         return {
             'current_usage': self.current_usage,
             'needs_checkpoint': needs_checkpoint,
@@ -54,8 +52,8 @@ class TokenManager:
             'remaining': self.max_tokens_per_session - self.current_usage
         }
     
-    def checkpoint(self, conversation, context):
-        '''Create checkpoint and compress conversation'''
+    def checkpoint(self, conversation, context, keep=10):
+        '''Create checkpoint and compress conversation (to the last `keep` messages)'''
         checkpoint_file = f'Logs/checkpoint_{self.session_id}.json'
         
         # Save full state
@@ -63,16 +61,32 @@ class TokenManager:
             'session_id': self.session_id,
             'timestamp': datetime.now().isoformat(),
             'token_usage': self.current_usage,
-            'conversation': conversation[-10:],  # Last 10 messages
+            'conversation': conversation[-keep:] if keep else [],
             'context': context
         }
         
-        os.makedirs('Logs', exist_ok=True)
-        with open(checkpoint_file, 'w') as f:
-            json.dump(checkpoint_data, f, indent=2)
+        # Rewritten every turn by the chat loop; a crash mid-write must not cost the previous checkpoint
+        atomic_write_json(checkpoint_file, checkpoint_data)
         
         return checkpoint_file
     
+    def restore(self, checkpoint_file=None):
+        '''Load a checkpoint (the most recent in Logs/ if none is given) and continue its session,
+        so later checkpoints overwrite it. Returns the checkpoint data, or None if there is none.'''
+        if checkpoint_file is None:
+            candidates = glob.glob('Logs/checkpoint_*.json')
+            if not candidates:
+                return None
+            checkpoint_file = max(candidates, key=os.path.getmtime)
+        try:
+            with open(checkpoint_file, 'r', encoding='utf-8-sig') as f:
+                checkpoint_data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.session_id = checkpoint_data.get('session_id', self.session_id)
+        checkpoint_data['file'] = checkpoint_file
+        return checkpoint_data
+    
     def reset(self):
         '''Reset token counter for new session'''
         self.current_usage = 0
@@ -0,0 +1,170 @@
+import bisect
+import re
+import threading
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from system.index_store import INDEX_DB, open_index_db
+
+MAX_MATCHES_PER_FILE = 20
+SNIPPET_CHARS = 200
+
+# --- Regex -> trigram query -------------------------------------------------------------------
+# A query is None (no constraint: every file is a candidate), a literal string that must occur,
+# or ('and' | 'or', [queries]). Literals shorter than three characters constrain nothing.
+
+def _and(parts: list):
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ('and', parts)
+
+def _or(parts: list):
+    if not parts or any(p is None for p in parts):
+        return None
+    return parts[0] if len(parts) == 1 else ('or', parts)
+
+def _sequence(items) -> object:
+    required, run = [], []
+
+    def flush():
+        if len(run) >= 3:
+            required.append(''.join(run))
+        run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_parse.AT:
+            continue  # anchors are zero-width; the literal run continues across them
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            required.append(_sequence(av[-1]))
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            required.append(_sequence(av))
+        elif op is sre_parse.BRANCH:
+            required.append(_or([_sequence(branch) for branch in av[1]]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)):
+            if av[0] >= 1:
+                required.append(_sequence(av[2]))
+    flush()
+    return _and(required)
+
+def regex_query(pattern: str):
+    '''What any match of `pattern` must contain, as a trigram query (None if nothing is required)'''
+    return _sequence(sre_parse.parse(pattern))
+
+def _literal_match(literal: str) -> str:
+    grams = {literal[i:i + 3] for i in range(len(literal) - 2)}
+    return '(' + ' AND '.join('"' + gram.replace('"', '""') + '"' for gram in sorted(grams)) + ')'
+
+def to_match(query) -> str:
+    if isinstance(query, str):
+        return _literal_match(query)
+    op, parts = query
+    return '(' + f' {op.upper()} '.join(to_match(part) for part in parts) + ')'
+
+# --- Index ------------------------------------------------------------------------------------
+
+class TrigramIndex:
+    '''Trigram postings over file contents, in the style of codesearch/zoekt: a regex is reduced to
+    the literals it requires, candidates are the files containing all of their trigrams, and the
+    regex only runs over those. Backed by an FTS5 trigram table that borrows its text from the
+    full-text `docs` table (external content), so contents are stored once.'''
+
+    def __init__(self, db_path: str = INDEX_DB, conn=None, lock=None):
+        self.lock = lock or threading.RLock()
+        self.conn = conn or open_index_db(db_path)
+        with self.lock:
+            # Creating the table and indexing what docs already hold (databases from before this table
+            # existed) must happen together: removing postings that were never added corrupts the index
+            self.conn.execute('BEGIN')
+            if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'grams'").fetchone():
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE grams USING fts5("
+                    "body, content='docs', content_rowid='rowid', tokenize='trigram', detail='none')"
+                )
+                # The 'rebuild' command can't read from another FTS5 table, so copy the rows over
+                self.conn.execute('INSERT INTO grams (rowid, body) SELECT rowid, body FROM docs')
+            self.conn.execute('COMMIT')
+
+    def add(self, doc_id: int, body: str):
+        with self.lock:
+            self.conn.execute('INSERT INTO grams (rowid, body) VALUES (?, ?)', (doc_id, body))
+
+    def remove(self, doc_id: int, body: str):
+        '''External-content tables need the old text to remove its postings'''
+        with self.lock:
+            self.conn.execute("INSERT INTO grams (grams, rowid, body) VALUES ('delete', ?, ?)", (doc_id, body))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("INSERT INTO grams(grams) VALUES ('delete-all')")
+
+    def search(self, pattern: str, limit: int = 20, ignore_case: bool = False, join: str = '', where: str = '',
+               params: tuple = (), capped: str = '', capped_params: tuple = (), reread=None) -> dict:
+        '''Files matching a regex, with line numbers and the matching lines. Raises re.error for bad patterns.
+        `join`/`where` are optional SQL fragments (bound by `params`) restricting the candidate files.
+        `capped` is a condition (bound by `capped_params`) selecting documents whose stored body is cut
+        short: those are always candidates, since the trigrams can't vouch for the missing part, and
+        their full text comes from `reread(path) -> (text, still_truncated)`.'''
+        regex = re.compile(pattern, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        query = regex_query(pattern)
+        results, scanned, truncated = [], 0, 0
+        conditions = ' AND '.join(c for c in (where, f'NOT ({capped})' if capped and reread else '') if c)
+        bound = (*params, *capped_params) if capped and reread else params
+        with self.lock:
+            if query is None:
+                rows = self.conn.execute(f"SELECT docs.path, docs.body FROM docs {join} {'WHERE ' + conditions if conditions else ''}",
+                                         bound)
+            else:
+                rows = self.conn.execute(
+                    f'SELECT docs.path, docs.body FROM grams JOIN docs ON docs.rowid = grams.rowid {join} '
+                    f"WHERE grams MATCH ? {'AND ' + conditions if conditions else ''}",
+                    (to_match(query), *bound)
+                )
+            for path, body in rows:
+                scanned += 1
+                matches = _matching_lines(regex, body)
+                if matches:
+                    results.append({'path': path, 'matches': matches})
+                    if len(results) >= limit:
+                        break
+            capped_paths = []
+            if capped and reread and len(results) < limit:
+                capped_paths = [row[0] for row in self.conn.execute(
+                    f"SELECT docs.path FROM docs {join} WHERE {' AND '.join(c for c in (where, capped) if c)}",
+                    (*params, *capped_params)
+                )]
+        # Oversized files are read from disk outside the lock
+        for path in capped_paths:
+            if len(results) >= limit:
+                break
+            body, cut = reread(path)
+            scanned += 1
+            truncated += bool(cut)
+            matches = _matching_lines(regex, body)
+            if matches:
+                results.append({'path': path, 'matches': matches})
+        # indexed=False means nothing in the pattern narrowed the search and every file was scanned;
+        # truncated_files counts files only partly searched because they exceed even the reread cap
+        return {'results': results, 'scanned': scanned, 'indexed': query is not None, 'truncated_files': truncated}
+
+def _matching_lines(regex, body: str) -> list:
+    matches, line_starts = [], None
+    for match in regex.finditer(body):
+        if line_starts is None:
+            line_starts = [0] + [m.end() for m in re.finditer('\n', body)]
+        line = bisect.bisect_right(line_starts, match.start())
+        if matches and matches[-1]['line'] == line:
+            continue
+        end = body.find('\n', line_starts[line - 1])
+        text = body[line_starts[line - 1]:end if end != -1 else len(body)]
+        matches.append({'line': line, 'snippet': text.strip()[:SNIPPET_CHARS]})
+        if len(matches) >= MAX_MATCHES_PER_FILE:
+            break
+    return matches
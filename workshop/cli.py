@@ -6,6 +6,7 @@ Usage:
     python workshop/cli.py status          # human-readable status
     python workshop/cli.py status --json   # machine-readable snapshot
     python workshop/cli.py launch          # show launch commands
+    python workshop/cli.py changes --follow  # stream index changes (files added/changed/removed/renamed)
 """
 from __future__ import annotations
 
@@ -13,6 +14,7 @@ import argparse
 import json
 import os
 import sys
+import time
 from pathlib import Path
 from typing import Any, Dict
 
@@ -22,7 +24,7 @@ if str(REPO_ROOT) not in sys.path:
 
 from workshop.config import load_config
 from workshop.ops_profile import load_ops_profile
-from workshop.status import compose_status, dashboards
+from workshop.status import compose_status, dashboards, fetch_changes
 
 
 def _print_header(title: str) -> None:
@@ -58,6 +60,9 @@ def render_status() -> None:
         _line("thinker", server.get("hierarchy", {}).get("thinker"))
         _line("swarm", server.get("hierarchy", {}).get("swarm"))
         _line("ollama", server.get("ollama"))
+        if server.get("index"):
+            _line("indexed_files", server["index"].get("files"))
+            _line("index_gen", server["index"].get("generation"))
         if server.get("available_models"):
             _line("models", ", ".join(server["available_models"]))
     else:
@@ -122,6 +127,42 @@ def render_launch() -> None:
         _line(name, cmd)
 
 
+def _print_change(change: Dict[str, Any]) -> None:
+    target = f"{change['old_path']} -> {change['path']}" if change.get("old_path") else change["path"]
+    _line(f"[{change['generation']}] {change['kind']}", target)
+
+
+def render_changes(since: int | None = None, follow: bool = False, interval: float = 2.0) -> None:
+    """Print index changes after generation `since` (default: from now); --follow keeps polling."""
+    cfg = load_config()
+    if since is None:
+        head = fetch_changes(cfg)
+        if not head.get("online"):
+            _line("status", "offline")
+            _line("detail", head.get("error") or head.get("status_code"))
+            return
+        since = head["generation"] if follow else max(head["generation"] - 10, 0)
+    _print_header(f"Index changes since generation {since}")
+    while True:
+        feed = fetch_changes(cfg, since)
+        if not feed.get("online"):
+            _line("status", "offline")
+            _line("detail", feed.get("error") or feed.get("status_code"))
+        elif feed.get("reset") or feed.get("truncated"):
+            _line("resync", f"too far behind; the index is at generation {feed['generation']}")
+            since = feed["generation"]
+        else:
+            for change in feed["changes"]:
+                _print_change(change)
+            since = feed["generation"]
+        if not follow:
+            return
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            return
+
+
 def render_profile(as_json: bool = False) -> None:
     profile = load_ops_profile()
     if as_json:
@@ -168,6 +209,10 @@ def main(argv: Any = None) -> None:
 
     sub.add_parser("launch", help="Show launch commands (does not execute)")
 
+    changes_cmd = sub.add_parser("changes", help="Show files added/changed/removed/renamed per index generation")
+    changes_cmd.add_argument("--since", type=int, help="Generation to start after (default: recent ones)")
+    changes_cmd.add_argument("--follow", action="store_true", help="Keep polling for new changes")
+
     profile_cmd = sub.add_parser("profile", help="Show ops profile (watch/ignore paths, entrypoints, dashboards)")
     profile_cmd.add_argument("--json", action="store_true", help="Output ops profile JSON")
 
@@ -180,6 +225,8 @@ def main(argv: Any = None) -> None:
             render_status()
     elif args.command == "launch":
         render_launch()
+    elif args.command == "changes":
+        render_changes(args.since, args.follow)
     elif args.command == "profile":
         render_profile(as_json=getattr(args, "json", False))
     else:
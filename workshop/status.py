@@ -33,6 +33,7 @@ def probe_server(cfg: Dict[str, Any], timeout: float = 2.0) -> Dict[str, Any]:
                 "hierarchy": data.get("hierarchy"),
                 "memory": data.get("memory"),
                 "ollama": data.get("ollama"),
+                "index": data.get("index"),
                 "available_models": data.get("available_models", []),
             }
         return {"online": False, "status_code": resp.status_code, "latency_ms": latency}
@@ -54,6 +55,21 @@ def probe_memory(cfg: Dict[str, Any], timeout: float = 2.0) -> Dict[str, Any]:
         return {"online": False, "error": str(exc), "latency_ms": _duration_ms(started)}
 
 
+def fetch_changes(cfg: Dict[str, Any], since: int | None = None, limit: int = 200, timeout: float = 2.0) -> Dict[str, Any]:
+    """Poll the index change feed (/changes). Without `since`, only the current generation."""
+    url = f"{server_url(cfg)}/changes"
+    params = {"limit": limit} if since is None else {"since": since, "limit": limit}
+    started = time.time()
+    try:
+        resp = requests.get(url, params=params, timeout=timeout)
+        latency = _duration_ms(started)
+        if resp.status_code == 200:
+            return {"online": True, "latency_ms": latency, **resp.json()}
+        return {"online": False, "status_code": resp.status_code, "latency_ms": latency}
+    except Exception as exc:  # noqa: BLE001
+        return {"online": False, "error": str(exc), "latency_ms": _duration_ms(started)}
+
+
 def read_hive(cfg: Dict[str, Any]) -> Dict[str, Any]:
     """Summarize swarm hive memory."""
     path = hive_path(cfg)